@@ -5,6 +5,7 @@ FastAPI Main Application
 
 import os
 from fastapi import FastAPI, Depends
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 
@@ -36,6 +37,14 @@ async def startup_event():
     """アプリケーション起動時の処理"""
     print("[INFO] Starting Recruitment Management API...")
     init_db()
+
+    # Geminiモデルを事前に生成し、最初のリクエストでの初期化待ちをなくす
+    from services.model_registry import warm_up
+    warm_up()
+
+    # 使われないまま保持期間を過ぎた先回り生成の質問を削除する
+    from services.speculative_questions import get_speculative_questions
+    get_speculative_questions().collect_garbage()
     print("[INFO] API is ready!")
 
 
@@ -56,7 +65,26 @@ async def root():
 @app.get("/health")
 async def health_check():
     """ヘルスチェック"""
-    return {"status": "healthy"}
+    from services.pdf_sandbox import get_sandbox_stats
+    from services.response_cache import get_response_cache
+    from services.structured_output import get_structured_output_stats
+    from services.gemini_transport import get_gemini_transport
+
+    return {
+        "status": "healthy",
+        "pdf_extraction": get_sandbox_stats(),
+        "llm_cache": get_response_cache().get_stats(),
+        "llm_json": get_structured_output_stats(),
+        "llm_transport": get_gemini_transport().get_stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Gemini呼び出しのメトリクス（Prometheusのテキスト形式）"""
+    from services.llm_metrics import render_metrics
+
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/api/v1/stats")
@@ -0,0 +1,4 @@
+"""
+Benchmarks package
+性能計測用スクリプト（app ディレクトリから python -m benchmarks.<name> で実行）
+"""
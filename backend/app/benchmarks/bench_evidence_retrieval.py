@@ -0,0 +1,212 @@
+"""
+Evidence retrieval benchmark
+評価プロンプトに履歴書の全文を入れる場合と、BM25で募集要項の各項目に関連する段落だけを
+抜粋する場合のトークン数・抜粋にかかる時間・関連段落の再現率を比較する
+
+使い方:
+    cd backend/app
+    python -m benchmarks.bench_evidence_retrieval [--sizes 4000,8000,16000] [--resumes 5] [--top-k 3]
+        [--llm] [--prefill-ms-per-1k-tokens 100] [fake_gemini_server.py の引数: --latency-ms 800 ...]
+
+履歴書は募集要項の項目に対応する段落（半数の項目分）と、無関係な業務・経歴の段落を
+指定の文字数まで混ぜて生成する。再現率は、埋め込んだ関連段落のうち抜粋に含まれた割合。
+--llm を指定した場合は fake_gemini_server をこのプロセス内で起動し、入力トークン数に比例する
+応答時間（--prefill-ms-per-1k-tokens）を加えて、評価1件あたりのレイテンシも比較する。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from services.evidence_retrieval import EvidenceRetriever
+from services.prompt_prefix import PromptPrefixRegistry
+from services.token_counter import estimate_tokens
+
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "knowledge")
+
+# 募集要項（job_requirements.json）の項目の順に対応する段落
+RELEVANT_PARAGRAPHS = [
+    "2019年4月〜2023年3月 株式会社サンプルテックにて、PythonとDjangoによる社内業務システムの開発を4年間担当。",
+    "FastAPIでREST APIを設計・実装し、月間200万リクエストのWebサービスを運用した。",
+    "PostgreSQLのテーブル設計とインデックス調整を担当し、集計クエリの応答時間を8秒から0.5秒に短縮。Redisによるキャッシュも導入した。",
+    "GitHubでのプルリクエストによるコードレビューを導入し、Gitのブランチ運用ルールを整備した。",
+    "AWS（ECS・RDS・S3）上にサービスを構築し、Terraformでインフラをコード化した。",
+    "GitHub Actionsでテスト・デプロイのCI/CDパイプラインを構築し、リリース作業を自動化した。",
+    "2週間スプリントのスクラムで開発し、スクラムマスターとして振り返りを進行した。",
+    "4名のチームのリーダーとして進捗管理を行い、新人2名のメンターを務めた。",
+    "障害の多かったバッチ処理の課題を自ら発見し、監視と再実行の仕組みを提案して解決に向けて行動した。",
+    "企画・営業部門との定例を主催し、チームでの情報共有とコミュニケーションの改善に取り組んだ。",
+    "新しい技術の学習のため毎月技術ブログを執筆し、社内勉強会で新しいツールを紹介している。",
+    "ユーザーインタビューに同席し、ユーザー視点で画面の操作フローを見直した。",
+]
+
+FILLER_SENTENCES = [
+    "{year}年{month}月から総務部にて経費精算と備品管理を担当し、月次の締め作業を{n}日短縮した。",
+    "社内イベントの運営委員として会場手配と予算管理を行い、{n}名が参加した。",
+    "店舗スタッフとして接客と売場づくりを担当し、季節ごとの陳列変更を企画した。",
+    "趣味は登山と写真撮影で、休日は近郊の山に出かけることが多い。",
+    "営業資料の作成と受発注データの入力を担当し、取引先{n}社の窓口を務めた。",
+    "普通自動車第一種運転免許（{year}年取得）、日商簿記{n}級を保有。",
+    "学生時代は吹奏楽部に所属し、{n}年間副部長として練習計画を立てた。",
+    "請求書の発行と入金確認を担当し、未回収の債権を前年比{n}割削減した。",
+    "受付業務では来客対応と電話の取り次ぎ、会議室の予約管理を行った。",
+    "物流センターで入出荷の検品と在庫の棚卸しを担当し、誤出荷を減らす手順書を作成した。",
+]
+
+
+def make_resume(rng: random.Random, size: int, requirement_count: int) -> Tuple[str, List[str]]:
+    """
+    ベンチマーク用の履歴書を生成する
+
+    Args:
+        rng: 乱数
+        size: 履歴書の文字数の目安
+        requirement_count: 募集要項の項目数
+
+    Returns:
+        (履歴書のテキスト, 埋め込んだ関連段落)
+    """
+    planted = rng.sample(RELEVANT_PARAGRAPHS[:requirement_count], requirement_count // 2)
+    paragraphs = list(planted)
+    length = sum(len(paragraph) for paragraph in paragraphs)
+    while length < size:
+        sentences = [
+            rng.choice(FILLER_SENTENCES).format(
+                year=rng.randint(2005, 2023), month=rng.randint(1, 12), n=rng.randint(2, 9)
+            )
+            for _ in range(rng.randint(2, 4))
+        ]
+        paragraphs.append("".join(sentences))
+        length += len(paragraphs[-1])
+    rng.shuffle(paragraphs)
+
+    header = "職務経歴書 山田 太郎\n職務要約: 事業会社で業務システムの開発と社内業務の改善に携わってきました。"
+    return "\n\n".join([header] + paragraphs), planted
+
+
+def _percentile(values: List[float], ratio: float) -> float:
+    """パーセンタイル（値がなければ0）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+def measure_prompts(
+    corpus: Dict[int, List[Tuple[str, List[str]]]],
+    job_requirements: Dict,
+    evaluation_template: Dict,
+    retriever: EvidenceRetriever
+):
+    """全文と抜粋のプロンプトのトークン数・抜粋の時間・再現率を表示"""
+    prefix = PromptPrefixRegistry(context_cache=False).get(job_requirements, evaluation_template)
+
+    print(
+        f"{'chars':>7}{'full tok':>10}{'evid tok':>10}{'saved':>8}"
+        f"{'passages':>10}{'p50 ms':>9}{'max ms':>9}{'recall':>8}"
+    )
+    for size, resumes in corpus.items():
+        full_tokens, evidence_tokens, elapsed, passages = [], [], [], []
+        found = planted_total = 0
+        for resume_text, planted in resumes:
+            evidence = retriever.retrieve(resume_text, job_requirements)
+            full_tokens.append(estimate_tokens(prefix.render(resume_text)))
+            evidence_tokens.append(estimate_tokens(prefix.render(evidence.render())))
+            elapsed.append(evidence.elapsed_ms)
+            passages.append(f"{len(evidence.selected)}/{len(evidence.passages)}")
+
+            selected = {evidence.passages[index] for index in evidence.selected}
+            found += sum(1 for paragraph in planted if paragraph in selected)
+            planted_total += len(planted)
+
+        full = statistics.mean(full_tokens)
+        reduced = statistics.mean(evidence_tokens)
+        print(
+            f"{size:>7}{full:>10.0f}{reduced:>10.0f}{1 - reduced / full:>8.1%}"
+            f"{passages[0]:>10}{_percentile(elapsed, 0.5):>9.2f}{max(elapsed):>9.2f}"
+            f"{found / planted_total if planted_total else 0.0:>8.1%}"
+        )
+
+
+async def measure_latency(
+    corpus: Dict[int, List[Tuple[str, List[str]]]],
+    job_requirements: Dict,
+    evaluation_template: Dict
+):
+    """fake_gemini_server に対する評価1件あたりのレイテンシを全文・抜粋で比較"""
+    from services.gemini_service import AsyncGeminiService
+
+    service = AsyncGeminiService()
+    print(f"\n{'chars':>7}{'mode':>10}{'p50 ms':>10}{'mean ms':>10}{'input tok':>11}")
+    for size, resumes in corpus.items():
+        for mode in ("full", "evidence"):
+            service.evidence_retriever.enabled = mode == "evidence"
+            latencies = []
+            for resume_text, _ in resumes:
+                started = time.perf_counter()
+                await service.analyze_resume_async(resume_text, job_requirements, evaluation_template)
+                latencies.append((time.perf_counter() - started) * 1000)
+            prompt_text = service._select_evidence(resumes[0][0], job_requirements)
+            prefix = service.prompt_prefixes.get(job_requirements, evaluation_template)
+            print(
+                f"{size:>7}{mode:>10}{_percentile(latencies, 0.5):>10.0f}"
+                f"{statistics.mean(latencies):>10.0f}{estimate_tokens(prefix.render(prompt_text)):>11}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evidence retrieval benchmark")
+    parser.add_argument("--sizes", default="4000,8000,16000", help="履歴書の文字数（カンマ区切り）")
+    parser.add_argument("--resumes", type=int, default=5, help="文字数ごとの履歴書の数")
+    parser.add_argument("--top-k", type=int, default=3, help="1項目あたりに抜粋する段落数")
+    parser.add_argument("--seed", type=int, default=0, help="履歴書生成の乱数シード")
+    parser.add_argument("--llm", action="store_true", help="fake_gemini_server で評価のレイテンシも計測する")
+    args, fake_argv = parser.parse_known_args()
+
+    with open(os.path.join(KNOWLEDGE_DIR, "job_requirements.json"), encoding="utf-8") as f:
+        job_requirements = json.load(f)
+    with open(os.path.join(KNOWLEDGE_DIR, "evaluation_template.json"), encoding="utf-8") as f:
+        evaluation_template = json.load(f)
+    requirement_count = sum(
+        len(job_requirements.get(field, []))
+        for field in ("required_skills", "preferred_skills", "desired_personality")
+    )
+
+    rng = random.Random(args.seed)
+    corpus = {
+        int(size): [
+            make_resume(rng, int(size), min(requirement_count, len(RELEVANT_PARAGRAPHS)))
+            for _ in range(args.resumes)
+        ]
+        for size in args.sizes.split(",")
+    }
+
+    # 短い履歴書でも抜粋の効果を比較できるよう、文字数による切り替えは行わない
+    retriever = EvidenceRetriever(top_k=args.top_k, min_chars=1, enabled=True)
+    measure_prompts(corpus, job_requirements, evaluation_template, retriever)
+
+    if args.llm:
+        from benchmarks.bench_llm_load import _start_fake_server
+
+        if "--prefill-ms-per-1k-tokens" not in fake_argv:
+            fake_argv += ["--prefill-ms-per-1k-tokens", "100"]
+        if "--latency-sigma" not in fake_argv:
+            fake_argv += ["--latency-sigma", "0"]
+        os.environ["GEMINI_API_ENDPOINT"] = _start_fake_server(fake_argv)
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+        os.environ["GEMINI_CONTEXT_CACHE"] = "false"
+        os.environ["RESUME_MAPREDUCE_ENABLED"] = "false"
+        os.environ["EVIDENCE_MIN_CHARS"] = "1"
+        os.environ["EVIDENCE_TOP_K"] = str(args.top_k)
+        os.environ.setdefault("LLM_METRICS_LOG", "false")
+        asyncio.run(measure_latency(corpus, job_requirements, evaluation_template))
+
+
+if __name__ == "__main__":
+    main()
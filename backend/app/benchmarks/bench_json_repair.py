@@ -0,0 +1,133 @@
+"""
+JSON repair benchmark
+従来のJSON解析（コードブロック除去＋json.loads）と寛容な解析の成功率を比較する
+
+使い方:
+    cd backend/app
+    python -m benchmarks.bench_json_repair [--truncations N] [--seed S]
+
+評価結果・質問リストのサンプル応答に、LLMでよく見られる崩れ（コードブロック、
+前後の説明文、出力上限による途中切れ）を加えたものを解析し、
+従来方式で失敗して再呼び出し（またはフォールバック）が必要になる件数を数える。
+"""
+
+import argparse
+import json
+import os
+import random
+from typing import Callable, Dict, List
+
+from services.structured_output import fill_from_template, parse_json_lenient
+
+
+def legacy_parse(result_text: str):
+    """従来方式: ```json ... ``` を除去して json.loads"""
+    if "```json" in result_text:
+        result_text = result_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in result_text:
+        result_text = result_text.split("```")[1].split("```")[0].strip()
+    return json.loads(result_text)
+
+
+def lenient_parse(result_text: str):
+    """新方式: 途中切れ・余分なテキストを修復して解析"""
+    return parse_json_lenient(result_text)[0]
+
+
+def _load_template() -> Dict:
+    """評価テンプレートを読み込む"""
+    path = os.path.join(os.path.dirname(__file__), "..", "knowledge", "evaluation_template.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def sample_evaluation() -> str:
+    """テンプレートの各項目を埋めたサンプル評価応答"""
+    evaluation = fill_from_template({}, _load_template())
+    sections = evaluation["evaluation_format"]["sections"]
+    for name, section in sections.items():
+        section["score"] = 7
+        section["summary"] = f"{name} の評価概要。履歴書の記載から根拠を引用して評価した。"
+        for key, value in section["details"].items():
+            section["details"][key] = (
+                [f"{key} の根拠 {i}" for i in range(3)] if isinstance(value, list) else f"{key} の所見"
+            )
+    evaluation["evaluation_format"]["overall_score"] = 7.2
+    evaluation["evaluation_format"]["recommendation"] = "推薦"
+    evaluation["evaluation_format"]["next_steps"] = {
+        "proceed_to_interview": True,
+        "interview_focus_areas": ["設計経験", "チーム運営"],
+        "questions_to_clarify": ["直近のプロジェクトでの役割"],
+    }
+    return json.dumps(evaluation, ensure_ascii=False, indent=2)
+
+
+def sample_questions(count: int = 30) -> str:
+    """サンプル質問リスト応答"""
+    questions = [
+        {"question": f"質問 {i}: これまでの経験について教えてください。", "purpose": "経験の確認", "category": "経験"}
+        for i in range(count)
+    ]
+    return json.dumps(questions, ensure_ascii=False, indent=2)
+
+
+def corrupted_variants(text: str, truncations: int, rng: random.Random) -> Dict[str, List[str]]:
+    """LLM応答で見られる崩れ方ごとのサンプル"""
+    variants = {
+        "clean": [text],
+        "fenced": [f"```json\n{text}\n```"],
+        "prose_around": [f"以下が評価結果です。\n{text}\n以上です。"],
+        "trailing_garbage": [f"{text}\n```\n補足: スコアは目安です。"],
+    }
+    # 出力の後半（最大トークン数に達して途中で切れるケース）
+    variants["truncated"] = [
+        f"```json\n{text[:rng.randint(len(text) // 2, len(text) - 2)]}"
+        for _ in range(truncations)
+    ]
+    return variants
+
+
+def run(name: str, text: str, truncations: int, rng: random.Random):
+    """1種類の応答について従来方式と新方式の成功数を表示"""
+    parsers: Dict[str, Callable] = {"legacy": legacy_parse, "lenient": lenient_parse}
+    totals = {key: 0 for key in parsers}
+    count = 0
+
+    print(f"\n[{name}]")
+    print(f"{'variant':<20}{'samples':>8}{'legacy ok':>11}{'lenient ok':>12}")
+    for variant, samples in corrupted_variants(text, truncations, rng).items():
+        results = {}
+        for key, parser in parsers.items():
+            ok = 0
+            for sample in samples:
+                try:
+                    parser(sample)
+                    ok += 1
+                except (json.JSONDecodeError, IndexError):
+                    pass
+            results[key] = ok
+            totals[key] += ok
+        count += len(samples)
+        print(f"{variant:<20}{len(samples):>8}{results['legacy']:>11}{results['lenient']:>12}")
+
+    saved = totals["lenient"] - totals["legacy"]
+    print(
+        f"{'TOTAL':<20}{count:>8}{totals['legacy']:>11}{totals['lenient']:>12}"
+        f"  (failure rate {1 - totals['legacy'] / count:.1%} -> {1 - totals['lenient'] / count:.1%},"
+        f" re-calls avoided: {saved})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON repair benchmark")
+    parser.add_argument("--truncations", type=int, default=50, help="途中切れサンプルの数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    run("evaluation", sample_evaluation(), args.truncations, rng)
+    run("questions", sample_questions(), args.truncations, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+LLM load benchmark
+ローカルのGemini互換サーバーに対して評価・質問生成を同時に実行し、スループットと
+レイテンシ、リトライ・レート制限の状況を計測する（APIキー・クォータ不要）
+
+使い方:
+    cd backend/app
+    python -m benchmarks.bench_llm_load [--requests 200] [--concurrency 32] [--questions-ratio 0.3]
+        [--stream] [--endpoint http://127.0.0.1:8089]
+        [fake_gemini_server.py の引数: --latency-ms 800 --rate-limit-rate 0.05 --rpm 600 ...]
+
+--endpoint を指定しない場合は fake_gemini_server をこのプロセス内で起動する。
+応答キャッシュは無効にし、すべてのリクエストをサーバーへ送る。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+import urllib.request
+from collections import Counter
+from typing import List
+
+
+def _percentile(values: List[float], ratio: float) -> float:
+    """パーセンタイル（値がなければ0）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+def _start_fake_server(fake_argv: List[str]) -> str:
+    """fake_gemini_server をバックグラウンドスレッドで起動し、接続先URLを返す"""
+    import fake_gemini_server
+
+    fake_args = fake_gemini_server.build_parser().parse_args(fake_argv + ["--port", "0"])
+    server = fake_gemini_server.create_server(fake_args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{fake_args.host}:{server.server_address[1]}"
+
+
+async def run(args):
+    """負荷をかけて結果を表示"""
+    from services.evaluator import DocumentEvaluator
+    from services.gemini_transport import LLMTransportError, get_gemini_transport
+    from services.llm_metrics import get_llm_metrics_summary
+    from services.question_generator import AsyncQuestionGenerator
+
+    evaluator = DocumentEvaluator()
+    generator = AsyncQuestionGenerator()
+    transport = get_gemini_transport()
+
+    latencies = {"evaluation": [], "questions": []}
+    outcomes = Counter()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    sections_seen = Counter()
+
+    async def on_section(name, section):
+        sections_seen[name] += 1
+
+    async def one(index: int):
+        # 質問生成を --questions-ratio の割合で均等に混ぜる（同じ内容にならないよう番号を入れる）
+        is_questions = int((index + 1) * args.questions_ratio) > int(index * args.questions_ratio)
+        kind = "questions" if is_questions else "evaluation"
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if kind == "questions":
+                    await generator.generate_questions_async(
+                        f"候補者{index}", "一次面接", "バックエンドエンジニア",
+                        candidate_resume=f"候補者{index}の職務経歴", num_questions=10
+                    )
+                else:
+                    await evaluator.evaluate_from_text_async(
+                        f"候補者{index}の職務経歴。Python・AWSでの開発経験{index % 10 + 1}年。",
+                        f"候補者{index}",
+                        on_section=on_section if args.stream else None
+                    )
+                outcomes[f"{kind}:ok"] += 1
+            except LLMTransportError as e:
+                outcomes[f"{kind}:{e.reason}"] += 1
+            except Exception as e:
+                outcomes[f"{kind}:error"] += 1
+                print(f"[ERROR] {kind} {index}: {str(e)}")
+            latencies[kind].append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    print(f"\nrequests: {args.requests}  concurrency: {args.concurrency}  stream: {args.stream}")
+    print(f"wall time: {elapsed:.2f}s  throughput: {args.requests / elapsed:.1f} req/s")
+    print(f"{'kind':<12}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for kind, values in latencies.items():
+        if not values:
+            continue
+        print(
+            f"{kind:<12}{len(values):>7}{_percentile(values, 0.5) * 1000:>10.0f}"
+            f"{_percentile(values, 0.95) * 1000:>10.0f}{_percentile(values, 0.99) * 1000:>10.0f}"
+            f"{statistics.mean(values) * 1000:>10.0f}"
+        )
+    print("\noutcomes:", dict(sorted(outcomes.items())))
+    if args.stream:
+        print("sections streamed:", dict(sections_seen))
+    print("transport:", json.dumps(transport.get_stats(), ensure_ascii=False))
+    print("metrics:", json.dumps(get_llm_metrics_summary(), ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM load benchmark (fake Gemini server)")
+    parser.add_argument("--requests", type=int, default=200, help="リクエスト数")
+    parser.add_argument("--concurrency", type=int, default=32, help="同時に投入するリクエスト数")
+    parser.add_argument("--questions-ratio", type=float, default=0.3, help="質問生成の割合")
+    parser.add_argument("--stream", action="store_true", help="評価をストリーミングで受け取る")
+    parser.add_argument("--endpoint", default=None, help="起動済みの fake_gemini_server のURL")
+    args, fake_argv = parser.parse_known_args()
+
+    endpoint = args.endpoint or _start_fake_server(fake_argv)
+    os.environ["GEMINI_API_ENDPOINT"] = endpoint
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("GEMINI_CONTEXT_CACHE", "false")
+    os.environ.setdefault("LLM_METRICS_LOG", "false")
+    print(f"[INFO] Gemini endpoint: {endpoint}")
+
+    asyncio.run(run(args))
+
+    with urllib.request.urlopen(f"{endpoint}/stats") as response:
+        print("server:", response.read().decode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Text normalization benchmark
+TextNormalizer による文字数・トークン数の削減量を計測する
+
+使い方:
+    cd backend/app
+    python -m benchmarks.bench_normalization [PDFディレクトリ] [--gemini]
+
+--gemini を指定し GEMINI_API_KEY が設定されている場合は Gemini の count_tokens で、
+それ以外は文字種からの概算でトークン数を数える。
+"""
+
+import argparse
+import os
+from typing import Callable, Dict, List
+
+from services.pdf_parser import PDFParser
+from services.model_registry import get_model
+from services.token_counter import estimate_tokens
+from services.text_normalizer import TextNormalizer
+from benchmarks.sample_pdfs import load_corpus
+
+
+# 標準フォントのサンプルPDFでは日本語を埋め込めないため、全角文字を含むページはテキストで用意する
+JAPANESE_PAGES = [
+    [
+        "職務経歴書　　山田　太郎",
+        "",
+        "",
+        "■　職務経歴",
+        "２０１９年４月〜２０２４年３月　　株式会社サンプルテック　バックエンドエンジニア",
+        "ＰｙｔｈｏｎとＦａｓｔＡＰＩによるＲＥＳＴ　ＡＰＩの設計・開発を担当。",
+        "ＡＷＳ（ＥＣＳ・ＲＤＳ）上でのＣＩ／ＣＤパイプラインを構築。",
+        "",
+        "－　１　－",
+    ],
+    [
+        "職務経歴書　　山田　太郎",
+        "■　スキル",
+        "Ｐｙｔｈｏｎ、Ｊａｖａ、ＳＱＬ、Ｄｏｃｋｅｒ、Ｋｕｂｅｒｎｅｔｅｓ",
+        "ｿﾌﾄｳｪｱ設計、ﾁｰﾑﾏﾈｼﾞﾒﾝﾄ（４名）",
+        "",
+        "",
+        "－　２　－",
+    ],
+]
+
+
+def gemini_token_counter() -> Callable[[str], int]:
+    """Gemini APIでトークン数を数える関数を返す"""
+    model = get_model()
+    return lambda text: model.count_tokens(text).total_tokens
+
+
+def load_page_texts(directory: str = None) -> Dict[str, List[str]]:
+    """PDFコーパスをページごとのテキストに変換し、日本語サンプルを加える"""
+    corpus = {}
+    for name, pdf_bytes in load_corpus(directory).items():
+        corpus[name] = [page["text"] for page in PDFParser.extract_pages(pdf_bytes)]
+    if not directory:
+        corpus["japanese_2p"] = ["\n".join(lines) for lines in JAPANESE_PAGES]
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text normalization benchmark")
+    parser.add_argument("directory", nargs="?", help="PDFを含むディレクトリ（省略時はサンプルを生成）")
+    parser.add_argument("--gemini", action="store_true", help="Gemini APIでトークン数を数える")
+    args = parser.parse_args()
+
+    count_tokens = estimate_tokens
+    if args.gemini and os.getenv("GEMINI_API_KEY"):
+        count_tokens = gemini_token_counter()
+
+    normalizer = TextNormalizer()
+
+    print(
+        f"{'file':<24}{'chars':>8}{'norm':>8}{'tokens':>8}{'norm':>8}"
+        f"{'saved':>8}{'boilerplate':>13}"
+    )
+    total_tokens = 0
+    total_normalized_tokens = 0
+    for name, pages in load_page_texts(args.directory).items():
+        raw_text = "\n\n".join(page for page in pages if page)
+        result = normalizer.normalize_pages(pages)
+
+        tokens = count_tokens(raw_text)
+        normalized_tokens = count_tokens(result["text"])
+        total_tokens += tokens
+        total_normalized_tokens += normalized_tokens
+
+        saved = 1 - normalized_tokens / tokens if tokens else 0.0
+        print(
+            f"{name[:23]:<24}{result['original_chars']:>8}{result['normalized_chars']:>8}"
+            f"{tokens:>8}{normalized_tokens:>8}{saved:>8.1%}"
+            f"{result['boilerplate_lines_removed']:>13}"
+        )
+
+    saved = 1 - total_normalized_tokens / total_tokens if total_tokens else 0.0
+    print(f"{'TOTAL':<24}{'':>8}{'':>8}{total_tokens:>8}{total_normalized_tokens:>8}{saved:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
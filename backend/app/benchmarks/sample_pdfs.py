@@ -0,0 +1,128 @@
+"""
+Sample PDF generator for benchmarks
+ベンチマーク用のサンプルPDFを生成するユーティリティ
+"""
+
+import os
+from typing import Dict, List, Optional
+
+
+RESUME_LINES = [
+    "Work History",
+    "2019-2024 Backend Engineer at Example Tech Inc.",
+    "Designed REST APIs with Python, FastAPI and PostgreSQL for 2M monthly users.",
+    "Built CI/CD pipelines with GitHub Actions and deployed services on AWS ECS.",
+    "Led a team of 4 engineers using Scrum; mentored two junior developers.",
+    "2016-2019 Software Developer at Sample Solutions Co.",
+    "Developed internal tools in Java and JavaScript, maintained MySQL schemas.",
+    "Introduced Git flow and code review practices across three teams.",
+    "Skills: Python, Java, JavaScript, SQL, Docker, Kubernetes, GCP, Terraform",
+    "Self study: contributes to open source, writes a technical blog monthly.",
+]
+
+
+def _escape(text: str) -> str:
+    """PDF文字列リテラル用にエスケープ"""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """
+    テキスト行のリストから最小構成のPDFを生成
+
+    Args:
+        pages: ページごとのテキスト行（空リストのページは画像ページ相当の空ページになる）
+
+    Returns:
+        PDFのバイトデータ
+    """
+    page_count = len(pages)
+    font_id = 3 + 2 * page_count
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(page_count))
+
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>",
+    ]
+    for i, lines in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {4 + 2 * i} 0 R /Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        body = "BT /F1 10 Tf 50 760 Td 12 TL " + " ".join(
+            f"({_escape(line)}) '" for line in lines
+        ) + " ET"
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects):
+        offsets.append(len(output))
+        output += f"{i + 1} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode("latin-1")
+    return output
+
+
+def make_resume_pdf(num_pages: int, sparse_pages: int = 0, header: str = "Resume - Taro Yamada") -> bytes:
+    """
+    履歴書風のサンプルPDFを生成
+
+    Args:
+        num_pages: ページ数
+        sparse_pages: 末尾に置くテキストのないページ数（スキャンページ相当）
+        header: 各ページに入れるヘッダー行
+
+    Returns:
+        PDFのバイトデータ
+    """
+    pages = []
+    for page_number in range(1, num_pages + 1):
+        if page_number > num_pages - sparse_pages:
+            pages.append([])
+            continue
+        pages.append(
+            [header]
+            + RESUME_LINES * 3
+            + [f"Page {page_number} / {num_pages}  Confidential"]
+        )
+    return make_pdf(pages)
+
+
+def sample_corpus() -> Dict[str, bytes]:
+    """ベンチマーク用の既定サンプル（テキスト主体・一部スキャン・スキャン主体・長文）"""
+    return {
+        "text_2p": make_resume_pdf(2),
+        "mixed_4p": make_resume_pdf(4, sparse_pages=2),
+        "thin_3p": make_resume_pdf(3, sparse_pages=3),
+        "portfolio_40p": make_resume_pdf(40),
+    }
+
+
+def load_corpus(directory: Optional[str] = None) -> Dict[str, bytes]:
+    """
+    ディレクトリ内のPDFを読み込む（未指定の場合はサンプルを生成）
+
+    Args:
+        directory: PDFを含むディレクトリ
+
+    Returns:
+        {ファイル名: PDFバイトデータ}
+    """
+    if not directory:
+        return sample_corpus()
+
+    corpus = {}
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(directory, name), "rb") as f:
+                corpus[name] = f.read()
+    return corpus
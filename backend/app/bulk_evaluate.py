@@ -0,0 +1,279 @@
+"""
+Recruitment AI Agent - Bulk Evaluation CLI
+ディレクトリ内の履歴書PDFを一括で書類選考評価するコマンド
+
+使い方:
+    cd backend/app
+    python bulk_evaluate.py <PDFディレクトリ> [--output results.ndjson] [--llm-concurrency 4]
+
+評価が完了したファイルはチェックポイントファイルに記録されるため、
+中断後に同じコマンドを再実行すると未完了のファイルだけを評価する。
+DB保存に失敗したファイル（db_failed）も再実行時に評価し直す。
+
+必須・優遇スキルとのキーワード一致率が低くGeminiでの評価を省略したファイルは
+「保留（deferred）」として記録し、DBには保存しない。
+後で --no-prescreen を付けて再実行すると、保留したファイルだけをGeminiで評価する。
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, Set
+
+from dotenv import load_dotenv
+
+from database import init_db
+from services.evaluator import DocumentEvaluator
+from services.extraction_cache import ExtractionCache
+from services.candidate_store import save_candidate_evaluation
+from services.llm_scheduler import LANE_BATCH, llm_lane
+
+# 環境変数の読み込み
+load_dotenv()
+
+
+def _load_checkpoint(checkpoint_path: str) -> Set[str]:
+    """チェックポイントファイルから評価済みPDFのハッシュを読み込む（done のみ。db_failed などは再評価する）"""
+    completed = set()
+    if not os.path.exists(checkpoint_path):
+        return completed
+
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 書き込み途中で中断された行は無視する
+                continue
+            if record.get("status") == "done":
+                completed.add(record["sha256"])
+    return completed
+
+
+def _append_line(f, record: Dict[str, Any]):
+    """NDJSONとして1行追記し、中断に備えてディスクへ書き出す"""
+    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _candidate_name_from_file(file_name: str) -> str:
+    """ファイル名から候補者名を推定（Slackアップロード時と同じ規則）"""
+    return file_name.replace(".pdf", "").replace("_", " ")
+
+
+def _evaluate_in_batch_lane(
+    evaluator: DocumentEvaluator,
+    resume_text: str,
+    candidate_name: str,
+    job_posting_id: int,
+    prescreen: bool
+):
+    """バッチ処理のレーンで評価する（対話的な処理より優先度を下げる）"""
+    with llm_lane(LANE_BATCH):
+        return evaluator.evaluate_from_text(
+            resume_text, candidate_name, job_posting_id, prescreen=prescreen
+        )
+
+
+def _is_deferred(evaluation_result: Dict[str, Any]) -> bool:
+    """キーワード事前判定でGeminiでの評価を省略したかどうか"""
+    return bool(
+        evaluation_result.get("evaluation_format", {}).get("prescreen", {}).get("skipped")
+    )
+
+
+def run(args) -> int:
+    """一括評価を実行し、失敗件数を返す"""
+    pdf_files = sorted(
+        name for name in os.listdir(args.directory)
+        if name.lower().endswith(".pdf")
+    )
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    completed = _load_checkpoint(checkpoint_path)
+
+    if not args.no_db:
+        # 新しいDB・カラム追加前のDBでも候補者を保存できるようにする
+        init_db()
+
+    evaluator = DocumentEvaluator()
+    extraction_pool = evaluator.extraction_pool
+
+    # 評価済み（同一内容の別名ファイルを含む）をスキップ
+    pending = []
+    for name in pdf_files:
+        path = os.path.join(args.directory, name)
+        sha256 = ExtractionCache.hash_file(path)
+        if sha256 in completed:
+            continue
+        completed.add(sha256)
+        pending.append((name, path, sha256))
+
+    print(
+        f"[INFO] {len(pdf_files)}件中 {len(pdf_files) - len(pending)}件は評価済みのためスキップします"
+    )
+    if not pending:
+        return 0
+
+    # PDF解析はワーカープロセス数、Gemini呼び出しは --llm-concurrency で同時実行数を制限する
+    parse_executor = ThreadPoolExecutor(
+        max_workers=extraction_pool.max_workers, thread_name_prefix="bulk-parse"
+    )
+    llm_executor = ThreadPoolExecutor(
+        max_workers=args.llm_concurrency, thread_name_prefix="bulk-llm"
+    )
+
+    in_flight = {}
+    # 解析が終わってから評価が終わるまでの履歴書テキスト（候補者と一緒に保存する）
+    resume_texts: Dict[str, str] = {}
+    for name, path, sha256 in pending:
+        future = parse_executor.submit(
+            extraction_pool.extract_text_from_file,
+            path,
+            evaluator.max_pages,
+            evaluator.max_chars
+        )
+        in_flight[future] = ("parse", name, sha256)
+
+    done_count = 0
+    deferred_count = 0
+    error_count = 0
+    with open(args.output, "a", encoding="utf-8") as output_file, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint_file:
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, name, sha256 = in_flight.pop(future)
+                candidate_name = _candidate_name_from_file(name)
+                resume_text = resume_texts.pop(sha256, None)
+
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error_count += 1
+                    print(f"[ERROR] {name}: {str(e)}")
+                    _append_line(output_file, {
+                        "file": name,
+                        "sha256": sha256,
+                        "stage": stage,
+                        "error": str(e),
+                    })
+                    continue
+
+                if stage == "parse":
+                    # 解析が終わったものから順にGeminiへ投入する
+                    resume_texts[sha256] = result
+                    llm_future = llm_executor.submit(
+                        _evaluate_in_batch_lane, evaluator, result, candidate_name,
+                        args.job_posting_id, not args.no_prescreen
+                    )
+                    in_flight[llm_future] = ("evaluate", name, sha256)
+                    continue
+
+                record = {
+                    "file": name,
+                    "sha256": sha256,
+                    "candidate_name": candidate_name,
+                    "evaluated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "evaluation": result,
+                }
+
+                if _is_deferred(result):
+                    # --no-prescreen で再実行したときにGeminiで評価する
+                    record["status"] = "deferred"
+                    _append_line(output_file, record)
+                    _append_line(checkpoint_file, {
+                        "file": name,
+                        "sha256": sha256,
+                        "status": "deferred",
+                    })
+                    deferred_count += 1
+                    print(f"[INFO] {name} はキーワード一致率が低いため保留しました")
+                    continue
+
+                if not args.no_db:
+                    try:
+                        candidate_id, candidate_number = save_candidate_evaluation(
+                            candidate_name, result, args.job_posting_id, resume_text
+                        )
+                        record["candidate_id"] = candidate_id
+                        record["candidate_number"] = candidate_number
+                    except Exception as db_error:
+                        # 評価結果は出力するが完了にはせず、再実行時に評価・保存し直す
+                        error_count += 1
+                        print(f"[ERROR] {name}: DB保存に失敗しました: {str(db_error)}")
+                        record["status"] = "db_failed"
+                        record["error"] = str(db_error)
+                        _append_line(output_file, record)
+                        _append_line(checkpoint_file, {
+                            "file": name,
+                            "sha256": sha256,
+                            "status": "db_failed",
+                        })
+                        continue
+
+                _append_line(output_file, record)
+                _append_line(checkpoint_file, {
+                    "file": name,
+                    "sha256": sha256,
+                    "status": "done",
+                    "candidate_number": record.get("candidate_number"),
+                })
+                done_count += 1
+                print(
+                    f"[INFO] ({done_count + deferred_count}/{len(pending)}) {name} の評価が完了しました"
+                )
+
+    parse_executor.shutdown()
+    llm_executor.shutdown()
+    extraction_pool.shutdown()
+
+    print(f"[INFO] 完了: {done_count}件 / 保留: {deferred_count}件 / 失敗: {error_count}件")
+    return error_count
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="履歴書PDFの一括書類選考評価")
+    parser.add_argument("directory", help="履歴書PDFを含むディレクトリ")
+    parser.add_argument(
+        "--output", default="evaluations.ndjson", help="評価結果の出力先（NDJSON、追記）"
+    )
+    parser.add_argument(
+        "--checkpoint", default=None, help="チェックポイントファイル（既定: <output>.checkpoint）"
+    )
+    parser.add_argument(
+        "--llm-concurrency", type=int, default=4, help="Gemini APIの同時呼び出し数"
+    )
+    parser.add_argument(
+        "--job-posting-id", type=int, default=None, help="候補者を登録する募集要項ID"
+    )
+    parser.add_argument(
+        "--no-db", action="store_true", help="データベースに保存せずNDJSONのみ出力する"
+    )
+    parser.add_argument(
+        "--no-prescreen", action="store_true",
+        help="キーワード事前判定を行わずにすべてGeminiで評価する（保留したファイルの評価に使う）"
+    )
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"[ERROR] ディレクトリが見つかりません: {args.directory}")
+        sys.exit(2)
+
+    if not os.environ.get("GEMINI_API_KEY") and not os.environ.get("GEMINI_API_ENDPOINT"):
+        print("[ERROR] GEMINI_API_KEY が設定されていません")
+        sys.exit(2)
+
+    error_count = run(args)
+    sys.exit(1 if error_count else 0)
+
+
+if __name__ == "__main__":
+    main()
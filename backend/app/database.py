@@ -4,7 +4,7 @@ Database configuration and session management
 """
 
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -52,9 +52,59 @@ def init_db():
     全テーブルを作成
     """
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
     print("[INFO] Database tables created successfully")
 
 
+def add_missing_columns():
+    """
+    既存テーブルに不足しているカラムを追加する
+
+    create_all は既存テーブルを変更しないため、モデルに後から追加した
+    カラム（Evaluation.scores、CandidateStage.notes、AIQuestion.candidate_id など）を
+    ALTER TABLE で追加する。既存行はNULLになるため、追加するのはNULL許容で既定値のない
+    カラムだけとし、NOT NULL・既定値のあるカラムは警告を出して追加しない（手動で移行する）。
+
+    Returns:
+        list: 追加したカラム（"テーブル名.カラム名"）のリスト
+    """
+    added = []
+
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if (
+                    column.primary_key or not column.nullable
+                    or column.default is not None or column.server_default is not None
+                ):
+                    print(
+                        f"[WARNING] Column {table.name}.{column.name} is missing but was not added "
+                        "automatically (NOT NULL or has a default); migrate it manually"
+                    )
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                ))
+                added.append(f"{table.name}.{column.name}")
+
+            # 追加したカラムのインデックス（index=True）も作成する
+            for index in table.indexes:
+                if any(f"{table.name}.{column.name}" in added for column in index.columns):
+                    index.create(bind=conn, checkfirst=True)
+
+    if added:
+        print(f"[INFO] Added missing columns: {', '.join(added)}")
+    return added
+
+
 def reset_db():
     """
     データベースをリセット（開発用）
@@ -0,0 +1,385 @@
+"""
+Recruitment AI Agent - Fake Gemini Server
+負荷試験・レイテンシ計測用のGemini API互換ローカルサーバー
+
+使い方:
+    cd backend/app
+    python fake_gemini_server.py [--port 8089] [--latency-ms 800] [--rate-limit-rate 0.05] ...
+
+    # 別のターミナルで、Slackボット・APIサーバー・ベンチマークの接続先に指定する
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8089 python main.py
+
+GeminiService・QuestionGenerator が使う generateContent / streamGenerateContent /
+countTokens（REST）に応答する。応答は generationConfig.responseSchema に従うJSON
+（スキーマがない場合は評価テンプレート・質問リストの形式）で、同じリクエストには
+同じ内容を返す。レイテンシは対数正規分布（--prefill-ms-per-1k-tokens・--decode-ms-per-1k-tokens で
+入力・出力トークン数に比例する分を加算できる）で、503エラー・429（レート制限）を
+指定した確率、または --rpm を超えた場合に返す。GET /stats で集計を確認できる。
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from services.structured_output import QUESTIONS_SCHEMA, schema_from_template
+from services.token_counter import estimate_tokens
+
+
+# responseSchema の type（REST では enum が数値で送られる）
+_SCHEMA_TYPES = {1: "string", 2: "number", 3: "integer", 4: "boolean", 5: "array", 6: "object"}
+
+_RECOMMENDATIONS = ["強く推薦", "推薦", "条件付き推薦", "不合格"]
+_QUESTION_CATEGORIES = ["経験", "技術", "価値観", "志向性", "チームワーク"]
+_PHRASES = [
+    "履歴書の記載から具体的な根拠を確認した",
+    "直近のプロジェクトで中心的な役割を担っている",
+    "募集要項の必須スキルとの重なりが大きい",
+    "面接で詳細を確認する必要がある",
+    "継続的な学習の姿勢が見られる",
+    "チームでの調整経験が記載されている",
+]
+
+
+class FakeGeminiConfig:
+    """応答の遅延とエラー注入の設定"""
+
+    def __init__(self, args):
+        self.latency_ms = args.latency_ms
+        self.latency_sigma = args.latency_sigma
+        self.prefill_ms_per_1k_tokens = args.prefill_ms_per_1k_tokens
+        self.decode_ms_per_1k_tokens = args.decode_ms_per_1k_tokens
+        self.ttft_ratio = args.ttft_ratio
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.rpm = args.rpm
+        self.stream_chunk_chars = args.stream_chunk_chars
+
+
+class FakeGeminiState:
+    """遅延・エラーの乱数とリクエストの集計（スレッド間で共有する）"""
+
+    def __init__(self, config: FakeGeminiConfig, seed: int):
+        self.config = config
+        self.rng = random.Random(seed)
+        self.requests: deque = deque()
+        self.stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "rate_limited": 0,
+            "errors": 0,
+            "streamed": 0,
+        }
+        self.lock = threading.Lock()
+
+    def draw(self) -> Dict[str, Any]:
+        """
+        1リクエスト分の遅延とエラーを決める
+
+        Returns:
+            {"latency": 秒, "status": 200 / 429 / 503}
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            # 直近60秒のリクエスト数で --rpm のクォータを再現する
+            while self.requests and now - self.requests[0] > 60:
+                self.requests.popleft()
+
+            latency = self.config.latency_ms / 1000 * math.exp(
+                self.rng.gauss(0, self.config.latency_sigma)
+            )
+            roll = self.rng.random()
+            if self.config.rpm and len(self.requests) >= self.config.rpm:
+                status = 429
+            elif roll < self.config.rate_limit_rate:
+                status = 429
+            elif roll < self.config.rate_limit_rate + self.config.error_rate:
+                status = 503
+            else:
+                status = 200
+                self.requests.append(now)
+
+            key = {429: "rate_limited", 503: "errors", 200: "succeeded"}[status]
+            self.stats[key] += 1
+        return {"latency": latency, "status": status}
+
+    def count(self, name: str):
+        """統計カウンタを加算"""
+        with self.lock:
+            self.stats[name] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """集計の取得"""
+        with self.lock:
+            return dict(self.stats)
+
+
+def _schema_type(schema: Dict[str, Any]) -> str:
+    """responseSchema の type を小文字の名前にする"""
+    value = schema.get("type", schema.get("type_", "string"))
+    if isinstance(value, int):
+        return _SCHEMA_TYPES.get(value, "string")
+    return str(value).lower()
+
+
+def fake_value(schema: Dict[str, Any], key: str, rng: random.Random, count: Optional[int] = None) -> Any:
+    """
+    スキーマに従う値を生成する（評価テンプレートのキー名に合わせてそれらしい値にする）
+
+    Args:
+        schema: JSONスキーマ
+        key: 親オブジェクトでのキー名
+        rng: 乱数（リクエスト内容から決まるため、同じリクエストには同じ値を返す）
+        count: 配列の要素数（未指定の場合は2～4）
+    """
+    schema_type = _schema_type(schema)
+    if schema_type == "object":
+        return {
+            name: fake_value(child, name, rng)
+            for name, child in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        items = schema.get("items", {"type": "string"})
+        size = count if count is not None else rng.randint(2, 4)
+        return [fake_value(items, key, rng) for _ in range(size)]
+    if schema_type == "boolean":
+        return rng.random() < 0.6
+    if schema_type in ("number", "integer"):
+        if key == "max_score":
+            return 10
+        if key == "overall_score":
+            return round(rng.uniform(4, 9), 1)
+        return rng.randint(4, 9)
+
+    if key == "recommendation":
+        return rng.choice(_RECOMMENDATIONS)
+    if key == "category":
+        return rng.choice(_QUESTION_CATEGORIES)
+    if key == "question":
+        return f"{rng.choice(_PHRASES)}点について、具体的なエピソードを教えてください。"
+    return f"{key}: {rng.choice(_PHRASES)}。"
+
+
+def _load_evaluation_schema() -> Dict[str, Any]:
+    """スキーマ指定がない評価リクエスト用に、評価テンプレートからスキーマを作る"""
+    path = os.path.join(os.path.dirname(__file__), "knowledge", "evaluation_template.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return schema_from_template(json.load(f))
+
+
+_EVALUATION_SCHEMA = _load_evaluation_schema()
+
+
+def _request_text(body: Dict[str, Any]) -> str:
+    """リクエストのプロンプト部分のテキスト"""
+    texts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            texts.append(part.get("text", ""))
+    return "\n".join(texts)
+
+
+def fake_response_text(body: Dict[str, Any]) -> str:
+    """
+    リクエストに対する応答テキスト（JSON）を生成する
+
+    Args:
+        body: generateContent のリクエストボディ
+
+    Returns:
+        スキーマに従うJSON文字列
+    """
+    prompt = _request_text(body)
+    config = body.get("generationConfig", {})
+    schema = config.get("responseSchema") or config.get("response_schema")
+    is_questions = "面接質問" in prompt
+    if schema is None:
+        schema = QUESTIONS_SCHEMA if is_questions else _EVALUATION_SCHEMA
+
+    seed = int(hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+
+    count = None
+    if _schema_type(schema) == "array":
+        match = re.search(r"(\d+)問", prompt)
+        count = int(match.group(1)) if match else 3
+    value = fake_value(schema, "", rng, count)
+    return json.dumps(value, ensure_ascii=False, indent=2)
+
+
+def _response_chunk(text: str, prompt_tokens: int, output_tokens: int, finished: bool) -> Dict[str, Any]:
+    """GenerateContentResponse 形式のJSON"""
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+        "modelVersion": "fake-gemini",
+    }
+
+
+def _error_body(status: int) -> Dict[str, Any]:
+    """Gemini APIのエラー応答形式"""
+    if status == 429:
+        return {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}}
+    if status == 404:
+        return {"error": {"code": 404, "message": "Not found (fake Gemini server).", "status": "NOT_FOUND"}}
+    return {"error": {"code": 503, "message": "The model is overloaded. Please try again later.", "status": "UNAVAILABLE"}}
+
+
+def make_handler(state: FakeGeminiState):
+    """リクエストハンドラーを生成"""
+
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        """Gemini REST API互換のハンドラー"""
+
+        def do_GET(self):
+            if self.path.startswith("/stats"):
+                self._send_json(200, state.snapshot())
+            else:
+                self._send_json(404, _error_body(404))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                body = {}
+
+            path = self.path.split("?")[0]
+            if path.endswith(":countTokens"):
+                tokens = estimate_tokens(_request_text(body.get("generateContentRequest", body)))
+                self._send_json(200, {"totalTokens": tokens})
+            elif path.endswith(":generateContent"):
+                self._generate(body, stream=False)
+            elif path.endswith(":streamGenerateContent"):
+                self._generate(body, stream=True)
+            else:
+                # cachedContents など未対応のAPI（呼び出し側はキャッシュなしで続行する）
+                self._send_json(404, _error_body(404))
+
+        def _generate(self, body: Dict[str, Any], stream: bool):
+            outcome = state.draw()
+            if outcome["status"] != 200:
+                # エラーは遅延の一部だけ待って返す（実際のAPIも早めに失敗を返す）
+                time.sleep(outcome["latency"] * 0.1)
+                self._send_json(outcome["status"], _error_body(outcome["status"]))
+                return
+
+            text = fake_response_text(body)
+            prompt_tokens = estimate_tokens(_request_text(body))
+            output_tokens = estimate_tokens(text)
+            # 入力・出力トークン数に比例する処理時間（プロンプト・応答の長さによる差を再現する）
+            prefill = prompt_tokens / 1000 * state.config.prefill_ms_per_1k_tokens / 1000
+            decode = output_tokens / 1000 * state.config.decode_ms_per_1k_tokens / 1000
+
+            if not stream:
+                time.sleep(outcome["latency"] + prefill + decode)
+                self._send_json(200, _response_chunk(text, prompt_tokens, output_tokens, True))
+                return
+
+            state.count("streamed")
+            size = max(1, state.config.stream_chunk_chars)
+            pieces = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+            first_delay = outcome["latency"] * state.config.ttft_ratio
+            rest_delay = (outcome["latency"] - first_delay + decode) / max(1, len(pieces) - 1)
+            first_delay += prefill
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            time.sleep(first_delay)
+            for index, piece in enumerate(pieces):
+                if index:
+                    time.sleep(rest_delay)
+                finished = index == len(pieces) - 1
+                chunk = _response_chunk(piece, prompt_tokens, output_tokens if finished else 0, finished)
+                prefix = "[" if index == 0 else ",\r\n"
+                self.wfile.write((prefix + json.dumps(chunk, ensure_ascii=False)).encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"]")
+
+        def _send_json(self, status: int, payload: Dict[str, Any]):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            # リクエストごとのログは出さない（集計は /stats で確認する）
+            pass
+
+    return FakeGeminiHandler
+
+
+def create_server(args) -> ThreadingHTTPServer:
+    """引数の設定でサーバーを生成（ベンチマークから同一プロセスで起動する場合にも使う）"""
+    state = FakeGeminiState(FakeGeminiConfig(args), args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    return server
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """コマンドライン引数の定義"""
+    parser = argparse.ArgumentParser(description="負荷試験用のGemini API互換ローカルサーバー")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=8089, help="待ち受けるポート")
+    parser.add_argument("--latency-ms", type=float, default=800, help="応答時間の中央値（ミリ秒）")
+    parser.add_argument(
+        "--latency-sigma", type=float, default=0.5, help="応答時間の対数正規分布のσ（0で一定）"
+    )
+    parser.add_argument(
+        "--prefill-ms-per-1k-tokens", type=float, default=0,
+        help="入力1000トークンあたりに加える応答時間（ミリ秒）"
+    )
+    parser.add_argument(
+        "--decode-ms-per-1k-tokens", type=float, default=0,
+        help="出力1000トークンあたりに加える応答時間（ミリ秒）"
+    )
+    parser.add_argument(
+        "--ttft-ratio", type=float, default=0.2,
+        help="ストリーミングで最初のチャンクを返すまでの時間（応答時間に対する比率）"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503エラーを返す確率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429を返す確率")
+    parser.add_argument("--rpm", type=int, default=0, help="1分あたりのクォータ（超えた分は429、0で無制限）")
+    parser.add_argument(
+        "--stream-chunk-chars", type=int, default=200, help="ストリーミングの1チャンクの文字数"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="遅延・エラー注入の乱数シード")
+    return parser
+
+
+def main():
+    """メイン関数"""
+    args = build_parser().parse_args()
+    server = create_server(args)
+    print(f"[INFO] Fake Gemini server started on http://{args.host}:{server.server_address[1]}")
+    print(f"[INFO] GEMINI_API_ENDPOINT=http://{args.host}:{server.server_address[1]} を指定して接続してください")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
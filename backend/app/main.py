@@ -5,17 +5,24 @@ Recruitment AI Agent - Slack Bot
 
 import os
 import json
+import asyncio
+import tempfile
 from dotenv import load_dotenv
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 import requests
-from datetime import datetime
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from threading import Thread
 
 from services.evaluator import DocumentEvaluator
-from database import SessionLocal
-from models.database import Candidate, Evaluation, SelectionStage, JobPosting, CandidateStage, CandidateStatus
+from services.pdf_sandbox import get_sandbox_stats
+from services.response_cache import get_response_cache
+from services.model_registry import warm_up
+from services.structured_output import get_structured_output_stats
+from services.single_flight import get_single_flight_stats
+from services.gemini_transport import LLMTransportError, get_gemini_transport
+from services.llm_metrics import render_metrics
+from database import init_db
 
 # 環境変数の読み込み
 load_dotenv()
@@ -26,6 +33,10 @@ app = App(token=os.environ.get("SLACK_BOT_TOKEN"))
 # 評価サービスの初期化
 evaluator = DocumentEvaluator()
 
+# 評価処理を実行するイベントループ
+# Gemini応答の待機中にスレッドを占有しないよう、評価はすべてこのループ上のコルーチンで実行する
+evaluation_loop = asyncio.new_event_loop()
+
 
 @app.command("/kaka")
 def handle_kaka_command(ack, say, command):
@@ -190,41 +201,94 @@ def handle_file_upload(event, say, client):
             say(f"<@{user_id}> PDFファイルのみ対応しています。アップロードされたファイル: {file_name}")
             return
 
-        # 処理開始メッセージ
-        say(f"<@{user_id}> 📄 `{file_name}` を受け付けました。評価を開始します...\n⏳ 少々お待ちください（通常30秒～1分程度かかります）")
+        # 処理開始メッセージ（評価の途中経過でこのメッセージを更新する）
+        progress = say(f"<@{user_id}> 📄 `{file_name}` を受け付けました。評価を開始します...\n⏳ 評価が完了したセクションから順に表示します")
+
+        # 評価はイベントループ側で実行し、Boltのワーカースレッドはすぐに解放する
+        future = asyncio.run_coroutine_threadsafe(
+            _evaluate_uploaded_file(
+                file_id=file_id,
+                file_name=file_name,
+                file_url=file_url,
+                user_id=user_id,
+                channel_id=event.get("channel_id"),
+                say=say,
+                client=client,
+                progress_channel=progress.get("channel") if progress else None,
+                progress_ts=progress.get("ts") if progress else None
+            ),
+            evaluation_loop
+        )
+        future.add_done_callback(_log_evaluation_failure)
 
-        # ファイルをダウンロード
-        headers = {"Authorization": f"Bearer {os.environ.get('SLACK_BOT_TOKEN')}"}
-        response = requests.get(file_url, headers=headers)
+    except Exception as e:
+        error_message = f"❌ 評価中にエラーが発生しました: {str(e)}\n\n開発チームに報告してください。"
+        say(f"<@{user_id}> {error_message}")
+        print(f"Error processing file: {str(e)}")
 
-        if response.status_code != 200:
-            say(f"❌ ファイルのダウンロードに失敗しました。もう一度お試しください。")
-            return
 
-        pdf_bytes = response.content
+async def _evaluate_uploaded_file(
+    file_id, file_name, file_url, user_id, channel_id, say, client,
+    progress_channel=None, progress_ts=None
+):
+    """
+    アップロードされたPDFを評価して結果を返信する（evaluation_loop上で実行）
+
+    Slack APIやDBへの同期呼び出しはスレッドへ逃がし、イベントループを止めない。
+    評価はストリーミングで受け取り、セクションが完成するたびに処理開始メッセージを更新する。
+    """
+    completed_sections = {}
+
+    async def on_section(name, section):
+        completed_sections[name] = section
+        await asyncio.to_thread(
+            _update_progress_message,
+            client,
+            progress_channel,
+            progress_ts,
+            f"<@{user_id}> " + evaluator.format_section_progress(completed_sections, file_name)
+        )
+
+    try:
+        # ファイルを一時ファイルへダウンロード（PDF全体をメモリに保持しない）
+        pdf_path = await asyncio.to_thread(_download_to_tempfile, file_url)
+
+        if pdf_path is None:
+            await asyncio.to_thread(say, f"❌ ファイルのダウンロードに失敗しました。もう一度お試しください。")
+            return
 
         # 候補者名を推定（ファイル名から）
         candidate_name = file_name.replace(".pdf", "").replace("_", " ")
 
-        # 評価を実行
-        evaluation_result = evaluator.evaluate_from_pdf_bytes(
-            pdf_bytes=pdf_bytes,
-            candidate_name=candidate_name
-        )
-
-        # データベースに保存
+        # 評価とDB登録（同じ内容のPDFが評価中・評価直後の場合は、その結果と候補者を共有する）
         try:
-            candidate_id, candidate_number = _save_candidate_to_db(candidate_name, evaluation_result)
-            print(f"[INFO] 候補者をDBに保存しました: {candidate_number}")
-        except Exception as db_error:
-            print(f"[WARNING] DB保存に失敗しましたが、評価結果は返信します: {str(db_error)}")
-            candidate_number = "未割当"
+            outcome = await evaluator.evaluate_and_save_pdf_file_async(
+                file_path=pdf_path,
+                candidate_name=candidate_name,
+                on_section=on_section
+            )
+        finally:
+            os.remove(pdf_path)
+
+        evaluation_result = outcome["evaluation"]
+        candidate_number = outcome["candidate_number"] or "未割当"
+
+        if outcome["shared"]:
+            # イベントの再送・再アップロードでは候補者を重複登録せず、評価結果も再送しない
+            await asyncio.to_thread(
+                say,
+                f"<@{user_id}> ♻️ `{file_name}` は同じ内容のファイルを評価済みのため、その結果を共有しました\n**候補者番号**: `{candidate_number}`"
+            )
+            return
 
         # 評価結果をフォーマット
         formatted_result = evaluator.format_evaluation_result(evaluation_result)
 
         # 結果を送信
-        say(f"<@{user_id}> ✅ 評価完了\n**候補者番号**: `{candidate_number}`\n\n```\n{formatted_result}\n```\n\nWeb管理画面で詳細を確認: http://localhost:5175/candidates")
+        await asyncio.to_thread(
+            say,
+            f"<@{user_id}> ✅ 評価完了\n**候補者番号**: `{candidate_number}`\n\n```\n{formatted_result}\n```\n\nWeb管理画面で詳細を確認: http://localhost:5175/candidates"
+        )
 
         # JSON形式でも送信（詳細確認用）
         json_str = json.dumps(
@@ -235,118 +299,74 @@ def handle_file_upload(event, say, client):
 
         # JSONが長すぎる場合は、ファイルとしてアップロード
         if len(json_str) > 3000:
-            client.files_upload_v2(
-                channel=event.get("channel_id"),
+            await asyncio.to_thread(
+                client.files_upload_v2,
+                channel=channel_id,
                 content=json_str,
                 filename=f"evaluation_{candidate_number}_{file_id}.json",
                 title=f"詳細評価結果 - {candidate_name} ({candidate_number})",
                 initial_comment=f"<@{user_id}> 詳細な評価結果をJSONファイルで添付します。"
             )
         else:
-            say(f"<@{user_id}> 📊 詳細評価結果（JSON）:\n```json\n{json_str}\n```")
+            await asyncio.to_thread(say, f"<@{user_id}> 📊 詳細評価結果（JSON）:\n```json\n{json_str}\n```")
+
+    except LLMTransportError as e:
+        # レート制限・障害は時間をおいて再送すれば解決するため、開発チームへの報告は求めない
+        await asyncio.to_thread(say, f"<@{user_id}> ⏳ {str(e)}")
+        print(f"[WARNING] Gemini APIを呼び出せなかったため評価を中断しました: {e.reason}")
 
     except Exception as e:
         error_message = f"❌ 評価中にエラーが発生しました: {str(e)}\n\n開発チームに報告してください。"
-        say(f"<@{user_id}> {error_message}")
+        await asyncio.to_thread(say, f"<@{user_id}> {error_message}")
         print(f"Error processing file: {str(e)}")
 
 
-def _format_list(items):
-    """リストを整形"""
-    if not items:
-        return "• （設定なし）"
-    return "\n".join([f"• {item}" for item in items])
+def _update_progress_message(client, channel, ts, text):
+    """評価の途中経過で処理開始メッセージを更新する（失敗しても評価は続ける）"""
+    if not channel or not ts:
+        return
+    try:
+        client.chat_update(channel=channel, ts=ts, text=text)
+    except Exception as e:
+        print(f"[WARNING] 途中経過の更新に失敗しました: {str(e)}")
 
 
-def _generate_candidate_number(db):
-    """候補者番号を生成"""
-    today = datetime.now()
-    prefix = f"C{today.year}{today.month:02d}"
+def _log_evaluation_failure(future):
+    """評価コルーチン自体が想定外の例外で終了した場合にログを出力"""
+    if not future.cancelled() and future.exception() is not None:
+        print(f"[ERROR] 評価タスクが異常終了しました: {str(future.exception())}")
 
-    # 今月の最新番号を取得
-    latest = db.query(Candidate).filter(
-        Candidate.candidate_number.like(f"{prefix}%")
-    ).order_by(Candidate.candidate_number.desc()).first()
 
-    if latest:
-        # 既存の番号から連番を取得してインクリメント
-        last_num = int(latest.candidate_number[-4:])
-        new_num = last_num + 1
-    else:
-        new_num = 1
+def _run_evaluation_loop():
+    """評価用イベントループを実行（専用スレッドで呼び出す）"""
+    asyncio.set_event_loop(evaluation_loop)
+    evaluation_loop.run_forever()
 
-    return f"{prefix}{new_num:04d}"
 
+def _download_to_tempfile(file_url):
+    """Slackのファイルを一時ファイルへストリーミングでダウンロードし、パスを返す"""
+    headers = {"Authorization": f"Bearer {os.environ.get('SLACK_BOT_TOKEN')}"}
+    with requests.get(file_url, headers=headers, stream=True) as response:
+        if response.status_code != 200:
+            return None
 
-def _save_candidate_to_db(candidate_name, evaluation_result, job_posting_id=None):
-    """候補者と評価結果をデータベースに保存"""
-    db = SessionLocal()
-    try:
-        # アクティブな募集要項を取得（指定がない場合は最初のもの）
-        if not job_posting_id:
-            job_posting = db.query(JobPosting).filter(JobPosting.is_active == True).first()
-            if not job_posting:
-                # アクティブな募集要項がない場合、最初のものを使用
-                job_posting = db.query(JobPosting).first()
-            if job_posting:
-                job_posting_id = job_posting.id
-
-        # 書類選考の段階を取得
-        document_stage = db.query(SelectionStage).filter(
-            SelectionStage.job_posting_id == job_posting_id,
-            SelectionStage.stage_order == 1
-        ).first()
-
-        # 候補者を作成
-        candidate_number = _generate_candidate_number(db)
-        candidate = Candidate(
-            name=candidate_name,
-            candidate_number=candidate_number,
-            job_posting_id=job_posting_id,
-            current_stage_id=document_stage.id if document_stage else None,
-            overall_status=CandidateStatus.IN_PROGRESS,
-            tags=[],
-            notes=""
-        )
-        db.add(candidate)
-        db.flush()  # IDを取得するため
-
-        # 評価結果を保存
-        if document_stage:
-            # CandidateStageレコードを作成
-            candidate_stage = CandidateStage(
-                candidate_id=candidate.id,
-                stage_id=document_stage.id,
-                status="完了",
-                notes=""
-            )
-            db.add(candidate_stage)
-            db.flush()
-
-            # 評価データを保存
-            eval_data = evaluation_result.get("evaluation_format", {})
-            evaluation = Evaluation(
-                candidate_id=candidate.id,
-                stage_id=document_stage.id,
-                evaluator_name="AI評価システム",
-                scores=eval_data.get("evaluation_items", {}),
-                comments=eval_data.get("overall_comment", ""),
-                strengths=eval_data.get("strengths", []),
-                concerns=eval_data.get("concerns", []),
-                recommendation=eval_data.get("recommendation", ""),
-                raw_data=evaluation_result
-            )
-            db.add(evaluation)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            try:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+            except Exception:
+                # 途中で失敗した場合は書きかけのファイルを残さない
+                f.close()
+                os.unlink(f.name)
+                raise
+            return f.name
 
-        db.commit()
-        return candidate.id, candidate_number
 
-    except Exception as e:
-        db.rollback()
-        print(f"[ERROR] データベース保存エラー: {str(e)}")
-        raise
-    finally:
-        db.close()
+def _format_list(items):
+    """リストを整形"""
+    if not items:
+        return "• （設定なし）"
+    return "\n".join([f"• {item}" for item in items])
 
 
 @app.event("message")
@@ -365,8 +385,18 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(json.dumps({
                 'status': 'healthy',
-                'service': 'recruitment-slack-bot'
+                'service': 'recruitment-slack-bot',
+                'pdf_extraction': get_sandbox_stats(),
+                'llm_cache': get_response_cache().get_stats(),
+                'llm_json': get_structured_output_stats(),
+                'llm_transport': get_gemini_transport().get_stats(),
+                'single_flight': get_single_flight_stats()
             }).encode())
+        elif self.path == '/metrics':
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.end_headers()
+            self.wfile.write(render_metrics().encode())
         else:
             self.send_response(404)
             self.end_headers()
@@ -387,7 +417,10 @@ def start_health_check_server():
 def main():
     """メイン関数"""
     # 環境変数チェック
-    required_vars = ["SLACK_BOT_TOKEN", "SLACK_APP_TOKEN", "GEMINI_API_KEY"]
+    required_vars = ["SLACK_BOT_TOKEN", "SLACK_APP_TOKEN"]
+    if not os.environ.get("GEMINI_API_ENDPOINT"):
+        # ローカルのGemini互換サーバーに接続する場合はAPIキー不要
+        required_vars.append("GEMINI_API_KEY")
     missing_vars = [var for var in required_vars if not os.environ.get(var)]
 
     if missing_vars:
@@ -398,10 +431,20 @@ def main():
     print("[OK] 採用選考支援Slackボット（AI機能あり）を起動しています...")
     print("[INFO] 書類選考支援機能が有効です")
 
+    # 候補者の保存先テーブルを作成し、既存テーブルに不足しているカラムを追加する
+    init_db()
+
+    # Geminiモデルを事前に生成し、最初の評価での初期化待ちをなくす
+    warm_up()
+
     # ヘルスチェック用HTTPサーバーを別スレッドで起動
     health_thread = Thread(target=start_health_check_server, daemon=True)
     health_thread.start()
 
+    # 評価用イベントループを別スレッドで起動
+    loop_thread = Thread(target=_run_evaluation_loop, daemon=True)
+    loop_thread.start()
+
     print("[INFO] Slackに接続中...")
 
     # Socket Modeで起動
@@ -12,6 +12,8 @@ from .database import (
     Evaluation,
     AIQuestion,
     GoogleDriveFile,
+    PDFExtractionCache,
+    LLMResponseCache,
     SelectionStageType,
     CandidateStatus
 )
@@ -26,6 +28,8 @@ __all__ = [
     "Evaluation",
     "AIQuestion",
     "GoogleDriveFile",
+    "PDFExtractionCache",
+    "LLMResponseCache",
     "SelectionStageType",
     "CandidateStatus",
 ]
@@ -5,10 +5,10 @@ Database models for recruitment management system
 
 from sqlalchemy import (
     Column, Integer, String, Text, DateTime, Boolean,
-    ForeignKey, Float, JSON, Enum as SQLEnum
+    ForeignKey, Float, JSON, UniqueConstraint, Enum as SQLEnum
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, synonym
 from datetime import datetime
 import enum
 
@@ -160,6 +160,7 @@ class CandidateStage(Base):
     status = Column(String(50), default="進行中")
     interview_date = Column(DateTime, nullable=True)
     interview_notes = Column(Text)  # 面接メモ
+    notes = Column(Text)  # メモ
 
     # AI生成サマリー
     summary = Column(Text)  # 要点サマリー
@@ -198,6 +199,14 @@ class Evaluation(Base):
     evaluated_by = Column(String(255))  # 評価者
     evaluated_at = Column(DateTime, default=datetime.utcnow)
 
+    # AI評価の結果（candidate_store.save_candidate_evaluation で保存）
+    evaluator_name = Column(String(255))
+    scores = Column(JSON)  # 評価項目ごとのスコア
+    strengths = Column(JSON)  # 強み
+    concerns = Column(JSON)  # 懸念点
+    recommendation = Column(String(50))  # 推薦度
+    raw_data = Column(JSON)  # 評価結果のJSON全体
+
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -214,6 +223,7 @@ class AIQuestion(Base):
     __tablename__ = "ai_questions"
 
     id = Column(Integer, primary_key=True, index=True)
+    candidate_id = Column(Integer, ForeignKey("candidates.id"), index=True)
     selection_stage_id = Column(Integer, ForeignKey("selection_stages.id"))
 
     question = Column(Text, nullable=False)
@@ -221,12 +231,16 @@ class AIQuestion(Base):
     purpose = Column(Text)  # 質問の目的
 
     # 生成情報
-    generated_by = Column(String(50), default="ai")  # ai or manual
+    generated_by = Column(String(50), default="ai")  # ai, manual or speculative（先回り生成で未使用）
     generation_prompt = Column(Text)  # 生成時のプロンプト
 
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # APIのスキーマ（QuestionResponse）の名前
+    stage_id = synonym("selection_stage_id")
+    question_text = synonym("question")
+
     # リレーション
     selection_stage = relationship("SelectionStage", back_populates="ai_questions")
 
@@ -255,3 +269,45 @@ class GoogleDriveFile(Base):
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# ========================================
+# キャッシュ関連
+# ========================================
+
+class PDFExtractionCache(Base):
+    """PDF抽出結果キャッシュテーブル（PDFのハッシュをキーとする）"""
+    __tablename__ = "pdf_extraction_cache"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "parser_version", name="uq_pdf_extraction_cache_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False, index=True)  # PDFバイトのSHA-256
+    parser_version = Column(String(50), nullable=False)  # PDFParser.PARSER_VERSION（抽出上限を含む）
+
+    text = Column(Text, nullable=False)  # 抽出されたテキスト
+    page_count = Column(Integer, default=0)
+    size_bytes = Column(Integer, default=0)  # LRU容量計算用（テキストのバイト数）
+
+    hit_count = Column(Integer, default=0)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LLMResponseCache(Base):
+    """Gemini応答キャッシュテーブル（プロンプトと生成パラメータのハッシュをキーとする）"""
+    __tablename__ = "llm_response_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)  # モデル名・プロンプト・生成パラメータのSHA-256
+    kind = Column(String(50), nullable=False)  # evaluation / questions / summary
+    job_posting_id = Column(Integer, nullable=True, index=True)  # 募集要項更新時の無効化用
+
+    response_text = Column(Text, nullable=False)  # Geminiの応答テキスト
+    size_bytes = Column(Integer, default=0)  # LRU容量計算用（応答のバイト数）
+
+    hit_count = Column(Integer, default=0)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
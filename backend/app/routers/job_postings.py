@@ -12,6 +12,7 @@ import io
 
 from database import get_db
 from models.database import JobPosting, EvaluationCriteria, SelectionStage, SelectionStageType
+from services.response_cache import get_response_cache
 
 router = APIRouter()
 
@@ -212,6 +213,9 @@ def update_job_posting(
     db.commit()
     db.refresh(db_job_posting)
 
+    # 更新前の募集要項で生成した評価・質問を再利用しないよう、応答キャッシュを削除
+    get_response_cache().invalidate_job_posting(job_posting_id)
+
     return db_job_posting
 
 
@@ -241,6 +245,8 @@ def delete_job_posting(
     db_job_posting.is_active = False
     db.commit()
 
+    get_response_cache().invalidate_job_posting(job_posting_id)
+
     return None
 
 
@@ -3,21 +3,27 @@ Questions Router
 AI質問生成のAPIエンドポイント
 """
 
-from typing import List
+from typing import Any, Dict, List, Set
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime
+import asyncio
 import csv
 import io
+import json
 
-from database import get_db
-from models.database import AIQuestion, Candidate, SelectionStage, Evaluation
-from services.question_generator import QuestionGenerator
+from database import SessionLocal, get_db
+from models.database import AIQuestion, Candidate, SelectionStage
+from services.question_generator import AsyncQuestionGenerator, get_question_generator
+from services.speculative_questions import claim_speculative, discard_speculative, generation_kwargs
 
 router = APIRouter()
 
+# クライアントが切断しても生成・保存を最後まで続けるため、実行中のタスクを保持する
+_stream_tasks: Set[asyncio.Task] = set()
+
 
 # ========================================
 # Pydantic Schemas
@@ -47,20 +53,99 @@ class QuestionResponse(BaseModel):
 # ========================================
 
 @router.post("/generate", response_model=List[QuestionResponse])
-def generate_questions(
+async def generate_questions(
     request: QuestionGenerateRequest,
-    db: Session = Depends(get_db)
+    generator: AsyncQuestionGenerator = Depends(get_question_generator)
 ):
     """
     AI質問を生成してデータベースに保存
 
+    DBの読み書きはワーカースレッドで行い、Gemini応答の待機中もイベントループを止めない。
+
     Args:
         request: 質問生成リクエスト
-        db: データベースセッション
+        generator: プロセス共通の質問生成サービス
 
     Returns:
         生成された質問のリスト
     """
+    generation_args = await asyncio.to_thread(_load_generation_kwargs, request)
+    questions_data = await generator.generate_questions_async(**generation_args)
+    return await asyncio.to_thread(_save_questions, request, questions_data)
+
+
+@router.post("/generate/stream")
+async def generate_questions_stream(
+    request: QuestionGenerateRequest,
+    generator: AsyncQuestionGenerator = Depends(get_question_generator)
+):
+    """
+    AI質問を生成し、1問ずつ保存しながら Server-Sent Events で返す
+
+    イベント:
+        question: 保存した質問（QuestionResponse と同じ形式）
+        done: 生成完了 {"count": 質問数}
+        error: 生成失敗 {"message": エラーメッセージ}
+
+    クライアントが途中で切断しても、生成と保存は最後まで続ける。
+
+    Args:
+        request: 質問生成リクエスト
+        generator: プロセス共通の質問生成サービス
+
+    Returns:
+        text/event-stream のレスポンス
+    """
+    # 候補者・選考段階がなければストリームを開始する前に404を返す
+    generation_args = await asyncio.to_thread(_load_generation_kwargs, request)
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def on_question(q_data: Dict[str, str]):
+        saved = await asyncio.to_thread(_save_question, request, q_data)
+        await events.put(("question", saved))
+
+    async def run():
+        try:
+            await asyncio.to_thread(_discard_speculative, request)
+            questions = await generator.generate_questions_async(
+                **generation_args, on_question=on_question
+            )
+            await events.put(("done", {"count": len(questions)}))
+        except Exception as e:
+            print(f"[ERROR] 質問のストリーミング生成エラー: {str(e)}")
+            await events.put(("error", {"message": str(e)}))
+        finally:
+            await events.put(None)
+
+    task = asyncio.create_task(run())
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+
+    async def event_stream():
+        while True:
+            item = await events.get()
+            if item is None:
+                return
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # リバースプロキシでのバッファリングを無効化
+        }
+    )
+
+
+def _generation_kwargs(request: QuestionGenerateRequest, db: Session) -> Dict[str, Any]:
+    """
+    候補者・選考段階・直近の評価から質問生成の引数を組み立てる
+
+    Raises:
+        HTTPException: 候補者または選考段階が存在しない場合
+    """
     # 候補者情報を取得
     candidate = db.query(Candidate).filter(Candidate.id == request.candidate_id).first()
     if not candidate:
@@ -77,49 +162,74 @@ def generate_questions(
             detail=f"Selection stage with ID {request.stage_id} not found"
         )
 
-    # 評価サマリーを取得（これまでの評価から）
-    evaluation = db.query(Evaluation).filter(
-        Evaluation.candidate_id == request.candidate_id
-    ).order_by(Evaluation.created_at.desc()).first()
+    return generation_kwargs(db, candidate, stage, request.num_questions)
+
+
+def _load_generation_kwargs(request: QuestionGenerateRequest) -> Dict[str, Any]:
+    """_generation_kwargs を専用のセッションで実行する（ワーカースレッドで実行）"""
+    db = SessionLocal()
+    try:
+        return _generation_kwargs(request, db)
+    finally:
+        db.close()
 
-    evaluation_summary = None
-    if evaluation:
-        evaluation_summary = {
-            "strengths": evaluation.strengths or [],
-            "concerns": evaluation.concerns or []
-        }
 
-    # 質問を生成
-    generator = QuestionGenerator()
-    questions_data = generator.generate_questions(
-        candidate_name=candidate.name,
-        stage_name=stage.stage_name,
-        job_title=stage.job_posting.title if stage.job_posting else "未設定",
-        candidate_resume=candidate.resume_text,
-        evaluation_summary=evaluation_summary,
-        num_questions=request.num_questions
+def _build_question(request: QuestionGenerateRequest, q_data: Dict[str, str]) -> AIQuestion:
+    """生成された質問からAIQuestionを作成"""
+    return AIQuestion(
+        candidate_id=request.candidate_id,
+        stage_id=request.stage_id,
+        question_text=q_data.get("question", ""),
+        purpose=q_data.get("purpose"),
+        category=q_data.get("category")
     )
 
-    # データベースに保存
-    saved_questions = []
-    for q_data in questions_data:
-        question = AIQuestion(
-            candidate_id=request.candidate_id,
-            stage_id=request.stage_id,
-            question_text=q_data.get("question", ""),
-            purpose=q_data.get("purpose"),
-            category=q_data.get("category")
-        )
-        db.add(question)
-        saved_questions.append(question)
 
-    db.commit()
+def _discard_speculative(request: QuestionGenerateRequest):
+    """未使用の先回り生成の質問を削除する（ワーカースレッドで実行）"""
+    db = SessionLocal()
+    try:
+        discard_speculative(db, request.candidate_id, request.stage_id)
+        db.commit()
+    finally:
+        db.close()
 
-    # IDを取得するためにリフレッシュ
-    for q in saved_questions:
-        db.refresh(q)
 
-    return saved_questions
+def _save_questions(request: QuestionGenerateRequest, questions_data: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """
+    生成した質問をまとめて保存し、レスポンス用の辞書を返す（ワーカースレッドで実行）
+
+    未使用の先回り生成の質問は、生成し直した質問に置き換える。
+    """
+    db = SessionLocal()
+    try:
+        discard_speculative(db, request.candidate_id, request.stage_id)
+        saved_questions = []
+        for q_data in questions_data:
+            question = _build_question(request, q_data)
+            db.add(question)
+            saved_questions.append(question)
+        db.commit()
+
+        # IDを取得するためにリフレッシュ
+        for q in saved_questions:
+            db.refresh(q)
+        return [QuestionResponse.model_validate(q).model_dump(mode="json") for q in saved_questions]
+    finally:
+        db.close()
+
+
+def _save_question(request: QuestionGenerateRequest, q_data: Dict[str, str]) -> Dict[str, Any]:
+    """質問を1件保存し、レスポンス用の辞書を返す（ワーカースレッドで実行）"""
+    db = SessionLocal()
+    try:
+        question = _build_question(request, q_data)
+        db.add(question)
+        db.commit()
+        db.refresh(question)
+        return QuestionResponse.model_validate(question).model_dump(mode="json")
+    finally:
+        db.close()
 
 
 @router.get("/candidate/{candidate_id}/stage/{stage_id}", response_model=List[QuestionResponse])
@@ -131,6 +241,8 @@ def get_questions(
     """
     特定の候補者・選考段階の質問を取得
 
+    書類選考の後に先回り生成した質問があれば、取得した時点で使用済みにする。
+
     Args:
         candidate_id: 候補者ID
         stage_id: 選考段階ID
@@ -139,6 +251,9 @@ def get_questions(
     Returns:
         質問のリスト
     """
+    if claim_speculative(db, candidate_id, stage_id):
+        db.commit()
+
     questions = db.query(AIQuestion).filter(
         AIQuestion.candidate_id == candidate_id,
         AIQuestion.stage_id == stage_id
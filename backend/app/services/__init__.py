@@ -3,11 +3,20 @@ Services package for recruitment AI agent
 """
 
 from .pdf_parser import PDFParser
-from .gemini_service import GeminiService
+from .text_normalizer import TextNormalizer
+from .gemini_service import GeminiService, AsyncGeminiService
 from .evaluator import DocumentEvaluator
+from .extraction_pool import PDFExtractionPool, get_extraction_pool
+from .pdf_sandbox import ExtractionError, get_sandbox_stats
 
 __all__ = [
     "PDFParser",
+    "TextNormalizer",
     "GeminiService",
+    "AsyncGeminiService",
     "DocumentEvaluator",
+    "PDFExtractionPool",
+    "get_extraction_pool",
+    "ExtractionError",
+    "get_sandbox_stats",
 ]
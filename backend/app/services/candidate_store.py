@@ -0,0 +1,103 @@
+"""
+Candidate Store Service
+AI評価結果を候補者としてデータベースに保存するサービス
+"""
+
+from datetime import datetime
+
+from database import SessionLocal
+from models.database import (
+    Candidate, Evaluation, SelectionStage, JobPosting, CandidateStage, CandidateStatus
+)
+
+
+def generate_candidate_number(db):
+    """候補者番号を生成"""
+    today = datetime.now()
+    prefix = f"C{today.year}{today.month:02d}"
+
+    # 今月の最新番号を取得
+    latest = db.query(Candidate).filter(
+        Candidate.candidate_number.like(f"{prefix}%")
+    ).order_by(Candidate.candidate_number.desc()).first()
+
+    if latest:
+        # 既存の番号から連番を取得してインクリメント
+        last_num = int(latest.candidate_number[-4:])
+        new_num = last_num + 1
+    else:
+        new_num = 1
+
+    return f"{prefix}{new_num:04d}"
+
+
+def save_candidate_evaluation(candidate_name, evaluation_result, job_posting_id=None, resume_text=None):
+    """候補者と評価結果をデータベースに保存（resume_text は質問生成に使う履歴書のテキスト）"""
+    db = SessionLocal()
+    try:
+        # アクティブな募集要項を取得（指定がない場合は最初のもの）
+        if not job_posting_id:
+            job_posting = db.query(JobPosting).filter(JobPosting.is_active == True).first()
+            if not job_posting:
+                # アクティブな募集要項がない場合、最初のものを使用
+                job_posting = db.query(JobPosting).first()
+            if job_posting:
+                job_posting_id = job_posting.id
+
+        # 書類選考の段階を取得
+        document_stage = db.query(SelectionStage).filter(
+            SelectionStage.job_posting_id == job_posting_id,
+            SelectionStage.stage_order == 1
+        ).first()
+
+        # 候補者を作成
+        candidate_number = generate_candidate_number(db)
+        candidate = Candidate(
+            name=candidate_name,
+            candidate_number=candidate_number,
+            job_posting_id=job_posting_id,
+            resume_text=resume_text,
+            current_stage_id=document_stage.id if document_stage else None,
+            overall_status=CandidateStatus.IN_PROGRESS,
+            tags=[],
+            notes=""
+        )
+        db.add(candidate)
+        db.flush()  # IDを取得するため
+
+        # 評価結果を保存
+        if document_stage:
+            # CandidateStageレコードを作成
+            candidate_stage = CandidateStage(
+                candidate_id=candidate.id,
+                stage_id=document_stage.id,
+                status="完了",
+                notes=""
+            )
+            db.add(candidate_stage)
+            db.flush()
+
+            # 評価データを保存
+            eval_data = evaluation_result.get("evaluation_format", {})
+            evaluation = Evaluation(
+                candidate_id=candidate.id,
+                stage_id=document_stage.id,
+                evaluator_name="AI評価システム",
+                scores=eval_data.get("evaluation_items", {}),
+                comments=eval_data.get("overall_comment", ""),
+                strengths=eval_data.get("strengths", []),
+                concerns=eval_data.get("concerns", []),
+                recommendation=eval_data.get("recommendation", ""),
+                raw_data=evaluation_result
+            )
+            db.add(evaluation)
+
+        db.commit()
+        return candidate.id, candidate_number
+
+    except Exception as e:
+        db.rollback()
+        print(f"[ERROR] データベース保存エラー: {str(e)}")
+        raise
+    finally:
+        db.close()
@@ -3,24 +3,53 @@ Document Evaluation Service
 書類選考の評価を行うサービス
 """
 
+import asyncio
 import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Awaitable, Callable, Optional
 from datetime import datetime
 
 from .pdf_parser import PDFParser
-from .gemini_service import GeminiService
+from .gemini_service import AsyncGeminiService
+from .gemini_transport import LLMTransportError
+from .extraction_pool import get_extraction_pool
+from .extraction_cache import ExtractionCache
+from .single_flight import get_single_flight
+from .speculative_questions import get_speculative_questions
+from .prescreen import (
+    PrescreenResult,
+    get_prescreen_registry,
+    skills_from_job_posting,
+    skills_from_requirements,
+)
+from .section_fanout import REJECTED
+from .structured_output import fill_from_template
 
 
 class DocumentEvaluator:
     """書類選考の評価を行うクラス"""
 
-    def __init__(self, knowledge_base_path: str = None):
+    # 評価セクションと表示名
+    SECTION_TITLES = [
+        ("technical_skills", "💻 技術スキル"),
+        ("experience_quality", "📚 経験の質"),
+        ("cultural_fit", "🤝 文化適合性"),
+        ("growth_potential", "🌱 成長可能性"),
+    ]
+
+    def __init__(
+        self,
+        knowledge_base_path: str = None,
+        max_pages: int = None,
+        max_chars: int = None
+    ):
         """
         DocumentEvaluatorの初期化
 
         Args:
             knowledge_base_path: ナレッジベースのディレクトリパス
+            max_pages: 評価に使用するページ数の上限（未指定の場合は環境変数から取得）
+            max_chars: 評価に使用する文字数の上限（未指定の場合は環境変数から取得）
         """
         if knowledge_base_path is None:
             # デフォルトのナレッジベースパスを設定
@@ -30,10 +59,25 @@ class DocumentEvaluator:
             )
 
         self.knowledge_base_path = knowledge_base_path
+        self.max_pages = max_pages or int(os.getenv("RESUME_MAX_PAGES", "10"))
+        self.max_chars = max_chars or int(os.getenv("RESUME_MAX_CHARS", "20000"))
         self.job_requirements = self._load_job_requirements()
         self.evaluation_template = self._load_evaluation_template()
         self.pdf_parser = PDFParser()
-        self.gemini_service = GeminiService()
+        self.extraction_pool = get_extraction_pool()
+        self.gemini_service = AsyncGeminiService()
+        # 同じPDFの評価・候補者登録が同時に要求された場合は1回だけ実行する
+        self.evaluation_flight = get_single_flight("evaluation")
+        self.candidate_flight = get_single_flight(
+            "candidate",
+            retention_seconds=float(os.getenv("SINGLE_FLIGHT_RETENTION_SECONDS", "300"))
+        )
+        # 必須・優遇スキルとのキーワード一致率がこれ未満の書類はGeminiに送らない
+        self.prescreen_enabled = os.getenv("PRESCREEN_ENABLED", "true").lower() == "true"
+        self.prescreen_min_score = float(os.getenv("PRESCREEN_MIN_SCORE", "0.1"))
+        self.prescreen_registry = get_prescreen_registry()
+        # 面接に進む候補者の一次面接の質問を先回りして生成する
+        self.speculative_questions = get_speculative_questions()
 
     def _load_job_requirements(self) -> Dict[str, Any]:
         """募集要項を読み込む"""
@@ -72,14 +116,18 @@ class DocumentEvaluator:
     def evaluate_from_pdf_bytes(
         self,
         pdf_bytes: bytes,
-        candidate_name: str = "候補者"
+        candidate_name: str = "候補者",
+        job_posting_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         PDFバイトデータから書類選考の評価を行う
 
+        同じ内容のPDF・募集要項の評価が実行中の場合は、その結果を待って共有する。
+
         Args:
             pdf_bytes: PDFファイルのバイトデータ
             candidate_name: 候補者名
+            job_posting_id: 募集要項ID（重複の判定に使う）
 
         Returns:
             評価結果のJSON
@@ -87,59 +135,426 @@ class DocumentEvaluator:
         Raises:
             Exception: 評価処理に失敗した場合
         """
-        try:
-            # 1. PDFからテキストを抽出
-            resume_text = self.pdf_parser.extract_text_from_bytes(pdf_bytes)
-
-            # 2. Gemini APIで評価
-            evaluation_result = self.gemini_service.analyze_resume(
-                resume_text=resume_text,
-                job_requirements=self.job_requirements,
-                evaluation_template=self.evaluation_template
-            )
+        key = self._flight_key(ExtractionCache.hash_bytes(pdf_bytes), job_posting_id)
+        evaluation_result, _ = self.evaluation_flight.do(
+            key, lambda: self._evaluate_pdf_bytes(pdf_bytes, candidate_name, job_posting_id)
+        )
+        return evaluation_result
 
-            # 3. メタデータを追加
-            evaluation_result["evaluation_format"]["candidate_name"] = candidate_name
-            evaluation_result["evaluation_format"]["evaluation_date"] = (
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            )
-            evaluation_result["evaluation_format"]["position"] = (
-                self.job_requirements.get("job_title", "未指定")
+    def _evaluate_pdf_bytes(
+        self,
+        pdf_bytes: bytes,
+        candidate_name: str,
+        job_posting_id: Optional[int]
+    ) -> Dict[str, Any]:
+        """evaluate_from_pdf_bytes の本体"""
+        try:
+            # 1. PDFからテキストを抽出（ワーカープロセスで実行、上限ページ以降は解析しない）
+            resume_text = self.extraction_pool.extract_text(
+                pdf_bytes,
+                max_pages=self.max_pages,
+                max_chars=self.max_chars
             )
 
-            return evaluation_result
+            # 2. 評価
+            return self.evaluate_from_text(resume_text, candidate_name, job_posting_id)
 
+        except LLMTransportError:
+            raise
         except Exception as e:
             raise Exception(f"評価処理に失敗しました: {str(e)}")
 
     def evaluate_from_pdf_file(
         self,
         file_path: str,
-        candidate_name: str = "候補者"
+        candidate_name: str = "候補者",
+        job_posting_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         PDFファイルパスから書類選考の評価を行う
 
+        ファイルはメモリマップで読み込むため、大きなPDFでもbytesのコピーを作らない。
+        同じ内容のPDF・募集要項の評価が実行中の場合は、その結果を待って共有する。
+
         Args:
             file_path: PDFファイルのパス
             candidate_name: 候補者名
+            job_posting_id: 募集要項ID（重複の判定に使う）
 
         Returns:
             評価結果のJSON
 
         Raises:
             FileNotFoundError: ファイルが見つからない場合
+            LLMTransportError: Gemini APIを呼び出せなかった場合
             Exception: 評価処理に失敗した場合
         """
         try:
-            with open(file_path, 'rb') as f:
-                pdf_bytes = f.read()
-            return self.evaluate_from_pdf_bytes(pdf_bytes, candidate_name)
+            content_hash = ExtractionCache.hash_file(file_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"PDFファイルが見つかりません: {file_path}")
+
+        evaluation_result, _ = self.evaluation_flight.do(
+            self._flight_key(content_hash, job_posting_id),
+            lambda: self._evaluate_pdf_file(file_path, candidate_name, job_posting_id)
+        )
+        return evaluation_result
+
+    def _evaluate_pdf_file(
+        self,
+        file_path: str,
+        candidate_name: str,
+        job_posting_id: Optional[int]
+    ) -> Dict[str, Any]:
+        """evaluate_from_pdf_file の本体"""
+        try:
+            resume_text = self.extraction_pool.extract_text_from_file(
+                file_path,
+                max_pages=self.max_pages,
+                max_chars=self.max_chars
+            )
+            return self.evaluate_from_text(resume_text, candidate_name, job_posting_id)
         except FileNotFoundError:
             raise FileNotFoundError(f"PDFファイルが見つかりません: {file_path}")
+        except LLMTransportError:
+            raise
         except Exception as e:
             raise Exception(f"評価処理に失敗しました: {str(e)}")
 
+    def evaluate_from_text(
+        self,
+        resume_text: str,
+        candidate_name: str = "候補者",
+        job_posting_id: Optional[int] = None,
+        prescreen: bool = True
+    ) -> Dict[str, Any]:
+        """
+        抽出済みの履歴書テキストから書類選考の評価を行う
+
+        必須・優遇スキルとのキーワード一致率が PRESCREEN_MIN_SCORE 未満の場合は、
+        Geminiを呼び出さずに事前判定の結果を返す（evaluation_format.prescreen.skipped が True）。
+
+        Args:
+            resume_text: 履歴書・職務経歴書のテキスト
+            candidate_name: 候補者名
+            job_posting_id: 事前判定・総合スコアの重みに使う募集要項ID（未指定の場合は job_requirements.json）
+            prescreen: 事前判定を行うかどうか
+
+        Returns:
+            評価結果のJSON
+        """
+        if prescreen:
+            skipped = self._prescreen(resume_text, job_posting_id)
+            if skipped is not None:
+                return self._add_metadata(skipped, candidate_name)
+
+        # Gemini APIで評価
+        evaluation_result = self.gemini_service.analyze_resume(
+            resume_text=resume_text,
+            job_requirements=self.job_requirements,
+            evaluation_template=self.evaluation_template,
+            job_posting_id=job_posting_id
+        )
+
+        return self._add_metadata(evaluation_result, candidate_name)
+
+    async def evaluate_from_pdf_file_async(
+        self,
+        file_path: str,
+        candidate_name: str = "候補者",
+        on_section: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+        job_posting_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        PDFファイルパスから書類選考の評価を行う（asyncio版）
+
+        PDF抽出はワーカープロセス、Gemini呼び出しは非同期I/Oで待機するため、
+        評価中もイベントループのスレッドを占有しない。
+        同じ内容のPDF・募集要項の評価が実行中の場合は、その結果を待って共有する
+        （その場合 on_section は呼ばれない）。
+
+        Args:
+            file_path: PDFファイルのパス
+            candidate_name: 候補者名
+            on_section: セクションごとの評価を完成した順に受け取るコールバック
+            job_posting_id: 募集要項ID（重複の判定に使う）
+
+        Returns:
+            評価結果のJSON
+
+        Raises:
+            FileNotFoundError: ファイルが見つからない場合
+            LLMTransportError: Gemini APIを呼び出せなかった場合
+            Exception: 評価処理に失敗した場合
+        """
+        content_hash = await self._hash_file_async(file_path)
+        evaluation_result, _ = await self.evaluation_flight.do_async(
+            self._flight_key(content_hash, job_posting_id),
+            lambda: self._evaluate_pdf_file_async(file_path, candidate_name, on_section, job_posting_id)
+        )
+        return evaluation_result
+
+    async def evaluate_and_save_pdf_file_async(
+        self,
+        file_path: str,
+        candidate_name: str = "候補者",
+        on_section: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+        job_posting_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        PDFファイルを評価し、候補者としてデータベースに登録する（asyncio版）
+
+        Slackのイベントの再送や同じファイルの再アップロードで重複して呼ばれても、
+        同じ内容のPDF・募集要項については評価とDB登録を1回だけ行い、結果を共有する。
+        完了後も SINGLE_FLIGHT_RETENTION_SECONDS の間は同じ候補者を返す。
+        面接に進む判定の場合は、登録後に一次面接の質問をバックグラウンドで先回りして生成する。
+
+        Args:
+            file_path: PDFファイルのパス
+            candidate_name: 候補者名
+            on_section: セクションごとの評価を完成した順に受け取るコールバック
+            job_posting_id: 候補者を登録する募集要項ID（未指定の場合はアクティブな募集要項）
+
+        Returns:
+            {"evaluation": 評価結果のJSON, "candidate_id": 候補者ID, "candidate_number": 候補者番号,
+             "shared": 他の呼び出しの結果を共有したかどうか}
+            （DB保存に失敗した場合、候補者ID・候補者番号はNone）
+
+        Raises:
+            FileNotFoundError: ファイルが見つからない場合
+            LLMTransportError: Gemini APIを呼び出せなかった場合
+            Exception: 評価処理に失敗した場合
+        """
+        content_hash = await self._hash_file_async(file_path)
+
+        async def evaluate_and_save():
+            evaluation_result = await self.evaluate_from_pdf_file_async(
+                file_path, candidate_name, on_section, job_posting_id
+            )
+            # 抽出結果はキャッシュ済みのため、候補者の履歴書として保存するテキストを取り直す
+            resume_text = await self.extraction_pool.extract_text_async(
+                file_path,
+                max_pages=self.max_pages,
+                max_chars=self.max_chars
+            )
+            candidate_id, candidate_number = await asyncio.to_thread(
+                self._save_candidate, candidate_name, evaluation_result, job_posting_id, resume_text
+            )
+            self.speculative_questions.schedule(candidate_id, evaluation_result)
+            return {
+                "evaluation": evaluation_result,
+                "candidate_id": candidate_id,
+                "candidate_number": candidate_number,
+            }
+
+        outcome, shared = await self.candidate_flight.do_async(
+            self._flight_key(content_hash, job_posting_id), evaluate_and_save
+        )
+        outcome["shared"] = shared
+        return outcome
+
+    async def _evaluate_pdf_file_async(
+        self,
+        file_path: str,
+        candidate_name: str,
+        on_section: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]],
+        job_posting_id: Optional[int]
+    ) -> Dict[str, Any]:
+        """evaluate_from_pdf_file_async の本体"""
+        try:
+            resume_text = await self.extraction_pool.extract_text_async(
+                file_path,
+                max_pages=self.max_pages,
+                max_chars=self.max_chars
+            )
+            return await self.evaluate_from_text_async(
+                resume_text, candidate_name, on_section, job_posting_id
+            )
+        except FileNotFoundError:
+            raise FileNotFoundError(f"PDFファイルが見つかりません: {file_path}")
+        except LLMTransportError:
+            raise
+        except Exception as e:
+            raise Exception(f"評価処理に失敗しました: {str(e)}")
+
+    async def evaluate_from_text_async(
+        self,
+        resume_text: str,
+        candidate_name: str = "候補者",
+        on_section: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+        job_posting_id: Optional[int] = None,
+        prescreen: bool = True
+    ) -> Dict[str, Any]:
+        """
+        抽出済みの履歴書テキストから書類選考の評価を行う（asyncio版）
+
+        事前判定は evaluate_from_text と同じ。
+
+        Args:
+            resume_text: 履歴書・職務経歴書のテキスト
+            candidate_name: 候補者名
+            on_section: セクションごとの評価を完成した順に受け取るコールバック
+                （指定した場合はGeminiの応答をストリーミングで受け取る）
+            job_posting_id: 事前判定・総合スコアの重みに使う募集要項ID（未指定の場合は job_requirements.json）
+            prescreen: 事前判定を行うかどうか
+
+        Returns:
+            評価結果のJSON
+        """
+        if prescreen:
+            skipped = await asyncio.to_thread(self._prescreen, resume_text, job_posting_id)
+            if skipped is not None:
+                if on_section is not None:
+                    for name, section in skipped["evaluation_format"]["sections"].items():
+                        await on_section(name, section)
+                return self._add_metadata(skipped, candidate_name)
+
+        evaluation_result = await self.gemini_service.analyze_resume_async(
+            resume_text=resume_text,
+            job_requirements=self.job_requirements,
+            evaluation_template=self.evaluation_template,
+            job_posting_id=job_posting_id,
+            on_section=on_section
+        )
+
+        return self._add_metadata(evaluation_result, candidate_name)
+
+    def prescreen_resume(self, resume_text: str, job_posting_id: Optional[int] = None) -> PrescreenResult:
+        """
+        募集要項の必須・優遇スキルと履歴書のキーワード一致率を求める
+
+        Args:
+            resume_text: 履歴書のテキスト
+            job_posting_id: 募集要項ID（スキルが登録されていない場合は job_requirements.json を使う）
+
+        Returns:
+            事前判定の結果
+        """
+        skills = self._prescreen_skills(job_posting_id)
+        return self.prescreen_registry.get(skills).screen(resume_text)
+
+    def _prescreen_skills(self, job_posting_id: Optional[int]) -> Dict[str, Any]:
+        """事前判定に使う必須・優遇スキル"""
+        if job_posting_id:
+            from database import SessionLocal
+            from models.database import JobPosting
+
+            db = SessionLocal()
+            try:
+                job_posting = db.query(JobPosting).filter(JobPosting.id == job_posting_id).first()
+                if job_posting is not None:
+                    skills = skills_from_job_posting(job_posting)
+                    if skills["required"] or skills["preferred"]:
+                        return skills
+            except Exception as e:
+                print(f"[WARNING] 募集要項の取得に失敗したため job_requirements.json で事前判定します: {str(e)}")
+            finally:
+                db.close()
+        return skills_from_requirements(self.job_requirements)
+
+    def _prescreen(self, resume_text: str, job_posting_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        事前判定を行い、一致率が低ければGeminiを呼び出さない場合の評価結果を返す
+
+        Returns:
+            事前判定で見送る場合の評価結果（Geminiで評価する場合は None）
+        """
+        if not self.prescreen_enabled:
+            return None
+        result = self.prescreen_resume(resume_text, job_posting_id)
+        print(
+            f"[INFO] キーワード事前判定: 一致率={result.score:.0%} "
+            f"(必須={result.required_score:.0%}, {result.elapsed_ms:.1f}ms)"
+        )
+        if result.score >= self.prescreen_min_score:
+            return None
+        print("[INFO] 必須・優遇スキルとの一致が少ないため、Geminiでの評価を省略します")
+        return self._prescreened_evaluation(result)
+
+    def _prescreened_evaluation(self, result: PrescreenResult) -> Dict[str, Any]:
+        """事前判定で見送る場合の評価結果（評価テンプレートの形式）"""
+        evaluation_result = fill_from_template({}, self.evaluation_template)
+        eval_data = evaluation_result["evaluation_format"]
+        eval_data["overall_score"] = round(result.score * 10, 1)
+        # 推薦度はGeminiの評価と同じ選択肢にし、事前判定で見送った理由は prescreen に残す
+        eval_data["recommendation"] = REJECTED
+        eval_data["prescreen"] = dict(
+            result.to_dict(),
+            skipped=True,
+            reason=(
+                f"必須・優遇スキルとの一致率 {result.score:.0%} が"
+                f"事前判定の基準 {self.prescreen_min_score:.0%} を下回ったため"
+            )
+        )
+
+        for section in eval_data["sections"].values():
+            section["summary"] = "キーワード事前判定のため未評価"
+        technical = eval_data["sections"].get("technical_skills")
+        if technical is not None:
+            technical["score"] = round(result.required_score * 10)
+            technical["summary"] = (
+                f"募集要項の必須・優遇スキルとの一致率が {result.score:.0%} のため、"
+                "AIによる詳細評価を省略しました"
+            )
+            details = technical.get("details", {})
+            details["technical_strengths"] = [f"記載あり: {label}" for label in result.matched]
+            details["technical_concerns"] = [f"記載なし: {label}" for label in result.missing]
+        return evaluation_result
+
+    @staticmethod
+    def _flight_key(content_hash: str, job_posting_id: Optional[int]) -> str:
+        """重複判定のキー（PDFの内容と募集要項）"""
+        return f"{content_hash}/{job_posting_id or 'default'}"
+
+    @staticmethod
+    async def _hash_file_async(file_path: str) -> str:
+        """PDFファイルのSHA-256（スレッドで計算する）"""
+        try:
+            return await asyncio.to_thread(ExtractionCache.hash_file, file_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"PDFファイルが見つかりません: {file_path}")
+
+    @staticmethod
+    def _save_candidate(
+        candidate_name: str,
+        evaluation_result: Dict[str, Any],
+        job_posting_id: Optional[int],
+        resume_text: Optional[str] = None
+    ):
+        """
+        候補者と評価結果をデータベースに保存する（失敗しても評価結果は返す）
+
+        Returns:
+            (候補者ID, 候補者番号)、保存に失敗した場合は (None, None)
+        """
+        from .candidate_store import save_candidate_evaluation
+
+        try:
+            candidate_id, candidate_number = save_candidate_evaluation(
+                candidate_name, evaluation_result, job_posting_id, resume_text
+            )
+            print(f"[INFO] 候補者をDBに保存しました: {candidate_number}")
+            return candidate_id, candidate_number
+        except Exception as db_error:
+            print(f"[WARNING] DB保存に失敗しましたが、評価結果は返します: {str(db_error)}")
+            return None, None
+
+    def _add_metadata(
+        self,
+        evaluation_result: Dict[str, Any],
+        candidate_name: str
+    ) -> Dict[str, Any]:
+        """評価結果に候補者名・評価日時・応募職種を追加"""
+        evaluation_result["evaluation_format"]["candidate_name"] = candidate_name
+        evaluation_result["evaluation_format"]["evaluation_date"] = (
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+        evaluation_result["evaluation_format"]["position"] = (
+            self.job_requirements.get("job_title", "未指定")
+        )
+
+        return evaluation_result
+
     def format_evaluation_result(self, evaluation_result: Dict[str, Any]) -> str:
         """
         評価結果を読みやすいテキスト形式にフォーマット
@@ -161,17 +576,14 @@ class DocumentEvaluator:
         output.append(f"応募職種: {eval_data.get('position', '未記入')}")
         output.append(f"総合スコア: {eval_data.get('overall_score', 0)}/10")
         output.append(f"推薦度: {eval_data.get('recommendation', '未評価')}")
+        if eval_data.get("prescreen", {}).get("skipped"):
+            output.append("⚡ 必須・優遇スキルとの一致が少ないため、AIによる詳細評価を省略しました")
         output.append("")
 
         sections = eval_data.get("sections", {})
 
         # 各評価セクション
-        for section_key, section_name in [
-            ("technical_skills", "💻 技術スキル"),
-            ("experience_quality", "📚 経験の質"),
-            ("cultural_fit", "🤝 文化適合性"),
-            ("growth_potential", "🌱 成長可能性")
-        ]:
+        for section_key, section_name in self.SECTION_TITLES:
             section_data = sections.get(section_key, {})
             output.append(f"\n{section_name}")
             output.append("-" * 60)
@@ -205,3 +617,33 @@ class DocumentEvaluator:
         output.append("\n" + "=" * 60)
 
         return "\n".join(output)
+
+    def format_section_progress(
+        self,
+        sections: Dict[str, Dict[str, Any]],
+        file_name: str
+    ) -> str:
+        """
+        評価の途中経過（完成したセクションまで）をテキスト形式にフォーマット
+
+        Args:
+            sections: 完成したセクション名ごとの評価
+            file_name: 評価中のファイル名
+
+        Returns:
+            フォーマットされた途中経過のテキスト
+        """
+        done = sum(1 for key, _ in self.SECTION_TITLES if key in sections)
+        output = [f"📄 `{file_name}` を評価中です（{done}/{len(self.SECTION_TITLES)} セクション完了）"]
+
+        for section_key, section_name in self.SECTION_TITLES:
+            section_data = sections.get(section_key)
+            if section_data is None:
+                output.append(f"\n{section_name}: ⏳ 評価中...")
+                continue
+            output.append(
+                f"\n{section_name}: {section_data.get('score', 0)}/{section_data.get('max_score', 10)}"
+            )
+            output.append(section_data.get('summary', '未記入'))
+
+        return "\n".join(output)
@@ -0,0 +1,270 @@
+"""
+Evidence Retrieval
+履歴書の段落をBM25で索引し、募集要項の各項目に関連する箇所だけを
+評価プロンプトに渡すサービス
+"""
+
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from .prescreen import normalize, requirement_keywords
+
+
+# 関連箇所を探す募集要項の項目と表示名
+REQUIREMENT_FIELDS = [
+    ("required_skills", "必須"),
+    ("preferred_skills", "優遇"),
+    ("desired_personality", "人物像"),
+]
+
+_ASCII_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+# ひらがな・カタカナ・漢字の連続（2文字ずつ区切ってトークンにする）
+_CJK_RUN_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff々]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    BM25用のトークン列（英数字は単語、日本語は文字bigram）
+
+    分かち書きの辞書を使わずに、「開発経験」と「開発の経験」のような表記の違いでも
+    共通のbigram（"開発"・"経験"）で一致するようにする。
+
+    Args:
+        text: 対象のテキスト
+
+    Returns:
+        トークンのリスト
+    """
+    text = normalize(text)
+    tokens = _ASCII_TOKEN_RE.findall(text)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def split_passages(text: str, max_chars: int) -> List[str]:
+    """
+    履歴書を検索単位の段落に分ける
+
+    空行区切りの段落を単位とし、max_chars を超える段落は行単位でまとめ直す
+    （PDFから抽出したテキストは空行がないことも多いため）。
+
+    Args:
+        text: 履歴書のテキスト
+        max_chars: 1段落の文字数の上限
+
+    Returns:
+        段落のリスト
+    """
+    passages: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            passages.append(paragraph)
+            continue
+
+        current: List[str] = []
+        size = 0
+        for line in paragraph.split("\n"):
+            for start in range(0, max(1, len(line)), max_chars):
+                piece = line[start:start + max_chars]
+                if current and size + len(piece) + 1 > max_chars:
+                    passages.append("\n".join(current))
+                    current, size = [], 0
+                current.append(piece)
+                size += len(piece) + 1
+        if current:
+            passages.append("\n".join(current))
+    return passages
+
+
+class BM25Index:
+    """段落のBM25索引（Okapi BM25、IDFは負にならないLuceneの式）"""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        """
+        BM25Indexの初期化
+
+        Args:
+            documents: 段落ごとのトークン列
+            k1: 語の出現回数の飽和を調整するパラメータ
+            b: 段落の長さによる正規化の強さ
+        """
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokens) for tokens in documents]
+        self.lengths = [len(tokens) for tokens in documents]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_freqs: Counter = Counter()
+        for term_freq in self.term_freqs:
+            document_freqs.update(term_freq.keys())
+        count = len(documents)
+        self.idf = {
+            term: math.log(1 + (count - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_freqs.items()
+        }
+
+    def search(self, query: List[str], top_k: int) -> List[Tuple[int, float]]:
+        """
+        クエリに関連する段落を探す
+
+        Args:
+            query: クエリのトークン列
+            top_k: 返す段落数の上限
+
+        Returns:
+            [(段落の番号, スコア)]（スコアの高い順、一致する語がない段落は含めない）
+        """
+        terms = [term for term in set(query) if term in self.idf]
+        if not terms:
+            return []
+
+        scores = []
+        for index, term_freq in enumerate(self.term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / (self.average_length or 1))
+            score = 0.0
+            for term in terms:
+                freq = term_freq.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                scores.append((index, score))
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores[:top_k]
+
+
+class EvidenceSet:
+    """募集要項の項目ごとに選んだ履歴書の関連箇所"""
+
+    def __init__(
+        self,
+        passages: List[str],
+        matches: List[Tuple[str, str, List[int]]],
+        selected: List[int],
+        original_chars: int,
+        elapsed_ms: float
+    ):
+        """
+        EvidenceSetの初期化
+
+        Args:
+            passages: 履歴書の全段落
+            matches: [(項目の種類, 募集要項の項目, 関連する段落の番号)]
+            selected: プロンプトに含める段落の番号（元の順）
+            original_chars: 履歴書の文字数
+            elapsed_ms: 索引・検索にかかった時間（ミリ秒）
+        """
+        self.passages = passages
+        self.matches = matches
+        self.selected = selected
+        self.original_chars = original_chars
+        self.elapsed_ms = elapsed_ms
+
+    def render(self) -> str:
+        """評価プロンプトの履歴書セクションに入れるテキスト"""
+        lines = [
+            f"（履歴書全{len(self.passages)}段落のうち、募集要項の各項目に関連する"
+            f"{len(self.selected)}段落を抜粋しています。[n] は段落番号）",
+            "",
+            "## 抜粋",
+        ]
+        for index in self.selected:
+            lines.append(f"[{index + 1}] {self.passages[index]}")
+
+        lines.extend(["", "## 募集要項の項目と関連する段落"])
+        for label, requirement, hits in self.matches:
+            refs = ", ".join(f"[{index + 1}]" for index in hits) if hits else "該当なし"
+            lines.append(f"- {label}: {requirement} → {refs}")
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ログ・ベンチマーク用の要約"""
+        return {
+            "passages": len(self.passages),
+            "selected": len(self.selected),
+            "original_chars": self.original_chars,
+            "selected_chars": sum(len(self.passages[index]) for index in self.selected),
+            "unmatched": [requirement for _, requirement, hits in self.matches if not hits],
+            "elapsed_ms": round(self.elapsed_ms, 2),
+        }
+
+
+class EvidenceRetriever:
+    """募集要項の各項目に関連する履歴書の段落を選ぶクラス
+
+    評価ごとに履歴書の段落でBM25の索引を作り、required_skills・preferred_skills・
+    desired_personality の各項目をクエリとして上位 top_k 段落を取り出す。
+    クエリには項目の記述に加え、スキルの関連語（prescreen.SKILL_SYNONYMS）も含める。
+    先頭の段落（氏名・職務要約）は常に含める。
+    """
+
+    def __init__(
+        self,
+        top_k: Optional[int] = None,
+        passage_chars: Optional[int] = None,
+        min_chars: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        EvidenceRetrieverの初期化
+
+        Args:
+            top_k: 1項目あたりに取り出す段落数（未指定の場合は環境変数から取得）
+            passage_chars: 1段落の文字数の上限（未指定の場合は環境変数から取得）
+            min_chars: 抜粋に切り替える履歴書の文字数（未指定の場合は環境変数から取得）
+            enabled: 抜粋を使うかどうか（未指定の場合は環境変数から取得）
+        """
+        self.top_k = top_k or int(os.getenv("EVIDENCE_TOP_K", "3"))
+        self.passage_chars = passage_chars or int(os.getenv("EVIDENCE_PASSAGE_CHARS", "400"))
+        self.min_chars = min_chars or int(os.getenv("EVIDENCE_MIN_CHARS", "3000"))
+        if enabled is None:
+            enabled = os.getenv("EVIDENCE_RETRIEVAL_ENABLED", "true").lower() != "false"
+        self.enabled = enabled
+
+    def should_retrieve(self, resume_text: str) -> bool:
+        """抜粋に切り替えるかどうか（短い履歴書は全文を使う）"""
+        return self.enabled and bool(resume_text) and len(resume_text) > self.min_chars
+
+    def retrieve(self, resume_text: str, job_requirements: Dict[str, Any]) -> EvidenceSet:
+        """
+        募集要項の各項目に関連する段落を選ぶ
+
+        Args:
+            resume_text: 履歴書のテキスト
+            job_requirements: 募集要項（required_skills などのリストを含む）
+
+        Returns:
+            EvidenceSet
+        """
+        started = time.perf_counter()
+        passages = split_passages(resume_text, self.passage_chars)
+        index = BM25Index([tokenize(passage) for passage in passages])
+
+        matches: List[Tuple[str, str, List[int]]] = []
+        selected = {0} if passages else set()
+        for field, label in REQUIREMENT_FIELDS:
+            for requirement in job_requirements.get(field) or []:
+                query = tokenize(requirement)
+                for keyword in requirement_keywords(requirement):
+                    query.extend(tokenize(keyword))
+                hits = sorted(passage for passage, _ in index.search(query, self.top_k))
+                selected.update(hits)
+                matches.append((label, requirement, hits))
+
+        return EvidenceSet(
+            passages,
+            matches,
+            sorted(selected),
+            len(resume_text),
+            (time.perf_counter() - started) * 1000
+        )
@@ -0,0 +1,161 @@
+"""
+PDF Extraction Cache
+PDFのハッシュをキーに抽出結果を保存するキャッシュサービス
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func
+
+from database import SessionLocal, engine
+from models.database import PDFExtractionCache
+from .pdf_parser import PDFParser
+
+
+class ExtractionCache:
+    """PDF抽出結果をDBに保存するLRUキャッシュ
+
+    キーは PDF バイトの SHA-256 と PDFParser.PARSER_VERSION の組。
+    同じPDFの再アップロードはハッシュ計算だけで抽出結果を返せる。
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        """
+        ExtractionCacheの初期化
+
+        Args:
+            max_bytes: キャッシュに保持するテキストの合計バイト数の上限
+        """
+        self.max_bytes = max_bytes or int(
+            os.getenv("PDF_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+        )
+        self.parser_version = PDFParser.PARSER_VERSION
+        self._table_ready = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash_bytes(pdf_bytes: bytes) -> str:
+        """PDFバイトデータのSHA-256を返す"""
+        return hashlib.sha256(pdf_bytes).hexdigest()
+
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """PDFファイルのSHA-256を返す（メモリマップ経由で、ファイル全体を読み込まない）"""
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return hashlib.sha256(b"").hexdigest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return hashlib.sha256(mapped).hexdigest()
+
+    def _ensure_table(self):
+        """キャッシュテーブルがなければ作成する（--no-db の一括評価CLIなど init_db を呼ばない経路でも使うため）"""
+        if self._table_ready:
+            return
+        with self._lock:
+            if not self._table_ready:
+                PDFExtractionCache.__table__.create(bind=engine, checkfirst=True)
+                self._table_ready = True
+
+    def get(self, content_hash: str, parser_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュから抽出結果を取得
+
+        Args:
+            content_hash: PDFバイトのSHA-256
+            parser_version: キャッシュキーのバージョン（抽出上限などを含める場合に指定）
+
+        Returns:
+            {"text": テキスト, "page_count": ページ数}、キャッシュにない場合はNone
+        """
+        parser_version = parser_version or self.parser_version
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                entry = db.query(PDFExtractionCache).filter(
+                    PDFExtractionCache.content_hash == content_hash,
+                    PDFExtractionCache.parser_version == parser_version
+                ).first()
+                if not entry:
+                    return None
+
+                entry.hit_count = (entry.hit_count or 0) + 1
+                entry.last_accessed_at = datetime.utcnow()
+                db.commit()
+
+                return {"text": entry.text, "page_count": entry.page_count}
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"[WARNING] 抽出キャッシュの参照に失敗しました: {str(e)}")
+            return None
+
+    def put(
+        self,
+        content_hash: str,
+        text: str,
+        page_count: int,
+        parser_version: Optional[str] = None
+    ):
+        """
+        抽出結果をキャッシュに保存し、容量超過分を古い順に削除する
+
+        Args:
+            content_hash: PDFバイトのSHA-256
+            text: 抽出されたテキスト
+            page_count: ページ数
+            parser_version: キャッシュキーのバージョン（抽出上限などを含める場合に指定）
+        """
+        parser_version = parser_version or self.parser_version
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                exists = db.query(PDFExtractionCache.id).filter(
+                    PDFExtractionCache.content_hash == content_hash,
+                    PDFExtractionCache.parser_version == parser_version
+                ).first()
+                if exists:
+                    return
+
+                db.add(PDFExtractionCache(
+                    content_hash=content_hash,
+                    parser_version=parser_version,
+                    text=text,
+                    page_count=page_count,
+                    size_bytes=len(text.encode("utf-8"))
+                ))
+                db.flush()
+
+                self._evict(db)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"[WARNING] 抽出キャッシュの保存に失敗しました: {str(e)}")
+
+    def _evict(self, db):
+        """合計サイズが上限を超えている間、最終アクセスが古いものから削除する"""
+        total = db.query(func.coalesce(func.sum(PDFExtractionCache.size_bytes), 0)).scalar()
+        if total <= self.max_bytes:
+            return
+
+        entries = db.query(
+            PDFExtractionCache.id, PDFExtractionCache.size_bytes
+        ).order_by(PDFExtractionCache.last_accessed_at.asc()).all()
+
+        for entry_id, size_bytes in entries:
+            if total <= self.max_bytes:
+                break
+            db.query(PDFExtractionCache).filter(
+                PDFExtractionCache.id == entry_id
+            ).delete(synchronize_session=False)
+            total -= size_bytes or 0
@@ -0,0 +1,268 @@
+"""
+PDF Extraction Pool
+PDFテキスト抽出をワーカープロセスで並列実行するサービス
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from .pdf_parser import PDFParser, PDFSource
+from .extraction_cache import ExtractionCache
+from .pdf_sandbox import SandboxLimits, run_sandboxed
+from .text_normalizer import TextNormalizer
+
+
+class ExtractionQueueFullError(Exception):
+    """抽出キューが満杯で受け付けられない場合の例外"""
+
+
+def _cache_version(max_pages: Optional[int], max_chars: Optional[int], normalize: bool) -> str:
+    """抽出上限・正規化の有無ごとに別エントリとなるキャッシュキーのバージョン文字列"""
+    normalizer_version = TextNormalizer.VERSION if normalize else "0"
+    return (
+        f"{PDFParser.PARSER_VERSION}/p{max_pages or 0}/c{max_chars or 0}"
+        f"/n{normalizer_version}"
+    )
+
+
+class PDFExtractionPool:
+    """PDF抽出をワーカープロセスで実行するクラス
+
+    pdfplumber / PyPDF2 の解析はCPUバウンドでGILを保持するため、
+    Slackイベントやリクエストを処理するスレッドから切り離して実行する。
+    各ジョブは資源制限付きの子プロセス（pdf_sandbox）で実行され、
+    不正なPDFで解析が止まらなくなっても制限時間で強制終了される。
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_queue_size: Optional[int] = None,
+        cache: Optional[ExtractionCache] = None,
+        normalize: Optional[bool] = None
+    ):
+        """
+        PDFExtractionPoolの初期化
+
+        Args:
+            max_workers: ワーカープロセス数（未指定の場合は環境変数またはCPU数）
+            timeout: 1ジョブあたりのタイムアウト秒数（子プロセスの経過時間上限）
+            max_queue_size: 同時に受け付けるジョブ数の上限（実行中＋待機中）
+            cache: 抽出結果キャッシュ（未指定の場合は既定のキャッシュを使用）
+            normalize: 抽出後にテキストを正規化するかどうか（未指定の場合は環境変数から取得）
+        """
+        self.max_workers = max_workers or int(
+            os.getenv("PDF_EXTRACTION_WORKERS", str(os.cpu_count() or 1))
+        )
+        self.timeout = timeout or float(os.getenv("PDF_EXTRACTION_TIMEOUT", "60"))
+        self.max_queue_size = max_queue_size or int(
+            os.getenv("PDF_EXTRACTION_QUEUE_SIZE", "32")
+        )
+
+        self.cache = cache or ExtractionCache()
+        if normalize is None:
+            normalize = os.getenv("RESUME_NORMALIZE", "true").lower() != "false"
+        self.normalize = normalize
+        self.limits = SandboxLimits(wall_seconds=self.timeout)
+
+        # 各スレッドは子プロセスの完了を待つだけなので、同時実行プロセス数＝スレッド数となる
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_queue_size)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """ディスパッチ用のスレッドプールを遅延生成して返す"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="pdf-extraction"
+                )
+            return self._executor
+
+    def submit(
+        self,
+        source: PDFSource,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> Future:
+        """
+        抽出ジョブを投入する
+
+        Args:
+            source: PDFのバイトデータ、またはPDFファイルのパス
+            max_pages: 抽出するページ数の上限
+            max_chars: 抽出する文字数の上限
+
+        Returns:
+            抽出結果（{"text", "page_count"}）を返すFuture
+
+        Raises:
+            ExtractionQueueFullError: キューが満杯のまま空かなかった場合
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise ExtractionQueueFullError(
+                f"PDF抽出キューが満杯です（上限: {self.max_queue_size}件）"
+            )
+
+        try:
+            future = self._get_executor().submit(
+                run_sandboxed, source, max_pages, max_chars, self.normalize, self.limits
+            )
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def extract_text(
+        self,
+        pdf_bytes: bytes,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> str:
+        """
+        PDFバイトデータからテキストを抽出（完了まで待機）
+
+        Args:
+            pdf_bytes: PDFファイルのバイトデータ
+            max_pages: 抽出するページ数の上限
+            max_chars: 抽出する文字数の上限
+
+        Returns:
+            抽出されたテキスト
+
+        Raises:
+            ExtractionQueueFullError: キューが満杯の場合
+            ExtractionError: 抽出に失敗・タイムアウトした場合
+        """
+        content_hash = ExtractionCache.hash_bytes(pdf_bytes)
+        return self._extract(pdf_bytes, content_hash, max_pages, max_chars)
+
+    def extract_text_from_file(
+        self,
+        file_path: str,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> str:
+        """
+        PDFファイルからテキストを抽出（完了まで待機）
+
+        ファイルはハッシュ計算・抽出ともにメモリマップで読むため、
+        PDF本体をbytesとしてプロセス内に保持しない。
+
+        Args:
+            file_path: PDFファイルのパス
+            max_pages: 抽出するページ数の上限
+            max_chars: 抽出する文字数の上限
+
+        Returns:
+            抽出されたテキスト
+
+        Raises:
+            FileNotFoundError: ファイルが見つからない場合
+            ExtractionQueueFullError: キューが満杯の場合
+            ExtractionError: 抽出に失敗・タイムアウトした場合
+        """
+        content_hash = ExtractionCache.hash_file(file_path)
+        return self._extract(file_path, content_hash, max_pages, max_chars)
+
+    def _extract(
+        self,
+        source: PDFSource,
+        content_hash: str,
+        max_pages: Optional[int],
+        max_chars: Optional[int]
+    ) -> str:
+        """キャッシュを確認し、なければワーカーで抽出してキャッシュに保存する"""
+        version = _cache_version(max_pages, max_chars, self.normalize)
+        cached = self.cache.get(content_hash, version)
+        if cached:
+            return cached["text"]
+
+        # タイムアウトは子プロセス側で強制されるため、ここでは完了を待つだけでよい
+        result = self.submit(source, max_pages, max_chars).result()
+
+        self._log_result(result)
+        self.cache.put(content_hash, result["text"], result["page_count"], version)
+        return result["text"]
+
+    async def extract_text_async(
+        self,
+        source: PDFSource,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> str:
+        """
+        PDFからテキストを抽出（asyncio版）
+
+        Args:
+            source: PDFのバイトデータ、またはPDFファイルのパス
+            max_pages: 抽出するページ数の上限
+            max_chars: 抽出する文字数の上限
+
+        Returns:
+            抽出されたテキスト
+        """
+        if isinstance(source, bytes):
+            content_hash = ExtractionCache.hash_bytes(source)
+        else:
+            content_hash = await asyncio.to_thread(ExtractionCache.hash_file, source)
+
+        version = _cache_version(max_pages, max_chars, self.normalize)
+        cached = await asyncio.to_thread(self.cache.get, content_hash, version)
+        if cached:
+            return cached["text"]
+
+        result = await asyncio.wrap_future(self.submit(source, max_pages, max_chars))
+
+        self._log_result(result)
+        await asyncio.to_thread(
+            self.cache.put, content_hash, result["text"], result["page_count"], version
+        )
+        return result["text"]
+
+    @staticmethod
+    def _log_result(result: Dict[str, Any]):
+        """ページごとの抽出方式をログに出力"""
+        strategies = result.get("page_strategies", [])
+        escalated = sum(1 for s in strategies if s == PDFParser.STRATEGY_PDFPLUMBER)
+        print(
+            f"[INFO] PDF抽出完了: {len(strategies)}/{result.get('page_count', 0)}ページ "
+            f"(pdfplumberへのエスカレーション: {escalated}ページ"
+            f"{', 上限により打ち切り' if result.get('truncated') else ''})"
+        )
+
+        normalization = result.get("normalization")
+        if normalization:
+            print(
+                f"[INFO] テキスト正規化: {normalization['original_chars']}文字 → "
+                f"{normalization['normalized_chars']}文字 "
+                f"({normalization['chars_saved']}文字削減、"
+                f"定型行 {normalization['boilerplate_lines_removed']}行を除去)"
+            )
+
+    def shutdown(self, wait: bool = True):
+        """ワーカーを停止する"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+
+_extraction_pool: Optional[PDFExtractionPool] = None
+_extraction_pool_lock = threading.Lock()
+
+
+def get_extraction_pool() -> PDFExtractionPool:
+    """プロセス共通のPDFExtractionPoolを取得する"""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            _extraction_pool = PDFExtractionPool()
+        return _extraction_pool
@@ -5,11 +5,52 @@ GeminiAIを利用してテキスト生成・解析を行うサービス
 
 import os
 import json
-from typing import Dict, Any, Optional
-import google.generativeai as genai
+import asyncio
+import contextvars
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+
+from .model_registry import get_model, resolve_api_key
+from .gemini_transport import LLMTransportError, get_gemini_transport
+from .llm_metrics import (
+    OP_EVALUATION,
+    OP_TEXT,
+    PARSE_FAILED,
+    PARSE_OK,
+    PARSE_REPAIRED,
+    llm_call,
+    record_cache_hit,
+)
+from .response_cache import KIND_EVALUATION, get_response_cache
+from .resume_digest import get_resume_digester
+from .evidence_retrieval import EvidenceRetriever
+from .section_fanout import (
+    load_criteria,
+    merge_sections,
+    parse_section,
+    section_instruction,
+    section_output_template,
+    section_templates,
+    section_weights,
+)
+from .prompt_prefix import CompiledPrefix, format_token_report, get_prompt_prefix_registry
+from .structured_output import (
+    StreamingObjectParser,
+    fill_from_template,
+    json_generation_config,
+    parse_json_lenient,
+    schema_from_template,
+)
 
 
 class GeminiService:
+    # 評価生成時のパラメータ（一貫性のある評価のため temperature は低めに設定）
+    EVALUATION_CONFIG = {
+        "temperature": 0.2,
+        "top_p": 0.8,
+        "top_k": 40,
+    }
+
     def __init__(self, api_key: Optional[str] = None):
         """
         GeminiServiceの初期化
@@ -17,12 +58,18 @@ class GeminiService:
         Args:
             api_key: Gemini API Key（未指定の場合は環境変数から取得）
         """
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.api_key = resolve_api_key(api_key)
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY is not set")
 
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        self.model = get_model(api_key=self.api_key)
+        self.response_cache = get_response_cache()
+        self.prompt_prefixes = get_prompt_prefix_registry()
+        self.transport = get_gemini_transport()
+        self.digester = get_resume_digester()
+        self.evidence_retriever = EvidenceRetriever()
+        # セクションごとに並行して評価し、総合スコアなどをローカルで組み立てる
+        self.fanout_enabled = os.getenv("EVALUATION_FANOUT", "false").lower() == "true"
 
     def generate_text(self, prompt: str, **kwargs) -> str:
         """
@@ -36,8 +83,11 @@ class GeminiService:
             生成されたテキスト
         """
         try:
-            response = self.model.generate_content(prompt, **kwargs)
+            with llm_call(OP_TEXT):
+                response = self.transport.generate(self.model, prompt, **kwargs)
             return response.text
+        except LLMTransportError:
+            raise
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
 
@@ -45,97 +95,512 @@ class GeminiService:
         self,
         resume_text: str,
         job_requirements: Dict[str, Any],
-        evaluation_template: Dict[str, Any]
+        evaluation_template: Dict[str, Any],
+        job_posting_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         履歴書・職務経歴書を解析し、評価を生成
 
+        RESUME_MAPREDUCE_MIN_CHARS を超える履歴書は、全文をパートごとに並行して要約し、
+        まとめた要約文で評価する（要約は履歴書ごとにキャッシュされ、質問生成でも再利用される）。
+        EVIDENCE_MIN_CHARS を超え、要約するほど長くない履歴書は、募集要項の各項目に関連する段落の抜粋で評価する。
+        EVALUATION_FANOUT=true の場合は、セクションごとの評価を並行して生成してまとめる。
+
         Args:
             resume_text: PDFから抽出した履歴書のテキスト
             job_requirements: 募集要項の情報
             evaluation_template: 評価フォーマットのテンプレート
+            job_posting_id: 募集要項ID（応答キャッシュを募集要項の更新時に無効化するため）
 
         Returns:
             評価結果のJSON
+
+        Raises:
+            LLMTransportError: レート制限・タイムアウト・障害でGemini APIを呼び出せなかった場合
         """
-        prompt = self._create_evaluation_prompt(
-            resume_text,
-            job_requirements,
-            evaluation_template
-        )
+        # 長い履歴書は全文をパートごとに要約し（質問生成と同じ要約を再利用するため）、
+        # 要約するほど長くなければ関連箇所の抜粋にしてから評価する
+        if self.digester.should_digest(resume_text):
+            resume_text = self.digester.digest(resume_text)
+        else:
+            resume_text = self._select_evidence(resume_text, job_requirements)
+
+        prefix = self.prompt_prefixes.get(job_requirements, evaluation_template, self.model)
+        if self.fanout_enabled:
+            return self._analyze_sections(
+                prefix, resume_text, job_requirements, evaluation_template, job_posting_id
+            )
+        prompt = prefix.render(resume_text)
 
+        generation_config = self._evaluation_generation_config(evaluation_template)
+
+        # 同じプロンプト・パラメータの評価済み応答があれば再利用する
+        cache_key = self._evaluation_cache_key(prompt, generation_config)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            record_cache_hit(OP_EVALUATION)
+            return self._parse_evaluation(cached, evaluation_template)[0]
+
+        with llm_call(OP_EVALUATION) as call:
+            try:
+                model, contents = self._evaluation_target(prefix, resume_text, prompt)
+                response = self.transport.generate(
+                    model,
+                    contents,
+                    generation_config=generation_config
+                )
+                self._log_token_report(prefix, resume_text, response)
+                evaluation_result, repaired = self._parse_evaluation(response.text, evaluation_template)
+                call.parse = PARSE_REPAIRED if repaired else PARSE_OK
+
+            except json.JSONDecodeError as e:
+                call.parse = PARSE_FAILED
+                raise Exception(f"Failed to parse evaluation result as JSON: {str(e)}")
+            except LLMTransportError:
+                raise
+            except Exception as e:
+                raise Exception(f"Resume analysis error: {str(e)}")
+
+        # 修復なしで解析できた応答だけを保存する
+        if not repaired:
+            self.response_cache.put(cache_key, response.text, KIND_EVALUATION, job_posting_id)
+        return evaluation_result
+
+    def _analyze_sections(
+        self,
+        prefix: CompiledPrefix,
+        resume_text: str,
+        job_requirements: Dict[str, Any],
+        evaluation_template: Dict[str, Any],
+        job_posting_id: Optional[int]
+    ) -> Dict[str, Any]:
+        """
+        セクションごとの評価をスレッドで並行して生成し、1つの評価結果にまとめる
+
+        総合スコアは募集要項の評価基準（EvaluationCriteria.weight）の重みで計算する。
+        いずれかのセクションが失敗した時点で、他のセクションを待たずに例外を送出する
+        （実行中の呼び出しは中断できないため、バックグラウンドで完了させて結果を捨てる）。
+        """
+        templates = section_templates(evaluation_template)
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, len(templates)), thread_name_prefix="evaluation-section"
+        )
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.2,  # 一貫性のある評価のため低めに設定
-                    "top_p": 0.8,
-                    "top_k": 40,
-                }
+            # レーン（対話的な処理・バッチ処理）をスレッドにも引き継ぐ
+            futures = {
+                name: executor.submit(
+                    contextvars.copy_context().run,
+                    self._evaluate_section, prefix, resume_text, name, template, job_posting_id
+                )
+                for name, template in templates.items()
+            }
+            done, _ = wait(futures.values(), return_when=FIRST_EXCEPTION)
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+            results = {name: future.result() for name, future in futures.items()}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        weights = section_weights(evaluation_template, job_requirements, load_criteria(job_posting_id))
+        return self._merge_sections(evaluation_template, results, weights)
+
+    def _evaluate_section(
+        self,
+        prefix: CompiledPrefix,
+        resume_text: str,
+        name: str,
+        section_template: Dict[str, Any],
+        job_posting_id: Optional[int]
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        1セクション分の評価を生成する
+
+        Returns:
+            (セクションの評価, 面接で確認すべき点)
+        """
+        prompt, generation_config = self._section_request(prefix, resume_text, name, section_template)
+        cache_key = self._evaluation_cache_key(prompt, generation_config)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            record_cache_hit(OP_EVALUATION)
+            return parse_section(cached, section_template)[:2]
+
+        with llm_call(OP_EVALUATION) as call:
+            try:
+                model, contents = self._section_target(prefix, resume_text, name, section_template, prompt)
+                response = self.transport.generate(
+                    model,
+                    contents,
+                    generation_config=generation_config
+                )
+                section, clarifications, repaired = parse_section(response.text, section_template)
+                call.parse = PARSE_REPAIRED if repaired else PARSE_OK
+
+            except json.JSONDecodeError as e:
+                call.parse = PARSE_FAILED
+                raise Exception(f"Failed to parse {name} evaluation as JSON: {str(e)}")
+            except LLMTransportError:
+                raise
+            except Exception as e:
+                raise Exception(f"Resume analysis error ({name}): {str(e)}")
+
+        if not repaired:
+            self.response_cache.put(cache_key, response.text, KIND_EVALUATION, job_posting_id)
+        return section, clarifications
+
+    def _section_request(
+        self,
+        prefix: CompiledPrefix,
+        resume_text: str,
+        name: str,
+        section_template: Dict[str, Any]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """1セクション分のプロンプトと、そのセクションのスキーマを指定した生成パラメータ"""
+        prompt = f"{prefix.render(resume_text)}\n\n{section_instruction(name, section_template)}"
+        generation_config = json_generation_config(
+            self.EVALUATION_CONFIG, schema_from_template(section_output_template(section_template))
+        )
+        return prompt, generation_config
+
+    def _section_target(
+        self,
+        prefix: CompiledPrefix,
+        resume_text: str,
+        name: str,
+        section_template: Dict[str, Any],
+        prompt: str
+    ):
+        """1セクション分の評価に使うモデルと送信内容（固定部分はセクション間で共通のキャッシュを使う）"""
+        cached_model = self.prompt_prefixes.get_cached_model(prefix, self.model.model_name)
+        if cached_model is not None:
+            return cached_model, (
+                f"{prefix.resume_section(resume_text)}\n\n{section_instruction(name, section_template)}"
             )
+        return self.model, prompt
 
-            # JSON形式で返す
-            result_text = response.text
+    @staticmethod
+    def _merge_sections(
+        evaluation_template: Dict[str, Any],
+        results: Dict[str, Tuple[Dict[str, Any], List[str]]],
+        weights: Dict[str, float]
+    ) -> Dict[str, Any]:
+        """セクションごとの評価をテンプレートの順にまとめ、総合スコアをログに出力する"""
+        sections = {name: section for name, (section, _) in results.items()}
+        clarifications = [item for _, items in results.values() for item in items]
+        evaluation_result = merge_sections(evaluation_template, sections, clarifications, weights)
+        eval_data = evaluation_result["evaluation_format"]
+        print(
+            f"[INFO] セクションごとの評価をまとめました: 総合スコア={eval_data['overall_score']} "
+            f"({eval_data['recommendation']}, 重み={weights})"
+        )
+        return evaluation_result
 
-            # ```json ... ``` のマークダウン記法を除去
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
+    def _select_evidence(self, resume_text: str, job_requirements: Dict[str, Any]) -> str:
+        """
+        募集要項の各項目に関連する段落を抜粋する（短い履歴書・無効な場合はそのまま返す）
 
-            evaluation_result = json.loads(result_text)
-            return evaluation_result
+        Args:
+            resume_text: 履歴書のテキスト
+            job_requirements: 募集要項の情報
+
+        Returns:
+            評価プロンプトに入れる履歴書のテキスト
+        """
+        if not self.evidence_retriever.should_retrieve(resume_text):
+            return resume_text
+        evidence = self.evidence_retriever.retrieve(resume_text, job_requirements)
+        rendered = evidence.render()
+        summary = evidence.to_dict()
+        print(
+            f"[INFO] 募集要項に関連する段落を抜粋しました: {summary['selected']}/{summary['passages']}段落, "
+            f"{summary['original_chars']}文字 → {len(rendered)}文字 ({summary['elapsed_ms']}ms)"
+        )
+        return rendered
+
+    def _evaluation_generation_config(self, evaluation_template: Dict[str, Any]) -> Dict[str, Any]:
+        """評価テンプレートから導いたJSONスキーマを指定した生成パラメータ"""
+        return json_generation_config(
+            self.EVALUATION_CONFIG, schema_from_template(evaluation_template)
+        )
+
+    def _evaluation_cache_key(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        """評価プロンプトの応答キャッシュキー"""
+        return self.response_cache.make_key(
+            self.model.model_name, prompt, generation_config
+        )
+
+    @staticmethod
+    def _parse_evaluation(
+        result_text: str,
+        evaluation_template: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Geminiの応答テキストから評価結果のJSONを取り出す
+
+        途中で切れた応答は修復し、欠けた項目を評価テンプレートの既定値で補う。
+
+        Args:
+            result_text: Geminiの応答テキスト
+            evaluation_template: 評価フォーマットのテンプレート
 
-        except json.JSONDecodeError as e:
-            raise Exception(f"Failed to parse evaluation result as JSON: {str(e)}")
+        Returns:
+            (評価結果のJSON, 修復したかどうか)
+
+        Raises:
+            json.JSONDecodeError: 修復しても解析できない場合
+        """
+        evaluation_result, repaired = parse_json_lenient(result_text)
+        if repaired:
+            print("[WARNING] 評価結果のJSONが不完全だったため修復しました")
+            evaluation_result = fill_from_template(evaluation_result, evaluation_template)
+        return evaluation_result, repaired
+
+    def _evaluation_target(self, prefix: CompiledPrefix, resume_text: str, prompt: str):
+        """
+        評価に使うモデルと送信内容を決める
+
+        固定部分がコンテキストキャッシュに登録できた場合は、キャッシュ済みのモデルに
+        履歴書セクションだけを送る。それ以外はプロンプト全体を送る。
+        """
+        cached_model = self.prompt_prefixes.get_cached_model(prefix, self.model.model_name)
+        if cached_model is not None:
+            return cached_model, prefix.resume_section(resume_text)
+        return self.model, prompt
+
+    @staticmethod
+    def _log_token_report(prefix: CompiledPrefix, resume_text: str, response: Any):
+        """セクションごとのトークン数をログに出力"""
+        report = prefix.token_report(resume_text, response)
+        print(f"[INFO] 評価プロンプトのトークン内訳: {format_token_report(report)}")
+
+
+class AsyncGeminiService(GeminiService):
+    """GeminiServiceのasyncio版
+
+    generate_content_async を使うため、応答を待つ間スレッドを占有しない。
+    同時呼び出し数・リトライは GeminiTransport が制御する。
+    同期版のメソッドもそのまま利用できる。
+    """
+
+    async def generate_text_async(self, prompt: str, **kwargs) -> str:
+        """
+        プロンプトからテキストを生成（asyncio版）
+
+        Args:
+            prompt: 生成用のプロンプト
+            **kwargs: 追加のパラメータ
+
+        Returns:
+            生成されたテキスト
+        """
+        try:
+            with llm_call(OP_TEXT):
+                response = await self.transport.generate_async(self.model, prompt, **kwargs)
+            return response.text
+        except LLMTransportError:
+            raise
         except Exception as e:
-            raise Exception(f"Resume analysis error: {str(e)}")
+            raise Exception(f"Gemini API error: {str(e)}")
 
-    def _create_evaluation_prompt(
+    async def analyze_resume_async(
         self,
         resume_text: str,
         job_requirements: Dict[str, Any],
-        evaluation_template: Dict[str, Any]
-    ) -> str:
+        evaluation_template: Dict[str, Any],
+        job_posting_id: Optional[int] = None,
+        on_section: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
         """
-        評価用のプロンプトを生成
+        履歴書・職務経歴書を解析し、評価を生成（asyncio版）
+
+        on_section を指定した場合は応答をストリーミングで受け取り、
+        各評価セクション（technical_skills など）が完結した時点で
+        on_section(セクション名, セクションの評価) を呼び出す。
+        長い履歴書の抜粋・要約は analyze_resume と同じ。
+        EVALUATION_FANOUT=true の場合は、セクションごとの評価を並行して生成し、
+        完成したセクションから on_section に渡す。
 
         Args:
-            resume_text: 履歴書のテキスト
-            job_requirements: 募集要項
-            evaluation_template: 評価テンプレート
+            resume_text: PDFから抽出した履歴書のテキスト
+            job_requirements: 募集要項の情報
+            evaluation_template: 評価フォーマットのテンプレート
+            job_posting_id: 募集要項ID（応答キャッシュを募集要項の更新時に無効化するため）
+            on_section: セクションごとの評価を受け取るコールバック
 
         Returns:
-            プロンプト文字列
+            評価結果のJSON
+
+        Raises:
+            LLMTransportError: レート制限・タイムアウト・障害でGemini APIを呼び出せなかった場合
         """
-        prompt = f"""
-あなたは経験豊富な採用担当者です。以下の履歴書・職務経歴書を分析し、募集要項に基づいて客観的に評価してください。
+        if self.digester.should_digest(resume_text):
+            resume_text = await self.digester.digest_async(resume_text)
+        else:
+            resume_text = await asyncio.to_thread(self._select_evidence, resume_text, job_requirements)
+
+        prefix = await asyncio.to_thread(
+            self.prompt_prefixes.get, job_requirements, evaluation_template, self.model
+        )
+        if self.fanout_enabled:
+            return await self._analyze_sections_async(
+                prefix, resume_text, job_requirements, evaluation_template, job_posting_id, on_section
+            )
+        prompt = prefix.render(resume_text)
+
+        generation_config = self._evaluation_generation_config(evaluation_template)
 
-# 募集要項
-{json.dumps(job_requirements, ensure_ascii=False, indent=2)}
+        cache_key = self._evaluation_cache_key(prompt, generation_config)
+        cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+        if cached is not None:
+            record_cache_hit(OP_EVALUATION)
+            evaluation_result = self._parse_evaluation(cached, evaluation_template)[0]
+            await self._emit_sections(evaluation_result, on_section, set())
+            return evaluation_result
 
-# 評価フォーマット
-以下のJSON形式で評価結果を出力してください：
-{json.dumps(evaluation_template, ensure_ascii=False, indent=2)}
+        emitted = set()
+        with llm_call(OP_EVALUATION) as call:
+            try:
+                model, contents = await asyncio.to_thread(
+                    self._evaluation_target, prefix, resume_text, prompt
+                )
+                if on_section is None:
+                    response = await self.transport.generate_async(
+                        model,
+                        contents,
+                        generation_config=generation_config
+                    )
+                else:
+                    parser = StreamingObjectParser(self._section_paths(evaluation_template))
 
-# 履歴書・職務経歴書
-{resume_text}
+                    async def on_text(text: str):
+                        for path, section in parser.feed(text):
+                            emitted.add(path[-1])
+                            await on_section(path[-1], section)
 
-# 評価の指針
-1. **技術スキル (technical_skills)**: 必須スキル・優遇スキルとの合致度を詳細に評価
-2. **経験の質 (experience_quality)**: プロジェクト経験の深さ、成果、責任範囲を評価
-3. **文化適合性 (cultural_fit)**: 企業価値観との一致度、コミュニケーションスタイルを評価
-4. **成長可能性 (growth_potential)**: 学習意欲、スキルの発展軌跡、適応力を評価
+                    response = await self.transport.generate_stream_async(
+                        model,
+                        contents,
+                        on_text,
+                        generation_config=generation_config
+                    )
+                self._log_token_report(prefix, resume_text, response)
+                evaluation_result, repaired = self._parse_evaluation(response.text, evaluation_template)
+                call.parse = PARSE_REPAIRED if repaired else PARSE_OK
 
-各項目について：
-- スコアは0-10で評価（10が最高）
-- 具体的な根拠を履歴書から引用して記載
-- 懸念点があれば明確に指摘
-- 次の面接で確認すべき点を提案
+            except json.JSONDecodeError as e:
+                call.parse = PARSE_FAILED
+                raise Exception(f"Failed to parse evaluation result as JSON: {str(e)}")
+            except LLMTransportError:
+                raise
+            except Exception as e:
+                raise Exception(f"Resume analysis error: {str(e)}")
 
-overall_scoreは各セクションのスコアを重み付けして計算してください。
-recommendationは「強く推薦」「推薦」「条件付き推薦」「不合格」のいずれかを選択してください。
+        # ストリーミング中に取り出せなかったセクション（修復で補ったものなど）を通知する
+        await self._emit_sections(evaluation_result, on_section, emitted)
 
-**必ずJSON形式のみを出力してください。説明文は不要です。**
-"""
-        return prompt
+        if not repaired:
+            await asyncio.to_thread(
+                self.response_cache.put, cache_key, response.text, KIND_EVALUATION, job_posting_id
+            )
+        return evaluation_result
+
+    async def _analyze_sections_async(
+        self,
+        prefix: CompiledPrefix,
+        resume_text: str,
+        job_requirements: Dict[str, Any],
+        evaluation_template: Dict[str, Any],
+        job_posting_id: Optional[int],
+        on_section: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]]
+    ) -> Dict[str, Any]:
+        """
+        セクションごとの評価を並行して生成し、1つの評価結果にまとめる（asyncio版）
+
+        いずれかのセクションが失敗した場合は、残りの呼び出しを取り消して例外を送出する。
+        """
+        async def evaluate(name: str, section_template: Dict[str, Any]):
+            result = await self._evaluate_section_async(
+                prefix, resume_text, name, section_template, job_posting_id
+            )
+            if on_section is not None:
+                await on_section(name, result[0])
+            return name, result
+
+        tasks = [
+            asyncio.create_task(evaluate(name, template))
+            for name, template in section_templates(evaluation_template).items()
+        ]
+        try:
+            results = dict(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        criteria = await asyncio.to_thread(load_criteria, job_posting_id)
+        weights = section_weights(evaluation_template, job_requirements, criteria)
+        return self._merge_sections(evaluation_template, results, weights)
+
+    async def _evaluate_section_async(
+        self,
+        prefix: CompiledPrefix,
+        resume_text: str,
+        name: str,
+        section_template: Dict[str, Any],
+        job_posting_id: Optional[int]
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """1セクション分の評価を生成する（asyncio版）"""
+        prompt, generation_config = self._section_request(prefix, resume_text, name, section_template)
+        cache_key = self._evaluation_cache_key(prompt, generation_config)
+        cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+        if cached is not None:
+            record_cache_hit(OP_EVALUATION)
+            return parse_section(cached, section_template)[:2]
+
+        with llm_call(OP_EVALUATION) as call:
+            try:
+                model, contents = await asyncio.to_thread(
+                    self._section_target, prefix, resume_text, name, section_template, prompt
+                )
+                response = await self.transport.generate_async(
+                    model,
+                    contents,
+                    generation_config=generation_config
+                )
+                section, clarifications, repaired = parse_section(response.text, section_template)
+                call.parse = PARSE_REPAIRED if repaired else PARSE_OK
+
+            except json.JSONDecodeError as e:
+                call.parse = PARSE_FAILED
+                raise Exception(f"Failed to parse {name} evaluation as JSON: {str(e)}")
+            except LLMTransportError:
+                raise
+            except Exception as e:
+                raise Exception(f"Resume analysis error ({name}): {str(e)}")
+
+        if not repaired:
+            await asyncio.to_thread(
+                self.response_cache.put, cache_key, response.text, KIND_EVALUATION, job_posting_id
+            )
+        return section, clarifications
+
+    @staticmethod
+    def _section_paths(evaluation_template: Dict[str, Any]):
+        """評価テンプレートの各セクションの、応答JSON内でのパス"""
+        sections = evaluation_template.get("evaluation_format", {}).get("sections", {})
+        return [("evaluation_format", "sections", name) for name in sections]
+
+    @staticmethod
+    async def _emit_sections(
+        evaluation_result: Dict[str, Any],
+        on_section: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]],
+        emitted: set
+    ):
+        """まだ通知していないセクションの評価を on_section に渡す"""
+        if on_section is None:
+            return
+        sections = evaluation_result.get("evaluation_format", {}).get("sections", {})
+        for name, section in sections.items():
+            if name not in emitted:
+                await on_section(name, section)
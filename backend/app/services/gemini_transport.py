@@ -0,0 +1,664 @@
+"""
+Gemini Transport
+Gemini API呼び出しのレート制御・リトライ・サーキットブレーカーを行うサービス
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from google.api_core import exceptions as api_exceptions
+
+from .llm_concurrency import get_llm_concurrency, get_llm_semaphore
+from .llm_metrics import OP_OTHER, OUTCOME_OK, LLMCall, llm_call
+from .llm_scheduler import LaneScheduler, current_lane
+from .model_registry import uses_rest_transport
+
+
+# 失敗理由
+REASON_RATE_LIMITED = "rate_limited"
+REASON_TIMEOUT = "timeout"
+REASON_UNAVAILABLE = "unavailable"
+REASON_CIRCUIT_OPEN = "circuit_open"
+
+_REASON_MESSAGES = {
+    REASON_RATE_LIMITED: "Gemini APIのレート制限により処理できませんでした。しばらく待ってから再度お試しください",
+    REASON_TIMEOUT: "Gemini APIの応答がタイムアウトしました",
+    REASON_UNAVAILABLE: "Gemini APIが一時的に利用できません",
+    REASON_CIRCUIT_OPEN: "Gemini APIの障害が続いているため、呼び出しを一時停止しています",
+}
+
+_RATE_LIMIT_ERRORS = (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests)
+_TIMEOUT_ERRORS = (api_exceptions.DeadlineExceeded, api_exceptions.GatewayTimeout, TimeoutError)
+_UNAVAILABLE_ERRORS = (
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.BadGateway,
+    ConnectionError,
+)
+
+# HTTPステータスコード・gRPCステータスによる分類（型で分類できない例外に使う）
+_STATUS_REASONS = {
+    429: REASON_RATE_LIMITED,
+    500: REASON_UNAVAILABLE,
+    502: REASON_UNAVAILABLE,
+    503: REASON_UNAVAILABLE,
+    504: REASON_TIMEOUT,
+}
+_GRPC_STATUS_REASONS = {
+    "RESOURCE_EXHAUSTED": REASON_RATE_LIMITED,
+    "DEADLINE_EXCEEDED": REASON_TIMEOUT,
+    "UNAVAILABLE": REASON_UNAVAILABLE,
+    "INTERNAL": REASON_UNAVAILABLE,
+}
+# メッセージ先頭のステータスコード（"429 Resource has been exhausted"、"HTTP 503 ..." など）
+_STATUS_PREFIX = re.compile(r"^\s*(?:HTTP\s+)?(\d{3})\b")
+
+
+class LLMTransportError(Exception):
+    """リトライしてもGemini API呼び出しが成功しなかった場合の例外"""
+
+    def __init__(self, reason: str, detail: str = ""):
+        self.reason = reason
+        self.detail = detail
+        message = _REASON_MESSAGES.get(reason, "Gemini API呼び出しに失敗しました")
+        super().__init__(f"{message}: {detail}" if detail else message)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """構造化されたエラー情報を返す"""
+        return {
+            "error": "llm_call_failed",
+            "reason": self.reason,
+            "message": str(self),
+        }
+
+
+def classify_error(error: Exception) -> Optional[str]:
+    """
+    例外をリトライ可能な失敗理由に分類する
+
+    Returns:
+        失敗理由（リトライしない例外の場合はNone）
+    """
+    if isinstance(error, _RATE_LIMIT_ERRORS):
+        return REASON_RATE_LIMITED
+    if isinstance(error, _TIMEOUT_ERRORS):
+        return REASON_TIMEOUT
+    if isinstance(error, _UNAVAILABLE_ERRORS):
+        return REASON_UNAVAILABLE
+
+    # REST経由などで型が失われた場合は、例外・応答のステータスコードから判定する
+    grpc_status = getattr(error, "grpc_status_code", None)
+    if grpc_status is not None:
+        return _GRPC_STATUS_REASONS.get(getattr(grpc_status, "name", None))
+    status = _status_code(error)
+    if status is not None:
+        return _STATUS_REASONS.get(status)
+    return None
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """
+    例外のHTTPステータスコード
+
+    google.api_core の例外の code、HTTPエラーの response.status_code、
+    メッセージ先頭のステータスコードの順に調べる（本文中の数字は使わない）。
+    """
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    for attr in ("status_code", "status"):
+        status = getattr(response, attr, None)
+        if isinstance(status, int):
+            return status
+    match = _STATUS_PREFIX.match(str(error))
+    return int(match.group(1)) if match else None
+
+
+def _chunk_text(chunk: Any) -> str:
+    """ストリーミング応答のチャンクのテキスト（テキストを含まないチャンクは空文字）"""
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+async def _call_async(model: Any, contents: Any, request_kwargs: Dict[str, Any]) -> Any:
+    """generate_content を非同期に呼び出す"""
+    if uses_rest_transport():
+        # REST接続では非同期クライアントを使えないため、同期版をスレッドで実行する
+        return await asyncio.to_thread(model.generate_content, contents, **request_kwargs)
+    return await model.generate_content_async(contents, **request_kwargs)
+
+
+async def _iterate_chunks(response: Any):
+    """ストリーミング応答のチャンクを順に返す（同期版の応答はスレッドで読み進める）"""
+    if hasattr(response, "__aiter__"):
+        async for chunk in response:
+            yield chunk
+        return
+
+    iterator = iter(response)
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class TokenBucket:
+    """リクエスト数を平均 rate 件/秒・最大 burst 件に制限するトークンバケット"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        TokenBucketの初期化
+
+        Args:
+            rate: 1秒あたりに補充するトークン数
+            burst: バケットの容量
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        トークンを1つ予約し、使えるようになるまでの待ち時間（秒）を返す
+
+        先に予約した呼び出しから順に待ち時間が割り当てられるため、
+        同期・非同期のどちらの呼び出し側でも待ち方だけを変えて使える。
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class CircuitBreaker:
+    """連続した障害でGemini呼び出しを一時停止するサーキットブレーカー
+
+    closed: 通常 / open: 呼び出しを即座に失敗させる / half_open: 1件だけ試行して復旧を確認する
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        """
+        CircuitBreakerの初期化
+
+        Args:
+            failure_threshold: openにする連続失敗回数
+            reset_seconds: openからhalf_openに移るまでの秒数
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def admit(self) -> Optional[str]:
+        """
+        呼び出しを許可する
+
+        Returns:
+            許可した時点の状態（half_open の場合はその呼び出しが復旧確認の試行）、
+            許可しない場合はNone
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return self.CLOSED
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return None
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # half_open: 復旧確認のための1件だけ通す
+            if self._probe_in_flight:
+                return None
+            self._probe_in_flight = True
+            return self.HALF_OPEN
+
+    def release_probe(self):
+        """成功・失敗を記録しないまま終わった（取り消された）復旧確認の試行を取り下げる
+
+        次の呼び出しが改めて復旧確認の試行になる。
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self):
+        """成功を記録"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                print("[INFO] Gemini APIの呼び出しを再開します（サーキットブレーカー: closed）")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """障害（タイムアウト・サーバーエラー）を記録"""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(
+                        f"[WARNING] Gemini APIの障害が続いているため、{self.reset_seconds}秒間呼び出しを停止します"
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class AIMDLimiter:
+    """レート制限応答に応じて同時実行数を増減させるリミッター
+
+    成功するたびに上限を少しずつ増やし（加算的増加）、
+    レート制限を受けたら半分に減らす（乗算的減少）。
+    """
+
+    def __init__(
+        self,
+        min_limit: int,
+        max_limit: int,
+        decrease_factor: float = 0.5,
+        cooldown_seconds: float = 2.0
+    ):
+        """
+        AIMDLimiterの初期化
+
+        Args:
+            min_limit: 同時実行数の下限
+            max_limit: 同時実行数の上限
+            decrease_factor: レート制限時に上限へ掛ける係数
+            cooldown_seconds: 連続したレート制限で何度も減らさないための間隔
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.cooldown_seconds = cooldown_seconds
+        self.limit = float(max_limit)
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def capacity(self) -> int:
+        """現在の同時実行数の上限"""
+        return int(self.limit)
+
+    def on_success(self):
+        """成功時: 上限を 1/上限 ずつ増やす（上限の数だけ成功すると1増える）"""
+        with self._lock:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_rate_limited(self):
+        """レート制限時: 上限を減らす"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown_seconds:
+                return
+            self._last_decrease = now
+            previous = self.limit
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            print(f"[WARNING] Gemini APIのレート制限を受けたため同時実行数を {previous:.1f} → {self.limit:.1f} に下げます")
+
+
+class GeminiTransport:
+    """Gemini API呼び出しの共通経路
+
+    1回の呼び出しごとに、サーキットブレーカー → レーンごとの同時実行枠（上限はAIMDで調整）
+    → トークンバケットの順に確認してから generate_content を実行し、レート制限・タイムアウト・
+    サーバーエラーはジッター付き指数バックオフでリトライする。
+    レーンは llm_lane() で指定する（指定がなければ対話的な処理のレーン）。
+
+    トークンバケットは枠を得てから待つため、バッチ処理が大量に待っていても
+    対話的な処理の待ち時間はレート制限の予約に押し出されない。
+    待ち時間・応答時間・リトライ・トークン数は llm_call() の記録に書き込む。
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        request_timeout: Optional[float] = None
+    ):
+        """
+        GeminiTransportの初期化
+
+        Args:
+            requests_per_minute: 1分あたりのリクエスト数の上限
+            burst: 瞬間的に許容するリクエスト数
+            max_retries: 最大リトライ回数
+            request_timeout: 1リクエストのタイムアウト秒数
+        """
+        rpm = requests_per_minute or float(os.getenv("GEMINI_RPM", "60"))
+        self.bucket = TokenBucket(
+            rate=rpm / 60.0,
+            burst=burst or int(os.getenv("GEMINI_BURST", "10"))
+        )
+        self.max_retries = max_retries if max_retries is not None else int(
+            os.getenv("GEMINI_MAX_RETRIES", "4")
+        )
+        self.retry_base_seconds = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "1"))
+        self.retry_max_seconds = float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "30"))
+        self.request_timeout = request_timeout or float(os.getenv("GEMINI_REQUEST_TIMEOUT", "120"))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("GEMINI_CIRCUIT_FAILURES", "5")),
+            reset_seconds=float(os.getenv("GEMINI_CIRCUIT_RESET_SECONDS", "30"))
+        )
+        self.limiter = AIMDLimiter(min_limit=1, max_limit=get_llm_concurrency())
+        self.scheduler = LaneScheduler(capacity=self.limiter.capacity)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "rejected_by_circuit": 0,
+        }
+
+    def _count(self, name: str):
+        """統計カウンタを加算"""
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        """ジッター付き指数バックオフの待ち時間（full jitter）"""
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * (2 ** attempt)))
+
+    def _check_circuit(self) -> bool:
+        """
+        サーキットブレーカーがopenなら即座に失敗させる
+
+        Returns:
+            復旧確認の試行かどうか（結果を記録せずに終わる場合は _abandon で取り下げる）
+        """
+        state = self.breaker.admit()
+        if state is None:
+            self._count("rejected_by_circuit")
+            raise LLMTransportError(REASON_CIRCUIT_OPEN)
+        return state == CircuitBreaker.HALF_OPEN
+
+    def _abandon(self, probe: bool):
+        """取り消し・中断された試行の後始末（復旧確認の試行なら取り下げる）"""
+        if probe:
+            self.breaker.release_probe()
+
+    def _request_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """タイムアウトを指定した generate_content の引数
+
+        リトライはこのクラスで行うため、SDK（google.api_core）側の自動リトライは無効にする。
+        """
+        request_kwargs = dict(kwargs)
+        request_kwargs.setdefault("request_options", {"timeout": self.request_timeout, "retry": None})
+        return request_kwargs
+
+    def _on_error(self, error: Exception, attempt: int) -> str:
+        """
+        失敗を記録し、リトライするかどうかを判断する
+
+        Returns:
+            失敗理由
+
+        Raises:
+            error: リトライしない例外の場合はそのまま送出する
+            LLMTransportError: リトライ回数を使い切った場合
+        """
+        reason = classify_error(error)
+        if reason is None:
+            # 入力不正などはリトライしても結果が変わらない
+            self.breaker.record_success()
+            self._count("failed")
+            raise error
+
+        if reason == REASON_RATE_LIMITED:
+            # レート制限はGemini側の障害ではないためブレーカーには数えない
+            self._count("rate_limited")
+            self.limiter.on_rate_limited()
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+        if attempt >= self.max_retries:
+            self._count("failed")
+            raise LLMTransportError(reason, str(error))
+
+        self._count("retries")
+        return reason
+
+    def _retry_delay(self, call: LLMCall, reason: str, attempt: int) -> float:
+        """リトライまでの待ち時間を決め、記録する"""
+        delay = self._backoff(attempt)
+        call.retry_reasons.append(reason)
+        call.backoff_seconds += delay
+        print(f"[WARNING] Gemini API呼び出しに失敗しました（{reason}）。{delay:.1f}秒後にリトライします")
+        return delay
+
+    def _on_success(self, call: LLMCall, lane: str, response: Any):
+        """成功した試行を記録し、枠を返す"""
+        self.limiter.on_success()
+        self.scheduler.release(lane)
+        self.breaker.record_success()
+        self._count("succeeded")
+        call.outcome = OUTCOME_OK
+        call.record_usage(response)
+
+    def generate(self, model: Any, contents: Any, **kwargs) -> Any:
+        """
+        generate_content を実行する（同期版）
+
+        Args:
+            model: GenerativeModel
+            contents: 送信内容
+            **kwargs: generate_content の追加パラメータ
+
+        Returns:
+            Geminiの応答
+
+        Raises:
+            LLMTransportError: レート制限・タイムアウト・障害でリトライしても成功しなかった場合
+        """
+        self._count("requests")
+        request_kwargs = self._request_kwargs(kwargs)
+        lane = current_lane()
+        with llm_call(OP_OTHER) as call:
+            for attempt in range(self.max_retries + 1):
+                probe = self._check_circuit()
+                call.attempts += 1
+                waited = time.monotonic()
+                try:
+                    self.scheduler.acquire(lane)
+                except BaseException:
+                    self._abandon(probe)
+                    raise
+                sent = time.monotonic()
+                try:
+                    time.sleep(self.bucket.reserve())
+                    sent = time.monotonic()
+                    call.queue_wait_seconds += sent - waited
+                    response = model.generate_content(contents, **request_kwargs)
+                except Exception as e:
+                    call.network_seconds += time.monotonic() - sent
+                    self.scheduler.release(lane)
+                    reason = self._on_error(e, attempt)
+                    delay = self._retry_delay(call, reason, attempt)
+                    time.sleep(delay)
+                    continue
+                except BaseException:
+                    self.scheduler.release(lane)
+                    self._abandon(probe)
+                    raise
+
+                call.network_seconds += time.monotonic() - sent
+                self._on_success(call, lane, response)
+                return response
+
+    async def generate_async(self, model: Any, contents: Any, **kwargs) -> Any:
+        """
+        generate_content_async を実行する（asyncio版）
+
+        待機はすべて asyncio.sleep で行い、イベントループのスレッドを止めない。
+        1回の試行ごとにイベントループ共通のセマフォ（LLM_MAX_CONCURRENCY）も確保する。
+
+        Args:
+            model: GenerativeModel
+            contents: 送信内容
+            **kwargs: generate_content_async の追加パラメータ
+
+        Returns:
+            Geminiの応答
+
+        Raises:
+            LLMTransportError: レート制限・タイムアウト・障害でリトライしても成功しなかった場合
+        """
+        self._count("requests")
+        request_kwargs = self._request_kwargs(kwargs)
+        lane = current_lane()
+        with llm_call(OP_OTHER) as call:
+            for attempt in range(self.max_retries + 1):
+                probe = self._check_circuit()
+                call.attempts += 1
+                waited = time.monotonic()
+                try:
+                    await self.scheduler.acquire_async(lane)
+                except BaseException:
+                    # 枠を待つ間に取り消された
+                    self._abandon(probe)
+                    raise
+                sent = time.monotonic()
+                try:
+                    await asyncio.sleep(self.bucket.reserve())
+                    async with get_llm_semaphore():
+                        sent = time.monotonic()
+                        call.queue_wait_seconds += sent - waited
+                        response = await _call_async(model, contents, request_kwargs)
+                except Exception as e:
+                    call.network_seconds += time.monotonic() - sent
+                    self.scheduler.release(lane)
+                    reason = self._on_error(e, attempt)
+                    delay = self._retry_delay(call, reason, attempt)
+                    await asyncio.sleep(delay)
+                    continue
+                except BaseException:
+                    # 取り消された（CancelledError）: 成功・失敗のどちらも記録しない
+                    self.scheduler.release(lane)
+                    self._abandon(probe)
+                    raise
+
+                call.network_seconds += time.monotonic() - sent
+                self._on_success(call, lane, response)
+                return response
+
+    async def generate_stream_async(
+        self,
+        model: Any,
+        contents: Any,
+        on_text: Callable[[str], Awaitable[None]],
+        **kwargs
+    ) -> Any:
+        """
+        generate_content_async をストリーミングで実行し、届いたテキストを順に on_text に渡す
+
+        最初のチャンクが届く前の失敗は generate_async と同じくリトライする。
+        途中まで返した応答はやり直せないため、以降の失敗はリトライせずに送出する。
+
+        Args:
+            model: GenerativeModel
+            contents: 送信内容
+            on_text: チャンクのテキストを受け取るコールバック（例外を送出しないこと）
+            **kwargs: generate_content_async の追加パラメータ
+
+        Returns:
+            すべてのチャンクを受け取った後の応答（text・usage_metadata は応答全体の値）
+
+        Raises:
+            LLMTransportError: レート制限・タイムアウト・障害で応答を受け取れなかった場合
+        """
+        self._count("requests")
+        request_kwargs = self._request_kwargs(kwargs)
+        request_kwargs["stream"] = True
+        lane = current_lane()
+        with llm_call(OP_OTHER) as call:
+            call.stream = True
+            for attempt in range(self.max_retries + 1):
+                probe = self._check_circuit()
+                call.attempts += 1
+                waited = time.monotonic()
+                try:
+                    await self.scheduler.acquire_async(lane)
+                except BaseException:
+                    # 枠を待つ間に取り消された
+                    self._abandon(probe)
+                    raise
+                sent = time.monotonic()
+                received = False
+                try:
+                    await asyncio.sleep(self.bucket.reserve())
+                    async with get_llm_semaphore():
+                        sent = time.monotonic()
+                        call.queue_wait_seconds += sent - waited
+                        response = await _call_async(model, contents, request_kwargs)
+                        async for chunk in _iterate_chunks(response):
+                            text = _chunk_text(chunk)
+                            if text:
+                                if not received:
+                                    call.first_token_seconds = time.monotonic() - sent
+                                received = True
+                                await on_text(text)
+                except Exception as e:
+                    call.network_seconds += time.monotonic() - sent
+                    self.scheduler.release(lane)
+                    # 途中まで受け取った場合は最後の試行として扱い、リトライしない
+                    reason = self._on_error(e, self.max_retries if received else attempt)
+                    delay = self._retry_delay(call, reason, attempt)
+                    await asyncio.sleep(delay)
+                    continue
+                except BaseException:
+                    # 取り消された（CancelledError）: 成功・失敗のどちらも記録しない
+                    self.scheduler.release(lane)
+                    self._abandon(probe)
+                    raise
+
+                call.network_seconds += time.monotonic() - sent
+                self._on_success(call, lane, response)
+                return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """呼び出しの統計情報（ヘルスチェック用）を返す"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["circuit_state"] = self.breaker.state
+        stats["concurrency_limit"] = round(self.limiter.limit, 2)
+        stats["in_flight"] = self.scheduler.in_flight
+        stats["lanes"] = self.scheduler.get_stats()
+        return stats
+
+
+_transport: Optional[GeminiTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_gemini_transport() -> GeminiTransport:
+    """プロセス共通のGeminiTransportを取得する"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = GeminiTransport()
+        return _transport
@@ -0,0 +1,42 @@
+"""
+LLM Concurrency Limiter
+Gemini APIの同時呼び出し数を制限するセマフォを提供するサービス
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+
+
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+_lock = threading.Lock()
+
+
+def get_llm_concurrency() -> int:
+    """Gemini APIの同時呼び出し数の上限（環境変数 LLM_MAX_CONCURRENCY）"""
+    return int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """
+    実行中のイベントループで共有するセマフォを返す
+
+    asyncio.Semaphore はイベントループに紐づくため、ループごとに1つ生成する。
+    同じループ上の AsyncGeminiService / AsyncQuestionGenerator はすべてこのセマフォを共有する。
+
+    Returns:
+        同時呼び出し数を制限するセマフォ
+
+    Raises:
+        RuntimeError: イベントループの外から呼び出された場合
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        semaphore = _semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(get_llm_concurrency())
+            _semaphores[loop] = semaphore
+        return semaphore
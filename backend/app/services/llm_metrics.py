@@ -0,0 +1,377 @@
+"""
+LLM Metrics
+Gemini呼び出しごとの待ち時間・レイテンシ・トークン数・リトライ・JSON解析結果を記録するサービス
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from .llm_scheduler import current_lane
+
+
+# 呼び出しの種類
+OP_EVALUATION = "evaluation"
+OP_QUESTIONS = "questions"
+OP_TEXT = "text"
+OP_SUMMARY = "summary"
+OP_OTHER = "other"
+
+# JSON解析の結果
+PARSE_OK = "ok"                # そのまま解析できた
+PARSE_REPAIRED = "repaired"    # 修復して解析できた
+PARSE_FAILED = "failed"        # 解析できずエラーにした
+PARSE_FALLBACK = "fallback"    # 解析・呼び出しに失敗して既定の内容を返した
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+
+# 秒単位のヒストグラムのバケット（Gemini呼び出しは数百ミリ秒〜数十秒）
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# トークン数のヒストグラムのバケット
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+def _escape_label(value: Any) -> str:
+    """ラベル値のエスケープ（バックスラッシュ・ダブルクォート・改行）"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Prometheusのラベル表記（{a="x",b="y"}）"""
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(label_names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    """Prometheusの数値表記"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """ラベルごとに加算するカウンター"""
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], value: float = 1):
+        """加算する"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        """Prometheusのテキスト形式の行"""
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}")
+        return lines
+
+    def snapshot(self) -> Dict[str, float]:
+        """ラベルを / で連結した名前ごとの値"""
+        with self._lock:
+            return {"/".join(labels): value for labels, value in sorted(self._values.items())}
+
+
+class Histogram:
+    """ラベルごとに値の分布を記録するヒストグラム"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Tuple[str, ...],
+        buckets: Tuple[float, ...]
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # ラベル → [バケットごとの件数, 合計, 件数]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        """値を記録する"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0]
+                self._series[labels] = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        """Prometheusのテキスト形式の行（バケットは累積件数）"""
+        with self._lock:
+            series_items = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in series_items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_number(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}"
+                )
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """ラベルを / で連結した名前ごとの件数・平均"""
+        with self._lock:
+            return {
+                "/".join(labels): {
+                    "count": s[2],
+                    "avg": round(s[1] / s[2], 3) if s[2] else 0.0,
+                }
+                for labels, s in sorted(self._series.items())
+            }
+
+
+class MetricsRegistry:
+    """メトリクスをまとめて出力するレジストリ"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str, label_names: Tuple[str, ...]) -> Counter:
+        """カウンターを登録（登録済みならそれを返す）"""
+        return self._register(name, lambda: Counter(name, description, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        label_names: Tuple[str, ...],
+        buckets: Tuple[float, ...] = SECONDS_BUCKETS
+    ) -> Histogram:
+        """ヒストグラムを登録（登録済みならそれを返す）"""
+        return self._register(name, lambda: Histogram(name, description, label_names, buckets))
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def render(self) -> str:
+        """すべてのメトリクスをPrometheusのテキスト形式で返す"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """すべてのメトリクスの要約（ベンチマーク・ヘルスチェック用）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+_registry = MetricsRegistry()
+
+_calls_total = _registry.counter(
+    "llm_calls_total", "Gemini呼び出しの件数（結果別）", ("operation", "outcome")
+)
+_retries_total = _registry.counter(
+    "llm_retries_total", "Gemini呼び出しのリトライ回数（理由別）", ("operation", "reason")
+)
+_parse_total = _registry.counter(
+    "llm_json_parse_total", "応答JSONの解析結果", ("operation", "result")
+)
+_tokens_total = _registry.counter(
+    "llm_tokens_total", "トークン数の合計", ("operation", "kind")
+)
+_cache_hits_total = _registry.counter(
+    "llm_response_cache_hits_total", "応答キャッシュでGemini呼び出しを省略した件数", ("operation",)
+)
+_call_seconds = _registry.histogram(
+    "llm_call_seconds", "呼び出し全体の所要時間（待ち・リトライを含む）", ("operation",)
+)
+_queue_wait_seconds = _registry.histogram(
+    "llm_queue_wait_seconds", "同時実行枠・レート制限の待ち時間", ("operation", "lane")
+)
+_network_seconds = _registry.histogram(
+    "llm_network_seconds", "Gemini APIの応答を待った時間（全試行の合計）", ("operation",)
+)
+_backoff_seconds = _registry.histogram(
+    "llm_backoff_seconds", "リトライ前のバックオフ時間の合計", ("operation",)
+)
+_first_token_seconds = _registry.histogram(
+    "llm_time_to_first_token_seconds", "ストリーミングで最初のテキストが届くまでの時間", ("operation",)
+)
+_prompt_tokens = _registry.histogram(
+    "llm_prompt_tokens", "1回の呼び出しの入力トークン数", ("operation",), TOKEN_BUCKETS
+)
+_completion_tokens = _registry.histogram(
+    "llm_completion_tokens", "1回の呼び出しの出力トークン数", ("operation",), TOKEN_BUCKETS
+)
+
+
+class LLMCall:
+    """1回の論理的なGemini呼び出し（リトライを含む）の記録
+
+    GeminiTransport が待ち時間・応答時間・試行回数・トークン数を、
+    呼び出し元のサービスが JSON の解析結果を書き込む。
+    """
+
+    def __init__(self, operation: str, lane: str):
+        self.operation = operation
+        self.lane = lane
+        self.started = time.monotonic()
+        self.queue_wait_seconds = 0.0
+        self.network_seconds = 0.0
+        self.backoff_seconds = 0.0
+        self.first_token_seconds: Optional[float] = None
+        self.attempts = 0
+        self.retry_reasons: List[str] = []
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.cached_tokens: Optional[int] = None
+        self.stream = False
+        self.outcome: Optional[str] = None
+        self.parse: Optional[str] = None
+
+    def record_usage(self, response: Any):
+        """応答の usage_metadata からトークン数を記録する"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        self.prompt_tokens = getattr(usage, "prompt_token_count", None)
+        self.completion_tokens = getattr(usage, "candidates_token_count", None)
+        self.cached_tokens = getattr(usage, "cached_content_token_count", None)
+
+    def fail(self, error: BaseException):
+        """失敗を記録する（LLMTransportError は失敗理由を結果にする）"""
+        if self.outcome is None:
+            self.outcome = getattr(error, "reason", None) or OUTCOME_ERROR
+
+    def to_dict(self) -> Dict[str, Any]:
+        """構造化ログ用の辞書"""
+        return {
+            "metric": "llm_call",
+            "operation": self.operation,
+            "lane": self.lane,
+            "outcome": self.outcome,
+            "parse": self.parse,
+            "stream": self.stream,
+            "attempts": self.attempts,
+            "retries": len(self.retry_reasons),
+            "retry_reasons": self.retry_reasons,
+            "total_ms": round((time.monotonic() - self.started) * 1000, 1),
+            "queue_wait_ms": round(self.queue_wait_seconds * 1000, 1),
+            "network_ms": round(self.network_seconds * 1000, 1),
+            "backoff_ms": round(self.backoff_seconds * 1000, 1),
+            "first_token_ms": (
+                round(self.first_token_seconds * 1000, 1)
+                if self.first_token_seconds is not None else None
+            ),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+        }
+
+
+_current_call: ContextVar[Optional[LLMCall]] = ContextVar("llm_call", default=None)
+
+
+def current_call() -> Optional[LLMCall]:
+    """現在記録中の呼び出し（なければ None）"""
+    return _current_call.get()
+
+
+@contextmanager
+def llm_call(operation: str):
+    """
+    この中で行うGemini呼び出しを1件として記録する
+
+    すでに記録中の呼び出しがある場合はそれをそのまま使い、外側で記録する。
+    asyncioのタスクや asyncio.to_thread にも引き継がれる。
+
+    Args:
+        operation: 呼び出しの種類（OP_EVALUATION など）
+
+    Yields:
+        LLMCall
+    """
+    call = _current_call.get()
+    if call is not None:
+        yield call
+        return
+
+    call = LLMCall(operation, current_lane())
+    token = _current_call.set(call)
+    try:
+        yield call
+    except BaseException as e:
+        call.fail(e)
+        raise
+    finally:
+        _current_call.reset(token)
+        _finish(call)
+
+
+def _finish(call: LLMCall):
+    """呼び出しの記録をメトリクスと構造化ログに出力する"""
+    operation = call.operation
+    _calls_total.inc((operation, call.outcome or OUTCOME_ERROR))
+    for reason in call.retry_reasons:
+        _retries_total.inc((operation, reason))
+    if call.parse is not None:
+        _parse_total.inc((operation, call.parse))
+    _call_seconds.observe((operation,), time.monotonic() - call.started)
+    if call.attempts:
+        _queue_wait_seconds.observe((operation, call.lane), call.queue_wait_seconds)
+        _network_seconds.observe((operation,), call.network_seconds)
+        _backoff_seconds.observe((operation,), call.backoff_seconds)
+    if call.first_token_seconds is not None:
+        _first_token_seconds.observe((operation,), call.first_token_seconds)
+    if call.prompt_tokens is not None:
+        _prompt_tokens.observe((operation,), call.prompt_tokens)
+        _tokens_total.inc((operation, "prompt"), call.prompt_tokens)
+    if call.completion_tokens is not None:
+        _completion_tokens.observe((operation,), call.completion_tokens)
+        _tokens_total.inc((operation, "completion"), call.completion_tokens)
+    if call.cached_tokens:
+        _tokens_total.inc((operation, "cached"), call.cached_tokens)
+
+    if os.getenv("LLM_METRICS_LOG", "true").lower() == "true":
+        print(f"[METRIC] {json.dumps(call.to_dict(), ensure_ascii=False)}")
+
+
+def record_cache_hit(operation: str):
+    """応答キャッシュでGemini呼び出しを省略したことを記録する"""
+    _cache_hits_total.inc((operation,))
+
+
+def render_metrics() -> str:
+    """メトリクスをPrometheusのテキスト形式で返す（/metrics 用）"""
+    return _registry.render()
+
+
+def get_llm_metrics_summary() -> Dict[str, Any]:
+    """メトリクスの要約（ラベルごとの件数・平均）を返す"""
+    return _registry.snapshot()
@@ -0,0 +1,198 @@
+"""
+LLM Scheduler
+Gemini呼び出しの同時実行枠を、対話的な処理とバッチ処理のレーンに分けて割り当てるサービス
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+
+# レーン
+LANE_INTERACTIVE = "interactive"  # Slackのアップロード・管理画面からの操作
+LANE_BATCH = "batch"              # 一括再評価・先回りの質問生成など
+
+# 待ち時間の統計に使う直近の件数
+WAIT_SAMPLES = 500
+
+_current_lane: ContextVar[str] = ContextVar("llm_lane", default=LANE_INTERACTIVE)
+
+
+@contextmanager
+def llm_lane(lane: str):
+    """
+    この中で行うGemini呼び出しのレーンを指定する
+
+    asyncioのタスクや asyncio.to_thread にも引き継がれる。
+
+    Args:
+        lane: LANE_INTERACTIVE または LANE_BATCH
+    """
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def current_lane() -> str:
+    """現在のレーン（指定がなければ対話的な処理）"""
+    return _current_lane.get()
+
+
+def _percentile(sorted_values, ratio: float) -> float:
+    """ソート済みの値のパーセンタイル（値がなければ0）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * ratio))
+    return sorted_values[index]
+
+
+class _Lane:
+    """レーンごとの待ち行列と統計"""
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.queue: deque = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.max_queue_depth = 0
+        self.waits: deque = deque(maxlen=WAIT_SAMPLES)
+
+
+class _Waiter:
+    """枠の割り当てを待っている呼び出し"""
+
+    def __init__(self, grant: Callable[[], None]):
+        self.grant = grant
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+class LaneScheduler:
+    """レーンごとの重み付き公平配分で同時実行枠を割り当てるスケジューラー
+
+    空いた枠は、待ちのあるレーンのうち「実行中の数 / 重み」が最も小さいレーンに渡す。
+    両方のレーンに待ちがあれば枠は重みの比で分け合い、片方だけなら全体を使える。
+    そのため、バッチ処理が大量に積まれていても、対話的な処理は次に空いた枠を受け取れる。
+    """
+
+    def __init__(
+        self,
+        capacity: Callable[[], int],
+        weights: Optional[Dict[str, float]] = None
+    ):
+        """
+        LaneSchedulerの初期化
+
+        Args:
+            capacity: 現在の同時実行数の上限を返す関数（AIMDで変動する）
+            weights: レーンごとの重み
+        """
+        self.capacity = capacity
+        if weights is None:
+            weights = {
+                LANE_INTERACTIVE: float(os.getenv("LLM_INTERACTIVE_WEIGHT", "4")),
+                LANE_BATCH: float(os.getenv("LLM_BATCH_WEIGHT", "1")),
+            }
+        self._lanes = {name: _Lane(weight) for name, weight in weights.items()}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _lane(self, lane: str) -> _Lane:
+        """レーン名からレーンを取得"""
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown LLM lane: {lane}")
+        return self._lanes[lane]
+
+    def _enqueue(self, lane: str, grant: Callable[[], None]) -> _Waiter:
+        """待ち行列に追加し、空きがあればすぐに割り当てる"""
+        waiter = _Waiter(grant)
+        with self._lock:
+            state = self._lane(lane)
+            state.queue.append(waiter)
+            state.max_queue_depth = max(state.max_queue_depth, len(state.queue))
+            self._dispatch_locked()
+        return waiter
+
+    def _dispatch_locked(self):
+        """空いている枠を待っているレーンに割り当てる（ロック取得済みで呼ぶ）"""
+        while self._in_flight < max(1, self.capacity()):
+            waiting = [state for state in self._lanes.values() if state.queue]
+            if not waiting:
+                return
+            state = min(waiting, key=lambda s: ((s.in_flight + 1) / s.weight, -s.weight))
+            waiter = state.queue.popleft()
+            state.in_flight += 1
+            state.admitted += 1
+            state.waits.append(time.monotonic() - waiter.enqueued_at)
+            self._in_flight += 1
+            waiter.granted = True
+            waiter.grant()
+
+    def acquire(self, lane: str):
+        """枠が割り当てられるまで待つ（同期版）"""
+        event = threading.Event()
+        self._enqueue(lane, event.set)
+        event.wait()
+
+    async def acquire_async(self, lane: str):
+        """枠が割り当てられるまで待つ（asyncio版）"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            # 割り当ては別スレッドから行われることがある
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(lane, grant)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                state = self._lanes[lane]
+                if waiter.granted:
+                    # 割り当て直後にキャンセルされた場合は枠を返す
+                    self._release_locked(state)
+                else:
+                    state.queue.remove(waiter)
+            raise
+
+    def release(self, lane: str):
+        """枠を返し、待っている呼び出しに割り当てる"""
+        with self._lock:
+            self._release_locked(self._lanes[lane])
+
+    def _release_locked(self, state: _Lane):
+        """release の本体（ロック取得済みで呼ぶ）"""
+        state.in_flight -= 1
+        self._in_flight -= 1
+        self._dispatch_locked()
+
+    @property
+    def in_flight(self) -> int:
+        """実行中の呼び出し数"""
+        return self._in_flight
+
+    def get_stats(self) -> Dict[str, Any]:
+        """レーンごとの待ち行列の長さと待ち時間（ヘルスチェック用）を返す"""
+        stats = {}
+        with self._lock:
+            for name, state in self._lanes.items():
+                waits = sorted(state.waits)
+                stats[name] = {
+                    "weight": state.weight,
+                    "queue_depth": len(state.queue),
+                    "max_queue_depth": state.max_queue_depth,
+                    "in_flight": state.in_flight,
+                    "admitted": state.admitted,
+                    "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                    "wait_ms_p95": round(_percentile(waits, 0.95) * 1000, 1),
+                    "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0.0,
+                }
+        return stats
@@ -0,0 +1,112 @@
+"""
+Gemini Model Registry
+プロセス内で共有するGeminiモデルのレジストリ
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+
+DEFAULT_MODEL_NAME = "gemini-2.0-flash-exp"
+
+# ローカルのGemini互換サーバー（fake_gemini_server.py）に接続する場合のAPIキー
+LOCAL_API_KEY = "local"
+
+_models: Dict[str, genai.GenerativeModel] = {}
+_configured: Optional[Tuple[Optional[str], Optional[str]]] = None
+_lock = threading.Lock()
+
+
+def get_api_endpoint() -> Optional[str]:
+    """Gemini APIの接続先（環境変数 GEMINI_API_ENDPOINT、未指定の場合は本番のAPI）"""
+    return os.getenv("GEMINI_API_ENDPOINT") or None
+
+
+def uses_rest_transport() -> bool:
+    """REST接続かどうか（接続先を指定した場合はRESTで接続する）"""
+    return get_api_endpoint() is not None
+
+
+def resolve_api_key(api_key: Optional[str] = None) -> Optional[str]:
+    """
+    使用するAPIキーを決める
+
+    引数・環境変数 GEMINI_API_KEY の順に参照し、どちらもなく接続先が指定されている場合は
+    ローカルサーバー用のキーを使う（ローカルでの負荷試験にAPIキーを不要にするため）。
+    """
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    if not api_key and get_api_endpoint():
+        return LOCAL_API_KEY
+    return api_key
+
+
+def _configure(api_key: Optional[str]):
+    """APIキーと接続先を設定する（ロック取得済みの状態で呼び出す）"""
+    global _configured
+    endpoint = get_api_endpoint()
+    if _models and (api_key, endpoint) == _configured:
+        return
+    if _models:
+        # genai.configure はプロセス全体の設定を置き換えるため、生成済みのモデルも作り直す
+        print("[WARNING] Gemini APIキーまたは接続先が変更されたため、モデルを再生成します")
+        _models.clear()
+    if endpoint:
+        # ローカルサーバーはgRPCに対応しないため、RESTで接続する
+        genai.configure(
+            api_key=api_key,
+            transport="rest",
+            client_options={"api_endpoint": endpoint}
+        )
+        print(f"[INFO] Gemini APIの接続先: {endpoint}")
+    else:
+        genai.configure(api_key=api_key)
+    _configured = (api_key, endpoint)
+
+
+def get_model(
+    model_name: str = DEFAULT_MODEL_NAME,
+    api_key: Optional[str] = None
+) -> genai.GenerativeModel:
+    """
+    プロセス共通のGenerativeModelを取得する
+
+    genai.configure とモデルの生成はモデル名ごとに一度だけ行い、
+    GeminiService・QuestionGenerator の各インスタンスで共有する。
+
+    Args:
+        model_name: モデル名
+        api_key: Gemini API Key（未指定の場合は環境変数から取得）
+
+    Returns:
+        GenerativeModel
+    """
+    api_key = resolve_api_key(api_key)
+    with _lock:
+        _configure(api_key)
+        model = _models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            _models[model_name] = model
+        return model
+
+
+def warm_up(model_name: str = DEFAULT_MODEL_NAME):
+    """
+    起動時にモデルとAPIクライアントを生成しておく
+
+    最初のリクエストでクライアント生成・接続確立の待ち時間が発生しないようにする。
+    失敗しても起動は継続する（最初の呼び出し時に改めて生成される）。
+
+    Args:
+        model_name: モデル名
+    """
+    try:
+        get_model(model_name)
+        genai_client.get_default_generative_client()
+        print(f"[INFO] Geminiモデルを初期化しました: {model_name}")
+    except Exception as e:
+        print(f"[WARNING] Geminiモデルの初期化に失敗しました: {str(e)}")
@@ -4,21 +4,44 @@ PDFファイルからテキストを抽出するサービス
 """
 
 import io
-from typing import Optional
+import mmap
+import os
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import PyPDF2
 import pdfplumber
 
+from .text_normalizer import TextNormalizer
+
+
+# PDFのバイトデータ、またはPDFファイルのパス
+PDFSource = Union[bytes, str]
+
 
 class PDFParser:
     """PDFファイルからテキストを抽出するクラス"""
 
+    # 抽出ロジックを変更した場合はインクリメントする（抽出キャッシュのキーに含まれる）
+    PARSER_VERSION = "2"
+
+    # この文字数未満のページはレイアウト解析（pdfplumber）で再抽出する
+    SPARSE_PAGE_CHARS = 40
+
+    STRATEGY_PYPDF2 = "pypdf2"
+    STRATEGY_PDFPLUMBER = "pdfplumber"
+
     @staticmethod
-    def extract_text_from_bytes(pdf_bytes: bytes) -> str:
+    def extract_text_from_bytes(
+        pdf_bytes: bytes,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> str:
         """
         PDFバイトデータからテキストを抽出
 
         Args:
             pdf_bytes: PDFファイルのバイトデータ
+            max_pages: 抽出するページ数の上限
+            max_chars: 抽出する文字数の上限
 
         Returns:
             抽出されたテキスト
@@ -26,22 +49,291 @@ class PDFParser:
         Raises:
             Exception: PDF解析に失敗した場合
         """
-        # まずpdfplumberで試す（テーブルやレイアウトの保持が優れている）
-        text = PDFParser._extract_with_pdfplumber(pdf_bytes)
+        return PDFParser.extract_from_bytes(pdf_bytes, max_pages, max_chars)["text"]
+
+    @staticmethod
+    def extract_from_bytes(
+        pdf_bytes: bytes,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        PDFバイトデータからテキストとページ数を抽出
 
-        # pdfplumberで十分なテキストが取れなかった場合、PyPDF2でも試す
-        if not text or len(text.strip()) < 100:
-            text_pypdf = PDFParser._extract_with_pypdf2(pdf_bytes)
-            if len(text_pypdf.strip()) > len(text.strip()):
-                text = text_pypdf
+        Args:
+            pdf_bytes: PDFファイルのバイトデータ
+            max_pages: 抽出するページ数の上限
+            max_chars: 抽出する文字数の上限
+
+        Returns:
+            extract_from_source と同じ形式の抽出結果
+
+        Raises:
+            Exception: PDF解析に失敗した場合
+        """
+        return PDFParser.extract_from_source(pdf_bytes, max_pages, max_chars)
+
+    @staticmethod
+    def extract_from_file(
+        file_path: str,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        PDFファイルをメモリマップして、テキストとページ数を抽出
+
+        ファイル全体をbytesとして読み込まないため、プロセス内にPDFのコピーを持たない。
+
+        Args:
+            file_path: PDFファイルのパス
+            max_pages: 抽出するページ数の上限
+            max_chars: 抽出する文字数の上限
+
+        Returns:
+            extract_from_source と同じ形式の抽出結果
+
+        Raises:
+            FileNotFoundError: ファイルが見つからない場合
+            Exception: PDF解析に失敗した場合
+        """
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"PDFファイルが見つかりません: {file_path}")
+        return PDFParser.extract_from_source(file_path, max_pages, max_chars)
+
+    @staticmethod
+    def extract_from_source(
+        source: PDFSource,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        normalize: bool = False
+    ) -> Dict[str, Any]:
+        """
+        PDFのバイトデータまたはファイルパスからテキストとページ数を抽出
+
+        Args:
+            source: PDFのバイトデータ、またはPDFファイルのパス
+            max_pages: 抽出するページ数の上限
+            max_chars: 抽出する文字数の上限
+            normalize: TextNormalizerでページ単位の正規化を行うかどうか
+
+        Returns:
+            {"text": 抽出されたテキスト, "page_count": 文書の総ページ数,
+             "page_strategies": ページごとに使用した抽出方式のリスト,
+             "truncated": 上限により打ち切ったかどうか,
+             "normalization": 正規化の統計（normalize=Trueの場合のみ）}
+
+        Raises:
+            Exception: PDF解析に失敗した場合
+        """
+        pages = list(PDFParser.iter_pages(source, max_pages, max_chars))
+
+        normalization = None
+        if normalize:
+            # ヘッダー・フッターの検出にページ境界が必要なため、結合前に正規化する
+            normalization = TextNormalizer().normalize_pages([page["text"] for page in pages])
+            text = normalization.pop("text")
+        else:
+            text = "\n\n".join(page["text"] for page in pages if page["text"])
 
         if not text or len(text.strip()) < 50:
             raise Exception("PDFからテキストを抽出できませんでした。画像ベースのPDFの可能性があります。")
 
-        return text.strip()
+        page_count = pages[0]["total_pages"]
+        result = {
+            "text": text.strip(),
+            "page_count": page_count,
+            "page_strategies": [page["strategy"] for page in pages],
+            "truncated": len(pages) < page_count or any(page.get("truncated") for page in pages),
+        }
+        if normalization is not None:
+            result["normalization"] = normalization
+        return result
+
+    @staticmethod
+    def extract_pages(source: PDFSource) -> List[Dict[str, Any]]:
+        """
+        全ページのテキストを抽出
+
+        Args:
+            source: PDFのバイトデータ、またはPDFファイルのパス
+
+        Returns:
+            [{"page_number": ページ番号, "text": テキスト, "strategy": 抽出方式, "total_pages": 総ページ数}]
+        """
+        return list(PDFParser.iter_pages(source))
+
+    @staticmethod
+    def iter_pages(
+        source: PDFSource,
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        ページ単位でテキストを遅延抽出するジェネレータ
+
+        上限に達した時点で以降のページは解析しないため、
+        大きなポートフォリオでもメモリとCPUの消費が上限で抑えられる。
+
+        Args:
+            source: PDFのバイトデータ、またはPDFファイルのパス
+            max_pages: 抽出するページ数の上限
+            max_chars: 抽出する文字数の上限（超えたページは途中で切り詰める）
+
+        Yields:
+            {"page_number": ページ番号, "text": テキスト, "strategy": 抽出方式, "total_pages": 総ページ数}
+        """
+        return PDFParser.limit_pages(
+            PDFParser._iter_pages_adaptive(source), max_pages, max_chars
+        )
 
     @staticmethod
-    def _extract_with_pdfplumber(pdf_bytes: bytes) -> str:
+    def limit_pages(
+        pages: Iterable[Dict[str, Any]],
+        max_pages: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        ページのストリームにページ数・文字数の上限を適用する
+
+        Args:
+            pages: {"text": ...} を含むページのイテラブル
+            max_pages: ページ数の上限
+            max_chars: 文字数の上限
+
+        Yields:
+            上限内のページ（文字数上限で切り詰めたページには "truncated": True を付与）
+        """
+        total_chars = 0
+        try:
+            for count, page in enumerate(pages, start=1):
+                if max_pages is not None and count > max_pages:
+                    return
+
+                text = page["text"]
+                if max_chars is not None and total_chars + len(text) > max_chars:
+                    yield dict(page, text=text[:max_chars - total_chars], truncated=True)
+                    return
+
+                total_chars += len(text)
+                yield page
+
+                if max_chars is not None and total_chars >= max_chars:
+                    return
+        finally:
+            # 打ち切った場合も上流のジェネレータを閉じて文書を解放する
+            close = getattr(pages, "close", None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def _iter_pages_adaptive(source: PDFSource) -> Iterator[Dict[str, Any]]:
+        """
+        ページ単位で抽出方式を切り替えながらテキストを抽出
+
+        文書は一度だけ開き、各ページをまず軽量なPyPDF2で抽出する。
+        テキストが少ないページだけをレイアウト解析を行うpdfplumberで再抽出する。
+        """
+        # PyPDF2とpdfminerは読み取り位置を独自に管理するため、ストリームは分けて持つ
+        # （どちらも同じbytes・同じファイルのページキャッシュを参照し、PDF本体はコピーしない）
+        streams: List[BinaryIO] = []
+        reader = None
+        plumber_pdf = None
+        plumber_failed = False
+        try:
+            try:
+                reader = PyPDF2.PdfReader(PDFParser._open_stream(source, streams))
+                page_count = len(reader.pages)
+            except Exception as e:
+                print(f"PyPDF2 extraction failed: {str(e)}")
+                reader = None
+
+            if reader is None:
+                plumber_pdf = PDFParser._open_with_pdfplumber(source, streams)
+                if plumber_pdf is None:
+                    return
+                page_count = len(plumber_pdf.pages)
+
+            for index in range(page_count):
+                text = ""
+                strategy = PDFParser.STRATEGY_PYPDF2
+                if reader is not None:
+                    text = PDFParser._extract_page_with_pypdf2(reader, index)
+
+                # テキストが少ないページのみレイアウト解析へエスカレーション
+                if len(text.strip()) < PDFParser.SPARSE_PAGE_CHARS and not plumber_failed:
+                    if plumber_pdf is None:
+                        plumber_pdf = PDFParser._open_with_pdfplumber(source, streams)
+                        plumber_failed = plumber_pdf is None
+                    if plumber_pdf is not None:
+                        layout_text = PDFParser._extract_page_with_pdfplumber(plumber_pdf, index)
+                        if len(layout_text.strip()) >= len(text.strip()):
+                            text = layout_text
+                            strategy = PDFParser.STRATEGY_PDFPLUMBER
+
+                yield {
+                    "page_number": index + 1,
+                    "text": text,
+                    "strategy": strategy,
+                    "total_pages": page_count,
+                }
+        finally:
+            if plumber_pdf is not None:
+                plumber_pdf.close()
+            for stream in streams:
+                stream.close()
+
+    @staticmethod
+    def _open_stream(source: PDFSource, streams: List[BinaryIO]) -> BinaryIO:
+        """
+        PDFを読み取るストリームを開く
+
+        bytesはBytesIOで包む（CPythonでは元のbytesをコピーせずに共有する）。
+        ファイルパスは読み取り専用でメモリマップする。
+        開いたストリームは streams に追加され、呼び出し元で閉じる。
+        """
+        if isinstance(source, bytes):
+            stream = io.BytesIO(source)
+        else:
+            with open(source, "rb") as f:
+                stream = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        streams.append(stream)
+        return stream
+
+    @staticmethod
+    def _open_with_pdfplumber(source: PDFSource, streams: List[BinaryIO]) -> Optional["pdfplumber.PDF"]:
+        """pdfplumberで文書を開く（失敗時はNone）"""
+        try:
+            return pdfplumber.open(PDFParser._open_stream(source, streams))
+        except Exception as e:
+            print(f"pdfplumber extraction failed: {str(e)}")
+            return None
+
+    @staticmethod
+    def _extract_page_with_pypdf2(reader: "PyPDF2.PdfReader", index: int) -> str:
+        """PyPDF2で1ページ分のテキストを抽出（失敗時は空文字）"""
+        try:
+            return reader.pages[index].extract_text() or ""
+        except MemoryError:
+            # サンドボックスのメモリ上限超過はページ単位で握りつぶさない
+            raise
+        except Exception as e:
+            print(f"PyPDF2 page {index + 1} extraction failed: {str(e)}")
+            return ""
+
+    @staticmethod
+    def _extract_page_with_pdfplumber(pdf: "pdfplumber.PDF", index: int) -> str:
+        """pdfplumberで1ページ分のテキストを抽出（失敗時は空文字）"""
+        try:
+            return pdf.pages[index].extract_text() or ""
+        except MemoryError:
+            # サンドボックスのメモリ上限超過はページ単位で握りつぶさない
+            raise
+        except Exception as e:
+            print(f"pdfplumber page {index + 1} extraction failed: {str(e)}")
+            return ""
+
+    @staticmethod
+    def _extract_with_pdfplumber(pdf_bytes: bytes) -> Tuple[str, int]:
         """
         pdfplumberを使用してテキストを抽出
 
@@ -49,7 +341,7 @@ class PDFParser:
             pdf_bytes: PDFファイルのバイトデータ
 
         Returns:
-            抽出されたテキスト
+            (抽出されたテキスト, ページ数)
         """
         try:
             pdf_file = io.BytesIO(pdf_bytes)
@@ -60,14 +352,15 @@ class PDFParser:
                     page_text = page.extract_text()
                     if page_text:
                         text_parts.append(page_text)
+                page_count = len(pdf.pages)
 
-            return "\n\n".join(text_parts)
+            return "\n\n".join(text_parts), page_count
         except Exception as e:
             print(f"pdfplumber extraction failed: {str(e)}")
-            return ""
+            return "", 0
 
     @staticmethod
-    def _extract_with_pypdf2(pdf_bytes: bytes) -> str:
+    def _extract_with_pypdf2(pdf_bytes: bytes) -> Tuple[str, int]:
         """
         PyPDF2を使用してテキストを抽出
 
@@ -75,7 +368,7 @@ class PDFParser:
             pdf_bytes: PDFファイルのバイトデータ
 
         Returns:
-            抽出されたテキスト
+            (抽出されたテキスト, ページ数)
         """
         try:
             pdf_file = io.BytesIO(pdf_bytes)
@@ -87,10 +380,10 @@ class PDFParser:
                 if page_text:
                     text_parts.append(page_text)
 
-            return "\n\n".join(text_parts)
+            return "\n\n".join(text_parts), len(pdf_reader.pages)
         except Exception as e:
             print(f"PyPDF2 extraction failed: {str(e)}")
-            return ""
+            return "", 0
 
     @staticmethod
     def extract_text_from_file(file_path: str) -> str:
@@ -108,10 +401,8 @@ class PDFParser:
             Exception: PDF解析に失敗した場合
         """
         try:
-            with open(file_path, 'rb') as f:
-                pdf_bytes = f.read()
-            return PDFParser.extract_text_from_bytes(pdf_bytes)
+            return PDFParser.extract_from_file(file_path)["text"]
         except FileNotFoundError:
-            raise FileNotFoundError(f"PDFファイルが見つかりません: {file_path}")
+            raise
         except Exception as e:
             raise Exception(f"PDF解析エラー: {str(e)}")
@@ -0,0 +1,253 @@
+"""
+PDF Extraction Sandbox
+PDF抽出を資源制限付きの子プロセスで実行するサービス
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+from typing import Any, Dict, Optional
+
+from .pdf_parser import PDFParser, PDFSource
+
+
+# 終了理由
+REASON_TIMEOUT = "timeout"
+REASON_CPU_LIMIT = "cpu_limit"
+REASON_MEMORY_LIMIT = "memory_limit"
+REASON_KILLED = "killed"
+REASON_CRASHED = "crashed"
+REASON_PARSE_ERROR = "parse_error"
+
+# 子プロセスを強制終了した（または資源制限で終了した）とみなす理由
+KILLED_REASONS = (REASON_TIMEOUT, REASON_CPU_LIMIT, REASON_MEMORY_LIMIT, REASON_KILLED, REASON_CRASHED)
+
+_REASON_MESSAGES = {
+    REASON_TIMEOUT: "PDF抽出が制限時間内に終わらなかったため中断しました",
+    REASON_CPU_LIMIT: "PDF抽出がCPU時間の上限を超えたため中断しました",
+    REASON_MEMORY_LIMIT: "PDF抽出がメモリ上限を超えたため中断しました",
+    REASON_KILLED: "PDF抽出プロセスが強制終了されました",
+    REASON_CRASHED: "PDF抽出プロセスが異常終了しました",
+    REASON_PARSE_ERROR: "PDFの解析に失敗しました",
+}
+
+
+class ExtractionError(Exception):
+    """サンドボックス内のPDF抽出が失敗した場合の例外"""
+
+    def __init__(self, reason: str, detail: str = ""):
+        self.reason = reason
+        self.detail = detail
+        message = _REASON_MESSAGES.get(reason, "PDF抽出に失敗しました")
+        super().__init__(f"{message}: {detail}" if detail else message)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """構造化されたエラー情報を返す"""
+        return {
+            "error": "pdf_extraction_failed",
+            "reason": self.reason,
+            "message": str(self),
+        }
+
+
+class SandboxLimits:
+    """サンドボックスの資源制限"""
+
+    def __init__(
+        self,
+        memory_bytes: Optional[int] = None,
+        cpu_seconds: Optional[int] = None,
+        wall_seconds: Optional[float] = None
+    ):
+        """
+        SandboxLimitsの初期化
+
+        Args:
+            memory_bytes: 子プロセスが追加で確保できるメモリ量（バイト）
+            cpu_seconds: CPU時間の上限（秒）
+            wall_seconds: 経過時間の上限（秒）
+        """
+        self.memory_bytes = memory_bytes or int(
+            os.getenv("PDF_SANDBOX_MEMORY_MB", "512")
+        ) * 1024 * 1024
+        self.cpu_seconds = cpu_seconds or int(os.getenv("PDF_SANDBOX_CPU_SECONDS", "30"))
+        self.wall_seconds = wall_seconds or float(os.getenv("PDF_EXTRACTION_TIMEOUT", "60"))
+
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "extractions_total": 0,
+    "extractions_failed": 0,
+    "extractions_killed": 0,
+    "killed_by_reason": {reason: 0 for reason in KILLED_REASONS},
+}
+
+
+def _record(reason: Optional[str] = None):
+    """抽出結果を統計に記録"""
+    with _stats_lock:
+        _stats["extractions_total"] += 1
+        if reason is None:
+            return
+        _stats["extractions_failed"] += 1
+        if reason in KILLED_REASONS:
+            _stats["extractions_killed"] += 1
+            _stats["killed_by_reason"][reason] += 1
+
+
+def get_sandbox_stats() -> Dict[str, Any]:
+    """サンドボックスの統計情報（ヘルスチェック用）を返す"""
+    with _stats_lock:
+        return {
+            "extractions_total": _stats["extractions_total"],
+            "extractions_failed": _stats["extractions_failed"],
+            "extractions_killed": _stats["extractions_killed"],
+            "killed_by_reason": dict(_stats["killed_by_reason"]),
+        }
+
+
+def _current_vm_bytes() -> Optional[int]:
+    """現在の仮想メモリサイズを返す（取得できない環境ではNone）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _apply_limits(limits: SandboxLimits):
+    """子プロセス内で資源制限を設定する（resourceモジュールがない環境では何もしない）"""
+    try:
+        import resource
+    except ImportError:
+        return
+
+    # ソフトリミット超過でSIGXCPU、ハードリミット超過でSIGKILL
+    resource.setrlimit(resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + 1))
+
+    # LinuxはRLIMIT_RSSを強制しないため、子プロセス起動時点の仮想メモリ＋上限値をRLIMIT_ASに設定する
+    current = _current_vm_bytes()
+    if current is not None:
+        limit = current + limits.memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _sandbox_main(conn, source, max_pages, max_chars, normalize, limits):
+    """子プロセスのエントリポイント"""
+    try:
+        _apply_limits(limits)
+        result = PDFParser.extract_from_source(source, max_pages, max_chars, normalize)
+        conn.send(("ok", result))
+    except MemoryError:
+        try:
+            conn.send(("error", REASON_MEMORY_LIMIT, ""))
+        except Exception:
+            pass
+    except Exception as e:
+        try:
+            conn.send(("error", REASON_PARSE_ERROR, str(e)))
+        except Exception:
+            pass
+    finally:
+        conn.close()
+
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def _get_context():
+    """
+    子プロセスの起動方法（forkserverが使える環境ではforkserver、それ以外はspawn）
+
+    呼び出し元はSlackボットのワーカースレッドや抽出用スレッドプールを持つマルチスレッドの
+    プロセスのため、forkすると他のスレッドが保持していたロックを子プロセスが引き継いで
+    ハングすることがある。forkserverはシングルスレッドのサーバープロセスからforkするため安全で、
+    PDF解析モジュールを事前に読み込んでおくことでspawnより起動が速い。
+    PDFのバイトデータまたはパスはプロセス引数としてパイプ経由で渡す。
+    """
+    global _context
+    with _context_lock:
+        if _context is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                _context = multiprocessing.get_context("forkserver")
+                _context.set_forkserver_preload([__name__])
+            else:
+                _context = multiprocessing.get_context("spawn")
+        return _context
+
+
+def _reason_from_exitcode(exitcode: Optional[int]) -> str:
+    """子プロセスの終了コードから終了理由を推定する"""
+    if exitcode == -getattr(signal, "SIGXCPU", -1):
+        return REASON_CPU_LIMIT
+    if exitcode == -getattr(signal, "SIGKILL", -1):
+        # ハードCPU制限・OOM Killerのどちらでも SIGKILL になり区別できない
+        # （メモリ上限の超過は RLIMIT_AS による MemoryError として子プロセスから報告される）
+        return REASON_KILLED
+    return REASON_CRASHED
+
+
+def run_sandboxed(
+    source: PDFSource,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    normalize: bool = False,
+    limits: Optional[SandboxLimits] = None
+) -> Dict[str, Any]:
+    """
+    資源制限付きの子プロセスでPDF抽出を実行する
+
+    Args:
+        source: PDFのバイトデータ、またはPDFファイルのパス（子プロセス側でメモリマップする）
+        max_pages: 抽出するページ数の上限
+        max_chars: 抽出する文字数の上限
+        normalize: 抽出後にテキストを正規化するかどうか
+        limits: 資源制限（未指定の場合は環境変数から取得）
+
+    Returns:
+        PDFParser.extract_from_source と同じ形式の抽出結果
+
+    Raises:
+        ExtractionError: 制限超過・タイムアウト・解析失敗の場合
+    """
+    limits = limits or SandboxLimits()
+    ctx = _get_context()
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(
+        target=_sandbox_main,
+        args=(child_conn, source, max_pages, max_chars, normalize, limits),
+        daemon=True
+    )
+
+    process.start()
+    child_conn.close()
+    try:
+        if not parent_conn.poll(limits.wall_seconds):
+            process.kill()
+            _record(REASON_TIMEOUT)
+            raise ExtractionError(REASON_TIMEOUT, f"{limits.wall_seconds}秒")
+
+        try:
+            message = parent_conn.recv()
+        except EOFError:
+            # 結果を返す前に子プロセスが終了した（シグナルによる強制終了など）
+            process.join(5)
+            reason = _reason_from_exitcode(process.exitcode)
+            _record(reason)
+            raise ExtractionError(reason, f"exitcode={process.exitcode}")
+
+        if message[0] == "ok":
+            _record()
+            return message[1]
+
+        _, reason, detail = message
+        _record(reason)
+        raise ExtractionError(reason, detail)
+    finally:
+        parent_conn.close()
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
@@ -0,0 +1,368 @@
+"""
+Resume Pre-screen
+募集要項のスキルと履歴書のキーワード一致率を求め、明らかに合わない書類を
+Geminiに送る前に振り分けるサービス
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+# スキルの表記ゆれ・関連語（キーはすべて小文字・NFKC正規化済み）
+# 募集要項の記述にキーか別名が含まれていれば、その要件はこれらの語のいずれかで満たされるとみなす
+SKILL_SYNONYMS: Dict[str, List[str]] = {
+    "python": ["python", "django", "flask", "fastapi", "pandas"],
+    "java": ["java", "spring", "kotlin", "scala"],
+    "javascript": ["javascript", "js", "typescript", "node.js", "nodejs", "react", "vue", "angular", "next.js"],
+    "typescript": ["typescript", "ts"],
+    "go": ["golang", "go言語"],
+    "ruby": ["ruby", "rails"],
+    "php": ["php", "laravel"],
+    "c#": ["c#", ".net"],
+    "web": ["web", "ウェブ", "フロントエンド", "バックエンド", "サーバーサイド"],
+    "api": ["api", "rest", "graphql", "grpc"],
+    "データベース": ["データベース", "db", "rdb", "rdbms", "sql", "nosql", "mysql", "postgresql", "oracle",
+                "mongodb", "redis", "dynamodb"],
+    "sql": ["sql", "mysql", "postgresql", "postgres", "oracle", "sqlserver", "sqlite"],
+    "nosql": ["nosql", "mongodb", "redis", "dynamodb", "cassandra", "firestore", "elasticsearch"],
+    "git": ["git", "github", "gitlab", "bitbucket"],
+    "バージョン管理": ["バージョン管理", "git", "github", "gitlab", "svn", "subversion"],
+    "クラウド": ["クラウド", "aws", "gcp", "azure", "google cloud"],
+    "aws": ["aws", "amazon web services", "ec2", "s3", "lambda", "ecs"],
+    "gcp": ["gcp", "google cloud", "bigquery", "gke", "cloud run"],
+    "azure": ["azure"],
+    "docker": ["docker", "コンテナ", "kubernetes", "k8s"],
+    "ci/cd": ["ci/cd", "継続的インテグレーション", "github actions", "jenkins", "circleci", "gitlab ci"],
+    "アジャイル": ["アジャイル", "agile", "スクラム", "scrum", "カンバン", "kanban"],
+    "リーダー": ["リーダー", "リード", "マネージャー", "マネジメント", "pm", "pl"],
+    "メンター": ["メンター", "メンタリング", "育成", "指導", "教育"],
+}
+
+# 募集要項から取り出した英単語のうち、スキルとみなさない語
+_STOPWORDS = {"and", "or", "etc", "the", "of", "for", "with"}
+
+_ASCII_TERM_RE = re.compile(r"[a-z][a-z0-9+#./-]*[a-z0-9+#]|[a-z]")
+_WORD_CHAR_RE = re.compile(r"[a-z0-9]")
+
+# 必須・優遇スキルの重み
+REQUIRED_WEIGHT = 1.0
+PREFERRED_WEIGHT = 0.5
+
+
+def normalize(text: str) -> str:
+    """照合用の正規化（NFKCで全角英数字を半角にし、小文字にする）"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+class KeywordMatcher:
+    """Aho-Corasick法で複数のキーワードを1回の走査で探すマッチャー
+
+    英数字で始まる・終わるキーワードは、前後が英数字でない位置だけを一致とみなす
+    （"java" が "javascript" に、"go" が "google" に一致しないようにする）。
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        キーワードからオートマトンを組み立てる
+
+        Args:
+            keywords: 正規化済みのキーワード
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for keyword in set(keywords):
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(keyword)
+
+        # 幅優先で失敗遷移を設定する
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                candidate = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Set[str]:
+        """
+        正規化済みのテキストに含まれるキーワードを返す
+
+        Args:
+            text: 正規化済みのテキスト
+
+        Returns:
+            見つかったキーワードの集合
+        """
+        found: Set[str] = set()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for keyword in self._output[state]:
+                if keyword not in found and self._on_boundary(text, index - len(keyword) + 1, index):
+                    found.add(keyword)
+        return found
+
+    @staticmethod
+    def _on_boundary(text: str, start: int, end: int) -> bool:
+        """英数字のキーワードが単語の途中に現れていないか"""
+        if _WORD_CHAR_RE.match(text[start]) and start > 0 and _WORD_CHAR_RE.match(text[start - 1]):
+            return False
+        if _WORD_CHAR_RE.match(text[end]) and end + 1 < len(text) and _WORD_CHAR_RE.match(text[end + 1]):
+            return False
+        return True
+
+
+# 募集要項の記述からスキル名を探すためのマッチャー（別名 → 正規の名前）
+_ALIASES: Dict[str, Set[str]] = {}
+for _skill, _aliases in SKILL_SYNONYMS.items():
+    for _alias in [_skill] + _aliases:
+        _ALIASES.setdefault(_alias, set()).add(_skill)
+_ALIAS_MATCHER = KeywordMatcher(_ALIASES)
+
+
+class RequirementGroup:
+    """募集要項の1項目と、それを満たすとみなすキーワード"""
+
+    def __init__(self, label: str, weight: float, keywords: Set[str]):
+        self.label = label
+        self.weight = weight
+        self.keywords = keywords
+
+
+def requirement_keywords(requirement: str) -> Set[str]:
+    """
+    募集要項の1項目から、履歴書で探すキーワードを取り出す
+
+    記述に含まれるスキル名（SKILL_SYNONYMS）とその関連語、および辞書にない英単語を使う。
+
+    Args:
+        requirement: 募集要項の1項目（例: "Python, Java等の実務経験"）
+
+    Returns:
+        正規化済みのキーワードの集合（判定に使える語がなければ空）
+    """
+    text = normalize(requirement)
+    keywords: Set[str] = set()
+    for alias in _ALIAS_MATCHER.find(text):
+        for skill in _ALIASES[alias]:
+            keywords.add(skill)
+            keywords.update(SKILL_SYNONYMS[skill])
+    for term in _ASCII_TERM_RE.findall(text):
+        if term not in _STOPWORDS and len(term) >= 2:
+            keywords.add(term)
+    return keywords
+
+
+class PrescreenResult:
+    """事前判定の結果"""
+
+    def __init__(
+        self,
+        score: float,
+        required_score: float,
+        matched: Dict[str, List[str]],
+        missing: List[str],
+        elapsed_ms: float
+    ):
+        self.score = score
+        self.required_score = required_score
+        self.matched = matched
+        self.missing = missing
+        self.elapsed_ms = elapsed_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        """評価結果・ログに含める辞書"""
+        return {
+            "score": round(self.score, 3),
+            "required_score": round(self.required_score, 3),
+            "matched": self.matched,
+            "missing": self.missing,
+            "elapsed_ms": round(self.elapsed_ms, 2),
+        }
+
+
+class Prescreener:
+    """募集要項の必須・優遇スキルから組み立てた、履歴書のキーワード事前判定
+
+    各項目は、その項目から取り出したキーワードのどれかが履歴書にあれば一致とみなす。
+    一致率は 一致した項目の重み / 全項目の重み（必須 1.0、優遇 0.5）。
+    キーワードを取り出せない項目（人物像など）は判定に含めない。
+    """
+
+    def __init__(self, required: Iterable[str], preferred: Iterable[str] = ()):
+        """
+        Prescreenerの初期化
+
+        Args:
+            required: 必須スキルの記述
+            preferred: 優遇スキルの記述
+        """
+        self.groups: List[RequirementGroup] = []
+        for weight, requirements in ((REQUIRED_WEIGHT, required), (PREFERRED_WEIGHT, preferred)):
+            for requirement in requirements or []:
+                if not isinstance(requirement, str):
+                    continue
+                keywords = requirement_keywords(requirement)
+                if keywords:
+                    self.groups.append(RequirementGroup(requirement, weight, keywords))
+
+        self._keyword_groups: Dict[str, List[int]] = {}
+        for index, group in enumerate(self.groups):
+            for keyword in group.keywords:
+                self._keyword_groups.setdefault(keyword, []).append(index)
+        self._matcher = KeywordMatcher(self._keyword_groups)
+
+    @property
+    def enabled(self) -> bool:
+        """判定に使える項目があるか"""
+        return bool(self.groups)
+
+    def screen(self, resume_text: str) -> PrescreenResult:
+        """
+        履歴書と募集要項の一致率を求める
+
+        Args:
+            resume_text: 履歴書のテキスト
+
+        Returns:
+            事前判定の結果
+        """
+        started = time.perf_counter()
+        found = self._matcher.find(normalize(resume_text))
+
+        hits: Dict[int, List[str]] = {}
+        for keyword in sorted(found):
+            for index in self._keyword_groups[keyword]:
+                hits.setdefault(index, []).append(keyword)
+
+        total = sum(group.weight for group in self.groups)
+        required_total = sum(group.weight for group in self.groups if group.weight == REQUIRED_WEIGHT)
+        matched_weight = sum(self.groups[index].weight for index in hits)
+        required_matched = sum(
+            self.groups[index].weight for index in hits
+            if self.groups[index].weight == REQUIRED_WEIGHT
+        )
+
+        return PrescreenResult(
+            score=matched_weight / total if total else 1.0,
+            required_score=required_matched / required_total if required_total else 1.0,
+            matched={self.groups[index].label: keywords for index, keywords in sorted(hits.items())},
+            missing=[group.label for index, group in enumerate(self.groups) if index not in hits],
+            elapsed_ms=(time.perf_counter() - started) * 1000
+        )
+
+
+def skills_from_requirements(job_requirements: Dict[str, Any]) -> Dict[str, List[str]]:
+    """募集要項（job_requirements.json 形式）から必須・優遇スキルを取り出す"""
+    return {
+        "required": list(job_requirements.get("required_skills") or []),
+        "preferred": list(job_requirements.get("preferred_skills") or []),
+    }
+
+
+def skills_from_job_posting(job_posting: Any) -> Dict[str, List[str]]:
+    """
+    募集要項（JobPosting）から必須・優遇スキルを取り出す
+
+    requirements・preferred_skills はリストのほか、{"skills": [...]} のような辞書や文字列も受け付ける。
+    """
+    return {
+        "required": _as_lines(job_posting.requirements),
+        "preferred": _as_lines(job_posting.preferred_skills),
+    }
+
+
+def _as_lines(value: Any) -> List[str]:
+    """JSON列の値を文字列のリストにする"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [line for line in value.splitlines() if line.strip()]
+    if isinstance(value, dict):
+        lines = []
+        for item in value.values():
+            lines.extend(_as_lines(item))
+        return lines
+    if isinstance(value, list):
+        return [str(item) for item in value if item]
+    return [str(value)]
+
+
+class PrescreenRegistry:
+    """必須・優遇スキルごとに組み立てたPrescreenerを保持するレジストリ"""
+
+    def __init__(self, max_entries: int = 32):
+        """
+        PrescreenRegistryの初期化
+
+        Args:
+            max_entries: 保持するPrescreenerの数の上限
+        """
+        self.max_entries = max_entries
+        self._prescreeners: "OrderedDict[str, Prescreener]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, skills: Dict[str, List[str]]) -> Prescreener:
+        """
+        必須・優遇スキルに対応するPrescreenerを取得（なければ組み立てる）
+
+        Args:
+            skills: {"required": [...], "preferred": [...]}
+
+        Returns:
+            Prescreener
+        """
+        key = hashlib.sha256(
+            json.dumps(skills, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        with self._lock:
+            prescreener = self._prescreeners.get(key)
+            if prescreener is not None:
+                self._prescreeners.move_to_end(key)
+                return prescreener
+
+        prescreener = Prescreener(skills.get("required", []), skills.get("preferred", []))
+
+        with self._lock:
+            self._prescreeners[key] = prescreener
+            while len(self._prescreeners) > self.max_entries:
+                self._prescreeners.popitem(last=False)
+        return prescreener
+
+
+_registry: Optional[PrescreenRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prescreen_registry() -> PrescreenRegistry:
+    """プロセス共通のPrescreenRegistryを取得する"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PrescreenRegistry()
+        return _registry
@@ -0,0 +1,278 @@
+"""
+Evaluation Prompt Prefix
+募集要項・評価テンプレートから評価プロンプトの固定部分を事前に組み立てるサービス
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import google.generativeai as genai
+from google.generativeai import caching
+
+from .structured_output import structured_output_enabled
+from .token_counter import count_tokens, estimate_tokens, usage_from_response
+
+
+INSTRUCTIONS = (
+    "あなたは経験豊富な採用担当者です。以下の履歴書・職務経歴書を分析し、"
+    "募集要項に基づいて客観的に評価してください。"
+)
+
+GUIDELINES = """# 評価の指針
+1. **技術スキル (technical_skills)**: 必須スキル・優遇スキルとの合致度を詳細に評価
+2. **経験の質 (experience_quality)**: プロジェクト経験の深さ、成果、責任範囲を評価
+3. **文化適合性 (cultural_fit)**: 企業価値観との一致度、コミュニケーションスタイルを評価
+4. **成長可能性 (growth_potential)**: 学習意欲、スキルの発展軌跡、適応力を評価
+
+各項目について：
+- スコアは0-10で評価（10が最高）
+- 具体的な根拠を履歴書から引用して記載
+- 懸念点があれば明確に指摘
+- 次の面接で確認すべき点を提案
+
+overall_scoreは各セクションのスコアを重み付けして計算してください。
+recommendationは「強く推薦」「推薦」「条件付き推薦」「不合格」のいずれかを選択してください。
+
+**必ずJSON形式のみを出力してください。説明文は不要です。**"""
+
+# トークン内訳の表示名
+SECTION_LABELS = {
+    "instructions": "指示",
+    "job_requirements": "募集要項",
+    "evaluation_format": "評価フォーマット",
+    "guidelines": "評価の指針",
+    "resume": "履歴書",
+}
+
+
+def compact_json(value: Any) -> str:
+    """インデントや区切りの空白を除いたJSON文字列"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class CompiledPrefix:
+    """組み立て済みの評価プロンプトの固定部分（履歴書より前）"""
+
+    def __init__(self, key: str, sections: Dict[str, str], section_tokens: Dict[str, int]):
+        """
+        CompiledPrefixの初期化
+
+        Args:
+            key: 募集要項・評価テンプレートのハッシュ
+            sections: セクション名ごとのテキスト
+            section_tokens: セクション名ごとのトークン数
+        """
+        self.key = key
+        self.sections = sections
+        self.section_tokens = section_tokens
+        self.text = "\n\n".join(sections.values())
+        self.total_tokens = sum(section_tokens.values())
+
+        # Geminiのコンテキストキャッシュ（PromptPrefixRegistry が管理する）
+        self.lock = threading.Lock()
+        self.cached_model: Optional[genai.GenerativeModel] = None
+        self.cache_expires_at: Optional[datetime] = None
+        self.cache_unavailable = False
+
+    @staticmethod
+    def resume_section(resume_text: str) -> str:
+        """プロンプト末尾の履歴書セクション"""
+        return f"# 履歴書・職務経歴書\n{resume_text}"
+
+    def render(self, resume_text: str) -> str:
+        """履歴書を含むプロンプト全体"""
+        return f"{self.text}\n\n{self.resume_section(resume_text)}"
+
+    def token_report(self, resume_text: str, response: Any = None) -> Dict[str, Any]:
+        """
+        1回の呼び出しのトークン内訳
+
+        Args:
+            resume_text: 履歴書のテキスト
+            response: Geminiの応答（実際の使用量を含める場合）
+
+        Returns:
+            {"sections": セクションごとのトークン数, "estimated_total": 合計, "usage": 実測値}
+        """
+        sections = dict(self.section_tokens)
+        sections["resume"] = estimate_tokens(self.resume_section(resume_text))
+        return {
+            "sections": sections,
+            "estimated_total": sum(sections.values()),
+            "usage": usage_from_response(response) if response is not None else None,
+        }
+
+
+class PromptPrefixRegistry:
+    """募集要項ごとに評価プロンプトの固定部分を保持するレジストリ
+
+    - 募集要項・評価テンプレートは空白を除いたJSONで埋め込み、組み立ては一度だけ行う
+    - 構造化出力が有効な場合、評価テンプレートはresponse_schemaとして送るため本文から省く
+    - 固定部分を先頭、履歴書を末尾に置くことで、Geminiのコンテキストキャッシュを利用できる
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        context_cache: Optional[bool] = None,
+        context_cache_min_tokens: Optional[int] = None,
+        context_cache_ttl_seconds: Optional[int] = None
+    ):
+        """
+        PromptPrefixRegistryの初期化
+
+        Args:
+            max_entries: 保持する固定部分の数の上限
+            context_cache: Geminiのコンテキストキャッシュを使うかどうか
+            context_cache_min_tokens: コンテキストキャッシュを使う固定部分の最小トークン数
+            context_cache_ttl_seconds: コンテキストキャッシュの有効期間（秒）
+        """
+        self.max_entries = max_entries or int(os.getenv("PROMPT_PREFIX_MAX_ENTRIES", "32"))
+        if context_cache is None:
+            context_cache = os.getenv("GEMINI_CONTEXT_CACHE", "true").lower() != "false"
+        self.context_cache = context_cache
+        # Gemini APIはこれより短い内容をキャッシュできない
+        self.context_cache_min_tokens = context_cache_min_tokens or int(
+            os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096")
+        )
+        self.context_cache_ttl_seconds = context_cache_ttl_seconds or int(
+            os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600")
+        )
+        self.count_with_api = os.getenv("GEMINI_COUNT_PREFIX_TOKENS", "false").lower() == "true"
+
+        self._prefixes: "OrderedDict[str, CompiledPrefix]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        job_requirements: Dict[str, Any],
+        evaluation_template: Dict[str, Any],
+        model: Optional[genai.GenerativeModel] = None
+    ) -> CompiledPrefix:
+        """
+        募集要項・評価テンプレートに対応する固定部分を取得（なければ組み立てる）
+
+        Args:
+            job_requirements: 募集要項
+            evaluation_template: 評価テンプレート
+            model: トークン数をAPIで数える場合に使うモデル
+
+        Returns:
+            組み立て済みの固定部分
+        """
+        job_json = compact_json(job_requirements)
+        template_json = compact_json(evaluation_template)
+        # 構造化出力が有効な場合、テンプレートはスキーマとして別途送るためプロンプトには含めない
+        schema_mode = structured_output_enabled()
+        key = hashlib.sha256(
+            f"{job_json}\n{template_json}\n{schema_mode}".encode("utf-8")
+        ).hexdigest()
+
+        with self._lock:
+            prefix = self._prefixes.get(key)
+            if prefix is not None:
+                self._prefixes.move_to_end(key)
+                return prefix
+
+        sections = {
+            "instructions": INSTRUCTIONS,
+            "job_requirements": f"# 募集要項\n{job_json}",
+            "evaluation_format": (
+                "# 評価フォーマット\n指定されたレスポンススキーマに従うJSONで評価結果を出力してください。"
+                if schema_mode else
+                f"# 評価フォーマット\n以下のJSON形式で評価結果を出力してください：\n{template_json}"
+            ),
+            "guidelines": GUIDELINES,
+        }
+        if self.count_with_api and model is not None:
+            section_tokens = {name: count_tokens(model, text) for name, text in sections.items()}
+        else:
+            section_tokens = {name: estimate_tokens(text) for name, text in sections.items()}
+        prefix = CompiledPrefix(key, sections, section_tokens)
+
+        with self._lock:
+            # 並行して同じ固定部分を組み立てた場合は先に登録されたものを使う
+            existing = self._prefixes.get(key)
+            if existing is not None:
+                return existing
+            self._prefixes[key] = prefix
+            while len(self._prefixes) > self.max_entries:
+                self._prefixes.popitem(last=False)
+        return prefix
+
+    def get_cached_model(
+        self,
+        prefix: CompiledPrefix,
+        model_name: str
+    ) -> Optional[genai.GenerativeModel]:
+        """
+        固定部分をGeminiのコンテキストキャッシュに登録したモデルを返す
+
+        キャッシュが無効・固定部分が短すぎる・モデルが対応していない場合はNone
+        （呼び出し側はプロンプト全体を送る）。
+
+        Args:
+            prefix: 組み立て済みの固定部分
+            model_name: モデル名
+
+        Returns:
+            キャッシュ済みの内容を前提とするGenerativeModel、またはNone
+        """
+        if not self.context_cache or prefix.total_tokens < self.context_cache_min_tokens:
+            return None
+
+        with prefix.lock:
+            if prefix.cache_unavailable:
+                return None
+            now = datetime.utcnow()
+            if prefix.cached_model is not None and prefix.cache_expires_at > now:
+                return prefix.cached_model
+
+            try:
+                ttl = timedelta(seconds=self.context_cache_ttl_seconds)
+                cached_content = caching.CachedContent.create(
+                    model=model_name,
+                    display_name=f"evaluation-prefix-{prefix.key[:16]}",
+                    contents=[prefix.text],
+                    ttl=ttl
+                )
+                prefix.cached_model = genai.GenerativeModel.from_cached_content(cached_content)
+                # 期限切れ直前のキャッシュを使わないよう余裕を持たせる
+                prefix.cache_expires_at = now + ttl - timedelta(minutes=1)
+                print(f"[INFO] 評価プロンプトの固定部分をコンテキストキャッシュに登録しました: {cached_content.name}")
+                return prefix.cached_model
+            except Exception as e:
+                # モデルが未対応などの場合は以降このプレフィックスでは試さない
+                prefix.cache_unavailable = True
+                print(f"[WARNING] コンテキストキャッシュを利用できません: {str(e)}")
+                return None
+
+
+def format_token_report(report: Dict[str, Any]) -> str:
+    """トークン内訳をログ出力用の文字列にする"""
+    sections = " ".join(
+        f"{SECTION_LABELS.get(name, name)}={tokens}" for name, tokens in report["sections"].items()
+    )
+    line = f"{sections} (推定合計={report['estimated_total']}"
+    usage = report.get("usage")
+    if usage:
+        line += f", 実測: 入力={usage['prompt']} キャッシュ={usage['cached']} 出力={usage['output']}"
+    return line + ")"
+
+
+_registry: Optional[PromptPrefixRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_prefix_registry() -> PromptPrefixRegistry:
+    """プロセス共通のPromptPrefixRegistryを取得する"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptPrefixRegistry()
+        return _registry
@@ -5,13 +5,45 @@ AI質問生成サービス
 
 import os
 import json
-from typing import List, Dict
-import google.generativeai as genai
+import asyncio
+import threading
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
+
+from .pdf_parser import PDFParser
+from .model_registry import get_model, resolve_api_key
+from .gemini_transport import get_gemini_transport
+from .llm_metrics import (
+    OP_QUESTIONS,
+    PARSE_FALLBACK,
+    PARSE_OK,
+    PARSE_REPAIRED,
+    llm_call,
+    record_cache_hit,
+)
+from .response_cache import KIND_QUESTIONS, get_response_cache
+from .resume_digest import get_resume_digester
+from .structured_output import (
+    QUESTIONS_SCHEMA,
+    StreamingObjectParser,
+    json_generation_config,
+    parse_json_lenient,
+)
+
+
+class QuestionGenerationError(Exception):
+    """質問の生成に失敗した（use_fallback=False の場合に送出する）"""
 
 
 class QuestionGenerator:
     """面接質問を生成するサービス"""
 
+    # 質問生成時のパラメータ（多様性を高めるため temperature は高めに設定）
+    GENERATION_CONFIG = {
+        "temperature": 0.8,
+        "top_p": 0.9,
+        "top_k": 40,
+    }
+
     def __init__(self, api_key: str = None):
         """
         初期化
@@ -19,9 +51,13 @@ class QuestionGenerator:
         Args:
             api_key: Gemini API Key
         """
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        self.api_key = resolve_api_key(api_key)
+        self.resume_max_chars = int(os.getenv("QUESTION_RESUME_MAX_CHARS", "2000"))
+        self.model = get_model(api_key=self.api_key)
+        self.response_cache = get_response_cache()
+        self.generation_config = json_generation_config(self.GENERATION_CONFIG, QUESTIONS_SCHEMA)
+        self.transport = get_gemini_transport()
+        self.digester = get_resume_digester()
 
     def generate_questions(
         self,
@@ -30,11 +66,16 @@ class QuestionGenerator:
         job_title: str,
         candidate_resume: str = None,
         evaluation_summary: Dict = None,
-        num_questions: int = 30
+        num_questions: int = 30,
+        job_posting_id: int = None,
+        use_fallback: bool = True
     ) -> List[Dict[str, str]]:
         """
         面接質問を生成
 
+        QUESTION_RESUME_MAX_CHARS を超える履歴書は、先頭で切り詰めずにパートごとの要約に置き換える
+        （書類評価で作成した要約があれば再利用する）。
+
         Args:
             candidate_name: 候補者名
             stage_name: 選考段階名（例: 一次面接、二次面接）
@@ -42,55 +83,120 @@ class QuestionGenerator:
             candidate_resume: 候補者の履歴書テキスト
             evaluation_summary: これまでの評価サマリー
             num_questions: 生成する質問数
+            job_posting_id: 募集要項ID（応答キャッシュを募集要項の更新時に無効化するため）
+            use_fallback: 生成に失敗した場合に基本的な質問を返すかどうか
 
         Returns:
             質問のリスト [{"question": "質問内容", "purpose": "質問の目的", "category": "カテゴリ"}]
+
+        Raises:
+            QuestionGenerationError: use_fallback=False で生成に失敗した場合
         """
+        candidate_resume, digested = self._condense_resume(candidate_resume)
         prompt = self._create_question_prompt(
             candidate_name,
             stage_name,
             job_title,
             candidate_resume,
             evaluation_summary,
-            num_questions
+            num_questions,
+            digested
         )
 
+        # 同じ入力で生成済みの質問があれば再利用する
+        cache_key = self._questions_cache_key(prompt)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            record_cache_hit(OP_QUESTIONS)
+            return self._parse_questions(cached)[0]
+
+        response = None
+        with llm_call(OP_QUESTIONS) as call:
+            try:
+                response = self.transport.generate(
+                    self.model,
+                    prompt,
+                    generation_config=self.generation_config
+                )
+                questions, repaired = self._parse_questions(response.text)
+                call.parse = PARSE_REPAIRED if repaired else PARSE_OK
+
+            except json.JSONDecodeError as e:
+                print(f"[ERROR] JSON解析エラー: {str(e)}")
+                print(f"[DEBUG] レスポンステキスト: {response.text}")
+                call.parse = PARSE_FALLBACK
+                if not use_fallback:
+                    raise QuestionGenerationError(f"質問の応答を解析できません: {str(e)}") from e
+                # フォールバック: シンプルな質問を返す
+                return self._get_fallback_questions(stage_name, num_questions)
+
+            except Exception as e:
+                print(f"[ERROR] 質問生成エラー: {str(e)}")
+                call.fail(e)
+                call.parse = PARSE_FALLBACK
+                if not use_fallback:
+                    raise QuestionGenerationError(f"質問生成エラー: {str(e)}") from e
+                return self._get_fallback_questions(stage_name, num_questions)
+
+        # フォールバックや修復した応答ではなく、そのまま解析できた応答だけを保存する
+        if not repaired:
+            self.response_cache.put(cache_key, response.text, KIND_QUESTIONS, job_posting_id)
+        return questions
+
+    def _condense_resume(self, candidate_resume: Optional[str]) -> Tuple[Optional[str], bool]:
+        """
+        上限を超える履歴書をパートごとの要約に置き換える
+
+        要約できなかった場合は履歴書をそのまま返す（プロンプト作成時に上限まで切り詰める）。
+
+        Returns:
+            (履歴書または要約文, 要約したかどうか)
+        """
+        if not self.digester.should_digest(candidate_resume, self.resume_max_chars):
+            return candidate_resume, False
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.8,  # 多様性を高める
-                    "top_p": 0.9,
-                    "top_k": 40,
-                }
-            )
+            return self.digester.digest(candidate_resume), True
+        except Exception as e:
+            print(f"[WARNING] 履歴書の要約に失敗したため、先頭{self.resume_max_chars}文字を使用します: {str(e)}")
+            return candidate_resume, False
 
-            # JSONとして解析
-            result_text = response.text.strip()
+    def _questions_cache_key(self, prompt: str) -> str:
+        """質問生成プロンプトの応答キャッシュキー"""
+        return self.response_cache.make_key(
+            self.model.model_name, prompt, self.generation_config
+        )
 
-            # Markdown コードブロックを除去
-            if result_text.startswith("```json"):
-                result_text = result_text[7:]
-            if result_text.startswith("```"):
-                result_text = result_text[3:]
-            if result_text.endswith("```"):
-                result_text = result_text[:-3]
+    @staticmethod
+    def _parse_questions(result_text: str) -> Tuple[List[Dict[str, str]], bool]:
+        """
+        Geminiの応答テキストから質問のリストを取り出す
 
-            result_text = result_text.strip()
+        途中で切れた応答は修復し、項目の欠けた質問だけを取り除いて残りを使う。
 
-            questions = json.loads(result_text)
+        Returns:
+            (質問のリスト, 修復したかどうか)
 
-            return questions
+        Raises:
+            json.JSONDecodeError: 修復しても質問を1件も取り出せない場合
+        """
+        questions, repaired = parse_json_lenient(result_text)
+        if not isinstance(questions, list):
+            raise json.JSONDecodeError("質問の配列ではありません", result_text, 0)
 
-        except json.JSONDecodeError as e:
-            print(f"[ERROR] JSON解析エラー: {str(e)}")
-            print(f"[DEBUG] レスポンステキスト: {response.text}")
-            # フォールバック: シンプルな質問を返す
-            return self._get_fallback_questions(stage_name, num_questions)
+        complete = [question for question in questions if QuestionGenerator._is_complete(question)]
+        if not complete:
+            raise json.JSONDecodeError("有効な質問がありません", result_text, 0)
 
-        except Exception as e:
-            print(f"[ERROR] 質問生成エラー: {str(e)}")
-            return self._get_fallback_questions(stage_name, num_questions)
+        if repaired or len(complete) < len(questions):
+            print(f"[WARNING] 質問のJSONが不完全だったため修復しました（{len(complete)}問を使用）")
+            repaired = True
+        return complete, repaired
+
+    @staticmethod
+    def _is_complete(question) -> bool:
+        """質問・目的・カテゴリがすべて揃っているか"""
+        required = QUESTIONS_SCHEMA["items"]["required"]
+        return isinstance(question, dict) and all(question.get(key) for key in required)
 
     def _create_question_prompt(
         self,
@@ -99,15 +205,23 @@ class QuestionGenerator:
         job_title: str,
         candidate_resume: str,
         evaluation_summary: Dict,
-        num_questions: int
+        num_questions: int,
+        digested: bool = False
     ) -> str:
-        """質問生成用のプロンプトを作成"""
+        """質問生成用のプロンプトを作成（digested: candidate_resume がパートごとの要約文かどうか）"""
 
         resume_section = ""
         if candidate_resume:
+            resume_excerpt = candidate_resume
+            if not digested:
+                # 長すぎる場合はページ（段落）単位で上限まで切り詰める
+                pages = ({"text": part} for part in candidate_resume.split("\n\n"))
+                resume_excerpt = "\n\n".join(
+                    page["text"] for page in PDFParser.limit_pages(pages, max_chars=self.resume_max_chars)
+                )
             resume_section = f"""
 【候補者の履歴書・職務経歴書】
-{candidate_resume[:2000]}  # 長すぎる場合は切り詰め
+{resume_excerpt}
 """
 
         evaluation_section = ""
@@ -263,3 +377,176 @@ class QuestionGenerator:
             questions.append(base_questions[i % len(base_questions)])
 
         return questions
+
+
+class AsyncQuestionGenerator(QuestionGenerator):
+    """QuestionGeneratorのasyncio版
+
+    Gemini呼び出しは AsyncGeminiService と同じ GeminiTransport で同時実行数・リトライを制御する。
+    """
+
+    async def generate_questions_async(
+        self,
+        candidate_name: str,
+        stage_name: str,
+        job_title: str,
+        candidate_resume: str = None,
+        evaluation_summary: Dict = None,
+        num_questions: int = 30,
+        job_posting_id: int = None,
+        on_question: Optional[Callable[[Dict[str, str]], Awaitable[None]]] = None,
+        use_fallback: bool = True
+    ) -> List[Dict[str, str]]:
+        """
+        面接質問を生成（asyncio版）
+
+        on_question を指定した場合は応答をストリーミングで受け取り、
+        質問が1件完結するたびに on_question(質問) を呼び出す。
+        キャッシュヒット・フォールバックの場合も返す質問をすべて通知する。
+
+        Args:
+            candidate_name: 候補者名
+            stage_name: 選考段階名（例: 一次面接、二次面接）
+            job_title: 職種
+            candidate_resume: 候補者の履歴書テキスト
+            evaluation_summary: これまでの評価サマリー
+            num_questions: 生成する質問数
+            job_posting_id: 募集要項ID（応答キャッシュを募集要項の更新時に無効化するため）
+            on_question: 質問を1件ずつ受け取るコールバック
+            use_fallback: 生成に失敗した場合に受け取った質問・基本的な質問を返すかどうか
+
+        Returns:
+            質問のリスト [{"question": "質問内容", "purpose": "質問の目的", "category": "カテゴリ"}]
+
+        Raises:
+            QuestionGenerationError: use_fallback=False で生成に失敗した場合
+        """
+        candidate_resume, digested = await self._condense_resume_async(candidate_resume)
+        prompt = self._create_question_prompt(
+            candidate_name,
+            stage_name,
+            job_title,
+            candidate_resume,
+            evaluation_summary,
+            num_questions,
+            digested
+        )
+
+        cache_key = self._questions_cache_key(prompt)
+        cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+        if cached is not None:
+            record_cache_hit(OP_QUESTIONS)
+            questions = self._parse_questions(cached)[0]
+            await self._emit_questions(questions, on_question, 0)
+            return questions
+
+        response = None
+        emitted: List[Dict[str, str]] = []
+        with llm_call(OP_QUESTIONS) as call:
+            try:
+                if on_question is None:
+                    response = await self.transport.generate_async(
+                        self.model,
+                        prompt,
+                        generation_config=self.generation_config
+                    )
+                else:
+                    parser = StreamingObjectParser([(None,)])
+
+                    async def on_text(text: str):
+                        for _, question in parser.feed(text):
+                            if self._is_complete(question):
+                                emitted.append(question)
+                                await on_question(question)
+
+                    response = await self.transport.generate_stream_async(
+                        self.model,
+                        prompt,
+                        on_text,
+                        generation_config=self.generation_config
+                    )
+                questions, repaired = self._parse_questions(response.text)
+                call.parse = PARSE_REPAIRED if repaired else PARSE_OK
+
+            except json.JSONDecodeError as e:
+                print(f"[ERROR] JSON解析エラー: {str(e)}")
+                print(f"[DEBUG] レスポンステキスト: {response.text}")
+                call.parse = PARSE_FALLBACK
+                if not use_fallback:
+                    raise QuestionGenerationError(f"質問の応答を解析できません: {str(e)}") from e
+                return await self._fallback_questions(stage_name, num_questions, on_question, emitted)
+
+            except Exception as e:
+                print(f"[ERROR] 質問生成エラー: {str(e)}")
+                call.fail(e)
+                call.parse = PARSE_FALLBACK
+                if not use_fallback:
+                    raise QuestionGenerationError(f"質問生成エラー: {str(e)}") from e
+                return await self._fallback_questions(stage_name, num_questions, on_question, emitted)
+
+        # ストリーミング中に取り出せなかった質問（修復で取り出せたものなど）を通知する
+        await self._emit_questions(questions, on_question, len(emitted))
+
+        if not repaired:
+            await asyncio.to_thread(
+                self.response_cache.put, cache_key, response.text, KIND_QUESTIONS, job_posting_id
+            )
+        return questions
+
+    async def _condense_resume_async(self, candidate_resume: Optional[str]) -> Tuple[Optional[str], bool]:
+        """上限を超える履歴書をパートごとの要約に置き換える（asyncio版）"""
+        if not self.digester.should_digest(candidate_resume, self.resume_max_chars):
+            return candidate_resume, False
+        try:
+            return await self.digester.digest_async(candidate_resume), True
+        except Exception as e:
+            print(f"[WARNING] 履歴書の要約に失敗したため、先頭{self.resume_max_chars}文字を使用します: {str(e)}")
+            return candidate_resume, False
+
+    async def _fallback_questions(
+        self,
+        stage_name: str,
+        num_questions: int,
+        on_question: Optional[Callable[[Dict[str, str]], Awaitable[None]]],
+        emitted: List[Dict[str, str]]
+    ) -> List[Dict[str, str]]:
+        """
+        生成に失敗した場合に返す質問
+
+        ストリーミングで通知済みの質問があればそれを返し、なければ基本的な質問を通知して返す。
+        """
+        if emitted:
+            print(f"[WARNING] 質問生成が途中で失敗したため、受け取った{len(emitted)}問を使用します")
+            return list(emitted)
+        questions = self._get_fallback_questions(stage_name, num_questions)
+        await self._emit_questions(questions, on_question, 0)
+        return questions
+
+    @staticmethod
+    async def _emit_questions(
+        questions: List[Dict[str, str]],
+        on_question: Optional[Callable[[Dict[str, str]], Awaitable[None]]],
+        start: int
+    ):
+        """start 番目以降の質問を on_question に渡す"""
+        if on_question is None:
+            return
+        for question in questions[start:]:
+            await on_question(question)
+
+
+_question_generator: AsyncQuestionGenerator = None
+_question_generator_lock = threading.Lock()
+
+
+def get_question_generator() -> AsyncQuestionGenerator:
+    """
+    プロセス共通のAsyncQuestionGeneratorを取得する
+
+    FastAPIの依存性注入（Depends）から利用する。
+    """
+    global _question_generator
+    with _question_generator_lock:
+        if _question_generator is None:
+            _question_generator = AsyncQuestionGenerator()
+        return _question_generator
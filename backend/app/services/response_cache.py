@@ -0,0 +1,256 @@
+"""
+LLM Response Cache
+プロンプトと生成パラメータのハッシュをキーにGeminiの応答を保存するキャッシュサービス
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func
+
+from database import SessionLocal, engine
+from models.database import LLMResponseCache
+
+
+KIND_EVALUATION = "evaluation"
+KIND_QUESTIONS = "questions"
+KIND_SUMMARY = "summary"
+
+
+class ResponseCache:
+    """Gemini応答をDBに保存するTTL付きLRUキャッシュ
+
+    同じ履歴書・募集要項・テンプレートでの再評価や、同じ入力での質問生成は
+    Geminiを呼ばずに保存済みの応答を返す。キーにはプロンプト全体が含まれるため、
+    募集要項が変わればキーも変わるが、古い応答を残さないよう更新時に明示的に削除する。
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        ResponseCacheの初期化
+
+        Args:
+            ttl_seconds: 応答の有効期間（秒）
+            max_bytes: キャッシュに保持する応答の合計バイト数の上限
+            enabled: キャッシュを使用するかどうか（未指定の場合は環境変数から取得）
+        """
+        self.ttl_seconds = ttl_seconds or int(
+            os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60))
+        )
+        self.max_bytes = max_bytes or int(
+            os.getenv("LLM_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+        )
+        if enabled is None:
+            enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() != "false"
+        self.enabled = enabled
+
+        self._table_ready = False
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, generation_config: Dict[str, Any]) -> str:
+        """モデル名・プロンプト・生成パラメータからキャッシュキーを生成"""
+        payload = json.dumps(
+            {"model": model_name, "prompt": prompt, "config": generation_config},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _ensure_table(self):
+        """キャッシュテーブルがなければ作成する（--no-db の一括評価CLIなど init_db を呼ばない経路でも使うため）"""
+        if self._table_ready:
+            return
+        with self._lock:
+            if not self._table_ready:
+                LLMResponseCache.__table__.create(bind=engine, checkfirst=True)
+                self._table_ready = True
+
+    def _count(self, name: str, amount: int = 1):
+        """統計カウンタを加算"""
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """
+        キャッシュから応答を取得
+
+        Args:
+            cache_key: make_key で生成したキー
+
+        Returns:
+            Geminiの応答テキスト、キャッシュにない（または期限切れの）場合はNone
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                entry = db.query(LLMResponseCache).filter(
+                    LLMResponseCache.cache_key == cache_key
+                ).first()
+                now = datetime.utcnow()
+                if entry and entry.expires_at <= now:
+                    db.delete(entry)
+                    db.commit()
+                    entry = None
+                if not entry:
+                    self._count("misses")
+                    return None
+
+                entry.hit_count = (entry.hit_count or 0) + 1
+                entry.last_accessed_at = now
+                db.commit()
+
+                self._count("hits")
+                return entry.response_text
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"[WARNING] 応答キャッシュの参照に失敗しました: {str(e)}")
+            self._count("misses")
+            return None
+
+    def put(
+        self,
+        cache_key: str,
+        response_text: str,
+        kind: str,
+        job_posting_id: Optional[int] = None
+    ):
+        """
+        応答をキャッシュに保存し、期限切れと容量超過分を削除する
+
+        Args:
+            cache_key: make_key で生成したキー
+            response_text: Geminiの応答テキスト
+            kind: 応答の種類（KIND_EVALUATION / KIND_QUESTIONS / KIND_SUMMARY）
+            job_posting_id: 応答の元になった募集要項ID（更新時の無効化に使用）
+        """
+        if not self.enabled:
+            return
+
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                now = datetime.utcnow()
+                entry = db.query(LLMResponseCache).filter(
+                    LLMResponseCache.cache_key == cache_key
+                ).first()
+                if entry:
+                    # 並行して同じプロンプトを評価した場合は新しい応答で上書きする
+                    # （無効化の対象も上書きした呼び出しの募集要項に合わせる）
+                    entry.kind = kind
+                    entry.job_posting_id = job_posting_id
+                    entry.response_text = response_text
+                    entry.size_bytes = len(response_text.encode("utf-8"))
+                    entry.expires_at = now + timedelta(seconds=self.ttl_seconds)
+                    entry.last_accessed_at = now
+                else:
+                    db.add(LLMResponseCache(
+                        cache_key=cache_key,
+                        kind=kind,
+                        job_posting_id=job_posting_id,
+                        response_text=response_text,
+                        size_bytes=len(response_text.encode("utf-8")),
+                        expires_at=now + timedelta(seconds=self.ttl_seconds),
+                        last_accessed_at=now
+                    ))
+                db.flush()
+
+                self._evict(db, now)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"[WARNING] 応答キャッシュの保存に失敗しました: {str(e)}")
+
+    def invalidate_job_posting(self, job_posting_id: int) -> int:
+        """
+        募集要項に紐づく応答をすべて削除する
+
+        Args:
+            job_posting_id: 募集要項ID
+
+        Returns:
+            削除した件数
+        """
+        try:
+            self._ensure_table()
+            db = SessionLocal()
+            try:
+                deleted = db.query(LLMResponseCache).filter(
+                    LLMResponseCache.job_posting_id == job_posting_id
+                ).delete(synchronize_session=False)
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"[WARNING] 応答キャッシュの無効化に失敗しました: {str(e)}")
+            return 0
+
+        if deleted:
+            self._count("invalidated", deleted)
+            print(f"[INFO] 募集要項ID {job_posting_id} の応答キャッシュを {deleted}件削除しました")
+        return deleted
+
+    def _evict(self, db, now: datetime):
+        """期限切れを削除し、合計サイズが上限を超えている間は最終アクセスが古いものから削除する"""
+        db.query(LLMResponseCache).filter(
+            LLMResponseCache.expires_at <= now
+        ).delete(synchronize_session=False)
+
+        total = db.query(func.coalesce(func.sum(LLMResponseCache.size_bytes), 0)).scalar()
+        if total <= self.max_bytes:
+            return
+
+        entries = db.query(
+            LLMResponseCache.id, LLMResponseCache.size_bytes
+        ).order_by(LLMResponseCache.last_accessed_at.asc()).all()
+
+        for entry_id, size_bytes in entries:
+            if total <= self.max_bytes:
+                break
+            db.query(LLMResponseCache).filter(
+                LLMResponseCache.id == entry_id
+            ).delete(synchronize_session=False)
+            total -= size_bytes or 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヒット・ミスの統計情報（ヘルスチェック用）を返す"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """プロセス共通のResponseCacheを取得する"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
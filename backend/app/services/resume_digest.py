@@ -0,0 +1,362 @@
+"""
+Resume Digest
+長い履歴書・職務経歴書をパートに分けて並行して要約し、評価・質問生成に使う
+要約文にまとめるサービス（map-reduce）
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from .model_registry import get_model, resolve_api_key
+from .gemini_transport import get_gemini_transport
+from .llm_metrics import OP_SUMMARY, PARSE_FALLBACK, PARSE_OK, PARSE_REPAIRED, llm_call, record_cache_hit
+from .response_cache import KIND_SUMMARY, get_response_cache
+from .structured_output import SUMMARY_SCHEMA, fill_from_template, json_generation_config, parse_json_lenient
+
+
+# 要約の形式・プロンプトを変えたら更新する（キャッシュ済みの要約を使わないように）
+DIGEST_VERSION = "1"
+
+# 見出しとみなす行（【職務経歴】・■プロジェクト・## スキル など）
+_HEADING_RE = re.compile(r"^\s*(【[^】]+】|[■◆●▼□◇]|\[[^\]]+\]|#+\s|\d+[.．、]\s*\S)")
+
+# 要約が空の場合の既定値
+_SUMMARY_TEMPLATE = {"summary": "", "skills": [], "highlights": []}
+
+
+def split_sections(text: str, chunk_chars: int) -> List[str]:
+    """
+    履歴書のテキストを chunk_chars 以内のパートに分割する
+
+    段落（空行区切り）単位でまとめ、パートが半分以上埋まっていれば見出しの前で区切る。
+    1段落が上限を超える場合は行単位、それでも超える場合は文字数で分ける。
+
+    Args:
+        text: 履歴書のテキスト
+        chunk_chars: 1パートの文字数の上限
+
+    Returns:
+        パートのリスト
+    """
+    pieces: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= chunk_chars:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.split("\n"):
+            for start in range(0, len(line), chunk_chars):
+                pieces.append(line[start:start + chunk_chars])
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for piece in pieces:
+        starts_section = _HEADING_RE.match(piece) is not None and size >= chunk_chars // 2
+        if current and (size + len(piece) + 2 > chunk_chars or starts_section):
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+class ResumeDigester:
+    """長い履歴書をパートごとに要約して1つの要約文にまとめるクラス
+
+    map: パートごとの要約を並行して生成する（応答キャッシュにあるパートはGeminiを呼ばない）
+    reduce: 要約をパート順に連結し、評価・質問生成のプロンプトに渡す
+
+    パートの要約は内容のハッシュをキーに応答キャッシュ（DB）へ保存するため、
+    同じ履歴書の評価・各選考段階の質問生成、別プロセスのSlackボット・APIサーバーで共有される。
+    まとめた要約文も履歴書のハッシュごとにプロセス内に保持する。
+    """
+
+    # 要約生成時のパラメータ（記載内容に忠実にするため temperature は低めに設定）
+    SUMMARY_CONFIG = {
+        "temperature": 0.1,
+        "top_p": 0.8,
+        "top_k": 40,
+    }
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        chunk_chars: Optional[int] = None,
+        min_chars: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        enabled: Optional[bool] = None,
+        max_entries: int = 64
+    ):
+        """
+        ResumeDigesterの初期化
+
+        Args:
+            api_key: Gemini API Key（未指定の場合は環境変数から取得）
+            chunk_chars: 1パートの文字数の上限（未指定の場合は環境変数から取得）
+            min_chars: 評価で要約に切り替える文字数（未指定の場合は環境変数から取得）
+            max_concurrency: 1件の履歴書で同時に要約するパート数の上限
+            enabled: 要約を使うかどうか（未指定の場合は環境変数から取得）
+            max_entries: プロセス内に保持する要約文の数の上限
+        """
+        self.chunk_chars = chunk_chars or int(os.getenv("RESUME_CHUNK_CHARS", "3000"))
+        self.min_chars = min_chars or int(os.getenv("RESUME_MAPREDUCE_MIN_CHARS", "8000"))
+        self.max_concurrency = max_concurrency or int(os.getenv("RESUME_CHUNK_CONCURRENCY", "4"))
+        if enabled is None:
+            enabled = os.getenv("RESUME_MAPREDUCE_ENABLED", "true").lower() != "false"
+        self.enabled = enabled
+        self.max_entries = max_entries
+
+        self.model = get_model(api_key=resolve_api_key(api_key))
+        self.transport = get_gemini_transport()
+        self.response_cache = get_response_cache()
+        self.generation_config = json_generation_config(self.SUMMARY_CONFIG, SUMMARY_SCHEMA)
+
+        self._digests: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def should_digest(self, resume_text: str, min_chars: Optional[int] = None) -> bool:
+        """
+        要約に切り替えるかどうか
+
+        Args:
+            resume_text: 履歴書のテキスト
+            min_chars: 切り替える文字数（未指定の場合は RESUME_MAPREDUCE_MIN_CHARS）
+        """
+        limit = self.min_chars if min_chars is None else min_chars
+        return self.enabled and bool(resume_text) and len(resume_text) > limit
+
+    def digest(self, resume_text: str) -> str:
+        """
+        履歴書をパートごとに要約し、1つの要約文にまとめる
+
+        パートの要約はスレッドで並行して生成する。
+
+        Args:
+            resume_text: 履歴書のテキスト
+
+        Returns:
+            要約文
+
+        Raises:
+            LLMTransportError: レート制限・タイムアウト・障害でGemini APIを呼び出せなかった場合
+        """
+        resume_hash = self._resume_hash(resume_text)
+        cached = self._get_digest(resume_hash)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        chunks = split_sections(resume_text, self.chunk_chars)
+        prompts = [self._chunk_prompt(chunk, index, len(chunks)) for index, chunk in enumerate(chunks, start=1)]
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(len(prompts), self.max_concurrency)),
+            thread_name_prefix="resume-digest"
+        ) as executor:
+            # レーン（対話的な処理・バッチ処理）をスレッドにも引き継ぐ
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._summarize, prompt, chunk)
+                for prompt, chunk in zip(prompts, chunks)
+            ]
+            summaries = [future.result() for future in futures]
+
+        return self._finish(resume_hash, resume_text, summaries, started)
+
+    async def digest_async(self, resume_text: str) -> str:
+        """
+        履歴書をパートごとに要約し、1つの要約文にまとめる（asyncio版）
+
+        Args:
+            resume_text: 履歴書のテキスト
+
+        Returns:
+            要約文
+
+        Raises:
+            LLMTransportError: レート制限・タイムアウト・障害でGemini APIを呼び出せなかった場合
+        """
+        resume_hash = self._resume_hash(resume_text)
+        cached = self._get_digest(resume_hash)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        chunks = split_sections(resume_text, self.chunk_chars)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+
+        async def summarize(index: int, chunk: str) -> Tuple[str, bool]:
+            async with semaphore:
+                return await self._summarize_async(self._chunk_prompt(chunk, index, len(chunks)), chunk)
+
+        summaries = await asyncio.gather(
+            *(summarize(index, chunk) for index, chunk in enumerate(chunks, start=1))
+        )
+        return self._finish(resume_hash, resume_text, list(summaries), started)
+
+    def _summarize(self, prompt: str, chunk: str) -> Tuple[str, bool]:
+        """
+        1パートを要約する
+
+        Returns:
+            (要約, 応答キャッシュから取得したかどうか)
+        """
+        cache_key = self._cache_key(prompt)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            record_cache_hit(OP_SUMMARY)
+            return self._parse_summary(cached, chunk)[0], True
+
+        with llm_call(OP_SUMMARY) as call:
+            response = self.transport.generate(
+                self.model,
+                prompt,
+                generation_config=self.generation_config
+            )
+            summary, parse = self._parse_summary(response.text, chunk)
+            call.parse = parse
+
+        if parse == PARSE_OK:
+            self.response_cache.put(cache_key, response.text, KIND_SUMMARY)
+        return summary, False
+
+    async def _summarize_async(self, prompt: str, chunk: str) -> Tuple[str, bool]:
+        """1パートを要約する（asyncio版）"""
+        cache_key = self._cache_key(prompt)
+        cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+        if cached is not None:
+            record_cache_hit(OP_SUMMARY)
+            return self._parse_summary(cached, chunk)[0], True
+
+        with llm_call(OP_SUMMARY) as call:
+            response = await self.transport.generate_async(
+                self.model,
+                prompt,
+                generation_config=self.generation_config
+            )
+            summary, parse = self._parse_summary(response.text, chunk)
+            call.parse = parse
+
+        if parse == PARSE_OK:
+            await asyncio.to_thread(self.response_cache.put, cache_key, response.text, KIND_SUMMARY)
+        return summary, False
+
+    def _parse_summary(self, result_text: str, chunk: str) -> Tuple[str, str]:
+        """
+        要約の応答をテキストにする
+
+        解析できない・要約が空の場合は、パートの先頭をそのまま使う。
+
+        Returns:
+            (要約テキスト, JSON解析の結果 PARSE_OK / PARSE_REPAIRED / PARSE_FALLBACK)
+        """
+        try:
+            value, repaired = parse_json_lenient(result_text)
+        except json.JSONDecodeError:
+            value, repaired = None, True
+        value = fill_from_template(value if isinstance(value, dict) else {}, _SUMMARY_TEMPLATE)
+
+        summary = str(value.get("summary") or "").strip()
+        if not summary:
+            print("[WARNING] パートの要約を取り出せなかったため、本文の先頭を使用します")
+            return chunk[:self.chunk_chars // 4], PARSE_FALLBACK
+
+        lines = [summary]
+        skills = [str(skill) for skill in value.get("skills") or [] if skill]
+        if skills:
+            lines.append(f"スキル: {', '.join(skills)}")
+        lines.extend(f"- {highlight}" for highlight in value.get("highlights") or [] if highlight)
+        return "\n".join(lines), PARSE_REPAIRED if repaired else PARSE_OK
+
+    def _finish(
+        self,
+        resume_hash: str,
+        resume_text: str,
+        summaries: List[Tuple[str, bool]],
+        started: float
+    ) -> str:
+        """パートの要約をまとめて保持し、ログを出力する"""
+        total = len(summaries)
+        parts = [
+            f"■ パート{index}/{total}\n{summary}"
+            for index, (summary, _) in enumerate(summaries, start=1)
+        ]
+        digest = (
+            "（長い職務経歴書のため、パートごとの要約を記載しています）\n\n" + "\n\n".join(parts)
+        )
+        cached = sum(1 for _, from_cache in summaries if from_cache)
+        print(
+            f"[INFO] 履歴書を{total}パートに分けて要約しました: "
+            f"{len(resume_text)}文字 → {len(digest)}文字 "
+            f"(キャッシュ {cached}/{total}, {(time.perf_counter() - started) * 1000:.0f}ms)"
+        )
+
+        with self._lock:
+            self._digests[resume_hash] = digest
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+        return digest
+
+    def _get_digest(self, resume_hash: str) -> Optional[str]:
+        """プロセス内に保持している要約文"""
+        with self._lock:
+            digest = self._digests.get(resume_hash)
+            if digest is not None:
+                self._digests.move_to_end(resume_hash)
+            return digest
+
+    def _resume_hash(self, resume_text: str) -> str:
+        """要約文を保持するキー（履歴書の内容・分割の設定・要約の形式）"""
+        return hashlib.sha256(
+            f"{DIGEST_VERSION}/{self.chunk_chars}/{self.model.model_name}\n{resume_text}".encode("utf-8")
+        ).hexdigest()
+
+    def _cache_key(self, prompt: str) -> str:
+        """パートの要約の応答キャッシュキー"""
+        return self.response_cache.make_key(
+            self.model.model_name, prompt, self.generation_config
+        )
+
+    @staticmethod
+    def _chunk_prompt(chunk: str, index: int, total: int) -> str:
+        """パートの要約用のプロンプト"""
+        return f"""あなたは採用担当者のアシスタントです。以下は{total}パートに分けた職務経歴書の{index}パート目です。
+書類選考と面接準備に使うため、このパートの内容を要約してください。
+
+【出力項目】
+- summary: 在籍企業・担当業務・役割・期間を400文字程度で
+- skills: 記載されている技術・スキル・資格（表記は原文のまま）
+- highlights: 成果や特筆すべき実績（数値・期間・規模は省略しない）
+
+**重要**:
+- 記載のない内容を推測で補わない
+- 他のパートの内容には触れない
+
+【職務経歴書（{index}/{total}）】
+{chunk}
+"""
+
+
+_digester: Optional[ResumeDigester] = None
+_digester_lock = threading.Lock()
+
+
+def get_resume_digester() -> ResumeDigester:
+    """プロセス共通のResumeDigesterを取得する"""
+    global _digester
+    with _digester_lock:
+        if _digester is None:
+            _digester = ResumeDigester()
+        return _digester
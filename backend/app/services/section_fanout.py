@@ -0,0 +1,236 @@
+"""
+Section Fan-out
+評価テンプレートのセクションごとに評価を生成し、総合スコア・推薦度・次のステップを
+ローカルで組み立てるためのヘルパー
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from .prompt_prefix import compact_json
+from .structured_output import fill_from_template, parse_json_lenient, structured_output_enabled
+
+
+# セクションと表示名（EvaluationCriteria.category の値）
+SECTION_NAMES = {
+    "technical_skills": "技術スキル",
+    "experience_quality": "経験の質",
+    "cultural_fit": "文化適合性",
+    "growth_potential": "成長可能性",
+}
+CATEGORY_SECTIONS = {name: section for section, name in SECTION_NAMES.items()}
+
+# 総合スコア（0-10）の下限と推薦度（prompt_prefix.GUIDELINES の選択肢）
+RECOMMENDATION_THRESHOLDS = [
+    (8.0, "強く推薦"),
+    (6.5, "推薦"),
+    (5.0, "条件付き推薦"),
+]
+REJECTED = "不合格"
+
+# セクションごとの応答に追加で出力させる「面接で確認すべき点」（next_steps にまとめる）
+CLARIFY_KEY = "questions_to_clarify"
+MAX_CLARIFICATIONS = 6
+# これ未満のスコアのセクションを面接で重点的に確認する
+FOCUS_SCORE_BELOW = 7
+
+
+def section_templates(evaluation_template: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """評価テンプレートのセクションごとのテンプレート"""
+    return evaluation_template.get("evaluation_format", {}).get("sections", {})
+
+
+def section_output_template(section_template: Dict[str, Any]) -> Dict[str, Any]:
+    """1セクション分の応答のテンプレート（面接で確認すべき点を加える）"""
+    return dict(section_template, **{CLARIFY_KEY: []})
+
+
+def section_instruction(name: str, section_template: Dict[str, Any]) -> str:
+    """
+    1セクションだけを評価させる指示（履歴書の後ろに付ける）
+
+    Args:
+        name: セクション名（technical_skills など）
+        section_template: セクションのテンプレート
+
+    Returns:
+        指示のテキスト
+    """
+    instruction = f"""# 評価対象
+この呼び出しでは「{SECTION_NAMES.get(name, name)} ({name})」のセクションだけを評価してください。
+- score は0-10で評価（10が最高）し、summary・details には履歴書からの具体的な根拠を記載
+- {CLARIFY_KEY} には、このセクションについて次の面接で確認すべき点を最大3つ記載
+- overall_score・recommendation・他のセクションは出力しない"""
+    if not structured_output_enabled():
+        instruction += (
+            f"\n\n以下のJSON形式で出力してください：\n{compact_json(section_output_template(section_template))}"
+        )
+    return instruction
+
+
+def parse_section(
+    result_text: str,
+    section_template: Dict[str, Any]
+) -> Tuple[Dict[str, Any], List[str], bool]:
+    """
+    1セクション分の応答から評価と面接で確認すべき点を取り出す
+
+    Args:
+        result_text: Geminiの応答テキスト
+        section_template: セクションのテンプレート
+
+    Returns:
+        (セクションの評価, 面接で確認すべき点, 修復したかどうか)
+
+    Raises:
+        json.JSONDecodeError: 修復しても解析できない場合
+    """
+    section, repaired = parse_json_lenient(result_text)
+    if not isinstance(section, dict):
+        raise json.JSONDecodeError("セクションのオブジェクトではありません", result_text, 0)
+    if repaired:
+        section = fill_from_template(section, section_output_template(section_template))
+    clarifications = [str(item) for item in section.pop(CLARIFY_KEY, None) or [] if item]
+    return section, clarifications, repaired
+
+
+def load_criteria(job_posting_id: Optional[int]) -> List[Tuple[str, float]]:
+    """
+    募集要項の評価基準（EvaluationCriteria）の項目と重み
+
+    Returns:
+        [(category, weight)]（募集要項の指定がない・取得できない場合は空）
+    """
+    if not job_posting_id:
+        return []
+
+    from database import SessionLocal
+    from models.database import EvaluationCriteria
+
+    db = SessionLocal()
+    try:
+        rows = db.query(EvaluationCriteria).filter(
+            EvaluationCriteria.job_posting_id == job_posting_id
+        ).all()
+        return [(row.category, row.weight if row.weight is not None else 1.0) for row in rows]
+    except Exception as e:
+        print(f"[WARNING] 評価基準の取得に失敗したため job_requirements.json の重みを使用します: {str(e)}")
+        return []
+    finally:
+        db.close()
+
+
+def section_weights(
+    evaluation_template: Dict[str, Any],
+    job_requirements: Dict[str, Any],
+    criteria: List[Tuple[str, float]]
+) -> Dict[str, float]:
+    """
+    総合スコアに使うセクションごとの重み（合計1）
+
+    EvaluationCriteria の category（表示名またはセクション名）が一致するセクションはその重みを使う。
+    一致するものがなければ job_requirements.json の evaluation_criteria、それもなければ均等にする。
+
+    Args:
+        evaluation_template: 評価テンプレート
+        job_requirements: 募集要項
+        criteria: load_criteria の結果
+
+    Returns:
+        {セクション名: 重み}
+    """
+    names = list(section_templates(evaluation_template))
+    weights: Dict[str, float] = {}
+    for category, weight in criteria:
+        section = CATEGORY_SECTIONS.get(category, category)
+        if section in names:
+            weights[section] = float(weight)
+
+    if not weights:
+        defaults = job_requirements.get("evaluation_criteria") or {}
+        for name in names:
+            weight = (defaults.get(name) or {}).get("weight")
+            if weight is not None:
+                weights[name] = float(weight)
+
+    total = sum(weight for weight in weights.values() if weight > 0)
+    if total <= 0:
+        return {name: round(1 / len(names), 4) for name in names} if names else {}
+    return {name: round(max(weights.get(name, 0.0), 0.0) / total, 4) for name in names}
+
+
+def recommendation_for(overall_score: float) -> str:
+    """総合スコアに対応する推薦度"""
+    for threshold, recommendation in RECOMMENDATION_THRESHOLDS:
+        if overall_score >= threshold:
+            return recommendation
+    return REJECTED
+
+
+def merge_sections(
+    evaluation_template: Dict[str, Any],
+    sections: Dict[str, Dict[str, Any]],
+    clarifications: List[str],
+    weights: Dict[str, float]
+) -> Dict[str, Any]:
+    """
+    セクションごとの評価を1つの評価結果にまとめる
+
+    総合スコアはセクションのスコアを10点満点に換算した重み付き平均、推薦度はそのスコアから決める。
+    next_steps は、スコアの低いセクションと懸念点を重点確認項目に、各セクションで挙がった
+    確認すべき点を質問にまとめる。
+
+    Args:
+        evaluation_template: 評価テンプレート
+        sections: {セクション名: セクションの評価}
+        clarifications: 面接で確認すべき点（セクションの順）
+        weights: section_weights の結果
+
+    Returns:
+        評価テンプレートの形式の評価結果
+    """
+    evaluation_result = fill_from_template({}, evaluation_template)
+    eval_data = evaluation_result["evaluation_format"]
+    eval_data["sections"].update(sections)
+
+    overall = 0.0
+    scored = []
+    for name, section in eval_data["sections"].items():
+        max_score = _as_number(section.get("max_score")) or 10
+        score = min(max(_as_number(section.get("score")), 0.0), max_score)
+        overall += weights.get(name, 0.0) * score / max_score * 10
+        scored.append((score / max_score * 10, name, section))
+
+    overall = round(overall, 1)
+    eval_data["overall_score"] = overall
+    eval_data["recommendation"] = recommendation_for(overall)
+    eval_data["score_weights"] = weights
+
+    focus_areas: List[str] = []
+    for score, name, section in sorted(scored, key=lambda item: item[0]):
+        if score < FOCUS_SCORE_BELOW:
+            focus_areas.append(f"{SECTION_NAMES.get(name, name)}（{score:.0f}/10）")
+    for section in eval_data["sections"].values():
+        for key, value in (section.get("details") or {}).items():
+            if key.endswith("concerns") and isinstance(value, list):
+                focus_areas.extend(str(item) for item in value if item)
+
+    eval_data["next_steps"] = {
+        "proceed_to_interview": eval_data["recommendation"] != REJECTED,
+        "interview_focus_areas": _unique(focus_areas)[:MAX_CLARIFICATIONS],
+        "questions_to_clarify": _unique(clarifications)[:MAX_CLARIFICATIONS],
+    }
+    return evaluation_result
+
+
+def _as_number(value: Any) -> float:
+    """スコアの数値（数値でなければ0）"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _unique(items: List[str]) -> List[str]:
+    """順序を保って重複を除く"""
+    return list(dict.fromkeys(item.strip() for item in items if item and item.strip()))
@@ -0,0 +1,174 @@
+"""
+Single Flight
+同じキーの処理が同時に要求された場合に、1回だけ実行して結果を共有するサービス
+"""
+
+import asyncio
+import copy
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    """実行中（または保持中）の処理"""
+
+    def __init__(self):
+        self.future: Future = Future()
+        self.finished_at: Optional[float] = None
+
+
+class SingleFlight:
+    """キーごとに処理を1回だけ実行し、同時に待っている呼び出し元へ結果を共有する
+
+    最初の呼び出し元（リーダー）だけが処理を実行し、実行中に同じキーで呼び出した
+    スレッド・コルーチンはその結果を待つ。失敗した場合は全員に同じ例外を送出し、
+    次の呼び出しで改めて実行する。
+    retention_seconds を指定すると、成功した結果をその間保持して後続の重複にも返す。
+    """
+
+    def __init__(self, name: str, retention_seconds: float = 0):
+        """
+        SingleFlightの初期化
+
+        Args:
+            name: 統計表示用の名前
+            retention_seconds: 完了後も結果を共有する秒数
+        """
+        self.name = name
+        self.retention_seconds = retention_seconds
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "executed": 0,
+            "shared": 0,
+        }
+
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        """
+        キーに対応する処理に参加する
+
+        Returns:
+            (処理, リーダーかどうか)
+        """
+        with self._lock:
+            self._expire_locked()
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["shared"] += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self._stats["executed"] += 1
+            return call, True
+
+    def _finish(self, key: str, call: _Call, result: Any = None, error: BaseException = None):
+        """リーダーの処理結果を待っている呼び出し元に渡す"""
+        with self._lock:
+            if error is not None or self.retention_seconds <= 0:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            else:
+                call.finished_at = time.monotonic()
+
+        if isinstance(error, asyncio.CancelledError):
+            call.future.cancel()
+        elif error is not None:
+            call.future.set_exception(error)
+        else:
+            call.future.set_result(result)
+
+    def _expire_locked(self):
+        """保持期間を過ぎた結果を削除する（ロック取得済みで呼ぶ）"""
+        if self.retention_seconds <= 0:
+            return
+        now = time.monotonic()
+        expired = [
+            key for key, call in self._calls.items()
+            if call.finished_at is not None and now - call.finished_at > self.retention_seconds
+        ]
+        for key in expired:
+            del self._calls[key]
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        処理を実行する（同期版）
+
+        Args:
+            key: 重複を判定するキー
+            fn: 実行する処理
+
+        Returns:
+            (結果, 他の呼び出しの結果を共有したかどうか)
+        """
+        call, leader = self._join(key)
+        if not leader:
+            # 呼び出し元ごとに結果を書き換えても影響しないようコピーを返す
+            return copy.deepcopy(call.future.result()), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result, False
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        処理を実行する（asyncio版）
+
+        別スレッドの同期版の呼び出しとも結果を共有する。
+
+        Args:
+            key: 重複を判定するキー
+            fn: 実行するコルーチンを返す関数
+
+        Returns:
+            (結果, 他の呼び出しの結果を共有したかどうか)
+        """
+        call, leader = self._join(key)
+        if not leader:
+            result = await asyncio.wrap_future(call.future)
+            return copy.deepcopy(result), True
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, call, error=e)
+            raise
+        self._finish(key, call, result=result)
+        return result, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """実行回数と共有した回数（ヘルスチェック用）を返す"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = sum(1 for call in self._calls.values() if call.finished_at is None)
+        return stats
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str, retention_seconds: float = 0) -> SingleFlight:
+    """
+    名前ごとにプロセス共通のSingleFlightを取得する
+
+    Args:
+        name: 用途を表す名前（例: "evaluation"）
+        retention_seconds: 初回作成時に使う、完了後も結果を共有する秒数
+    """
+    with _flights_lock:
+        if name not in _flights:
+            _flights[name] = SingleFlight(name, retention_seconds)
+        return _flights[name]
+
+
+def get_single_flight_stats() -> Dict[str, Any]:
+    """すべてのSingleFlightの統計を返す"""
+    with _flights_lock:
+        flights = list(_flights.values())
+    return {flight.name: flight.get_stats() for flight in flights}
@@ -0,0 +1,286 @@
+"""
+Speculative Questions
+書類選考で面接に進む候補者について、一次面接の質問を先回りして生成・保存するサービス
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set, Tuple
+
+from .llm_scheduler import LANE_BATCH, llm_lane
+from .question_generator import QuestionGenerationError, get_question_generator
+
+# 先回り生成した質問の generated_by（面接官が取得すると "ai" に変わる）
+GENERATED_BY_SPECULATIVE = "speculative"
+GENERATED_BY_AI = "ai"
+
+# 実行中の先回り生成タスク（完了前にガベージコレクトされないよう保持する）
+_speculative_tasks: Set[asyncio.Task] = set()
+
+
+def generation_kwargs(db, candidate, stage, num_questions: int) -> Dict[str, Any]:
+    """
+    候補者・選考段階・直近の評価から質問生成の引数を組み立てる
+
+    質問生成APIと先回り生成で同じプロンプトになるよう、両方からこの関数を使う。
+
+    Args:
+        db: データベースセッション
+        candidate: 候補者（Candidate）
+        stage: 選考段階（SelectionStage）
+        num_questions: 生成する質問数
+
+    Returns:
+        AsyncQuestionGenerator.generate_questions_async の引数
+    """
+    from models.database import Evaluation
+
+    # 評価サマリーを取得（これまでの評価から）
+    evaluation = db.query(Evaluation).filter(
+        Evaluation.candidate_id == candidate.id
+    ).order_by(Evaluation.created_at.desc()).first()
+
+    evaluation_summary = None
+    if evaluation:
+        evaluation_summary = {
+            "strengths": evaluation.strengths or [],
+            "concerns": evaluation.concerns or []
+        }
+
+    return {
+        "candidate_name": candidate.name,
+        "stage_name": stage.stage_name,
+        "job_title": stage.job_posting.title if stage.job_posting else "未設定",
+        "candidate_resume": candidate.resume_text,
+        "evaluation_summary": evaluation_summary,
+        "num_questions": num_questions,
+        "job_posting_id": stage.job_posting_id,
+    }
+
+
+def claim_speculative(db, candidate_id: int, stage_id: int) -> int:
+    """
+    先回り生成した質問を使用済み（generated_by="ai"）にする（コミットは呼び出し側で行う）
+
+    Returns:
+        使用済みにした質問数
+    """
+    from models.database import AIQuestion
+
+    return db.query(AIQuestion).filter(
+        AIQuestion.candidate_id == candidate_id,
+        AIQuestion.selection_stage_id == stage_id,
+        AIQuestion.generated_by == GENERATED_BY_SPECULATIVE
+    ).update({AIQuestion.generated_by: GENERATED_BY_AI}, synchronize_session=False)
+
+
+def discard_speculative(db, candidate_id: int, stage_id: int) -> int:
+    """
+    未使用の先回り生成の質問を削除する（質問を生成し直す場合。コミットは呼び出し側で行う）
+
+    Returns:
+        削除した質問数
+    """
+    from models.database import AIQuestion
+
+    return db.query(AIQuestion).filter(
+        AIQuestion.candidate_id == candidate_id,
+        AIQuestion.selection_stage_id == stage_id,
+        AIQuestion.generated_by == GENERATED_BY_SPECULATIVE
+    ).delete(synchronize_session=False)
+
+
+class SpeculativeQuestionService:
+    """一次面接の質問を先回りして生成するクラス
+
+    書類選考の評価で next_steps.proceed_to_interview が true の候補者について、
+    評価の保存後にバックグラウンドで質問を生成し、generated_by="speculative" で保存する。
+    生成は一括処理のレーン（LANE_BATCH）で行い、対話的なGemini呼び出しを優先させる。
+    面接官が質問を取得した時点で使用済みにし、ttl_hours を過ぎても使われなかったものは削除する。
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        stage_order: Optional[int] = None,
+        num_questions: Optional[int] = None,
+        ttl_hours: Optional[float] = None
+    ):
+        """
+        SpeculativeQuestionServiceの初期化
+
+        Args:
+            enabled: 先回り生成を行うかどうか（未指定の場合は環境変数から取得）
+            stage_order: 質問を生成する選考段階の順序（未指定の場合は環境変数から取得）
+            num_questions: 生成する質問数（未指定の場合は環境変数から取得）
+            ttl_hours: 未使用の質問を保持する時間（未指定の場合は環境変数から取得）
+        """
+        if enabled is None:
+            enabled = os.getenv("SPECULATIVE_QUESTIONS_ENABLED", "true").lower() != "false"
+        self.enabled = enabled
+        self.stage_order = stage_order or int(os.getenv("SPECULATIVE_QUESTIONS_STAGE_ORDER", "2"))
+        self.num_questions = num_questions or int(os.getenv("SPECULATIVE_QUESTIONS_NUM", "30"))
+        self.ttl_hours = ttl_hours or float(os.getenv("SPECULATIVE_QUESTIONS_TTL_HOURS", "72"))
+
+    def should_speculate(self, evaluation_result: Dict[str, Any]) -> bool:
+        """評価結果が面接に進む判定かどうか"""
+        next_steps = (evaluation_result.get("evaluation_format") or {}).get("next_steps") or {}
+        return self.enabled and next_steps.get("proceed_to_interview") is True
+
+    def schedule(self, candidate_id: Optional[int], evaluation_result: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """
+        先回り生成をバックグラウンドで開始する（実行中のイベントループから呼び出す）
+
+        Args:
+            candidate_id: 保存した候補者ID（保存に失敗した場合はNone）
+            evaluation_result: 書類選考の評価結果
+
+        Returns:
+            開始したタスク（対象外の場合はNone）
+        """
+        if candidate_id is None or not self.should_speculate(evaluation_result):
+            return None
+
+        task = asyncio.create_task(self.pregenerate(candidate_id))
+        _speculative_tasks.add(task)
+        task.add_done_callback(_speculative_tasks.discard)
+        return task
+
+    async def pregenerate(self, candidate_id: int) -> int:
+        """
+        候補者の質問を生成して保存する（失敗しても例外は送出しない）
+
+        Returns:
+            保存した質問数
+        """
+        try:
+            with llm_lane(LANE_BATCH):
+                prepared = await asyncio.to_thread(self._prepare, candidate_id)
+                if prepared is None:
+                    return 0
+                stage_id, kwargs = prepared
+
+                # 生成に失敗した場合の基本的な質問は保存せず、面接官が生成し直せるようにする
+                try:
+                    questions = await get_question_generator().generate_questions_async(
+                        **kwargs, use_fallback=False
+                    )
+                except QuestionGenerationError as e:
+                    print(f"[WARNING] 質問の先回り生成に失敗しました: candidate_id={candidate_id}: {str(e)}")
+                    return 0
+
+                saved = await asyncio.to_thread(self._save, candidate_id, stage_id, questions)
+                await asyncio.to_thread(self.collect_garbage)
+            if saved:
+                print(f"[INFO] 質問を先回り生成しました: candidate_id={candidate_id}, {saved}問")
+            return saved
+        except Exception as e:
+            print(f"[WARNING] 質問の先回り生成に失敗しました: candidate_id={candidate_id}: {str(e)}")
+            return 0
+
+    def collect_garbage(self, now: Optional[datetime] = None) -> int:
+        """
+        ttl_hours を過ぎても使われなかった先回り生成の質問を削除する
+
+        Args:
+            now: 基準の日時（未指定の場合は現在時刻）
+
+        Returns:
+            削除した質問数
+        """
+        from database import SessionLocal
+        from models.database import AIQuestion
+
+        expires_before = (now or datetime.utcnow()) - timedelta(hours=self.ttl_hours)
+        db = SessionLocal()
+        try:
+            deleted = db.query(AIQuestion).filter(
+                AIQuestion.generated_by == GENERATED_BY_SPECULATIVE,
+                AIQuestion.created_at < expires_before
+            ).delete(synchronize_session=False)
+            db.commit()
+            if deleted:
+                print(f"[INFO] 未使用の先回り生成の質問を削除しました: {deleted}問")
+            return deleted
+        except Exception as e:
+            db.rollback()
+            print(f"[WARNING] 先回り生成の質問の削除に失敗しました: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def _prepare(self, candidate_id: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        生成対象の選考段階と質問生成の引数（ワーカースレッドで実行）
+
+        Returns:
+            (選考段階ID, 質問生成の引数)、選考段階がない・質問が既にある場合はNone
+        """
+        from database import SessionLocal
+        from models.database import Candidate, SelectionStage
+
+        db = SessionLocal()
+        try:
+            candidate = db.query(Candidate).filter(Candidate.id == candidate_id).first()
+            if not candidate or not candidate.job_posting_id:
+                return None
+            stage = db.query(SelectionStage).filter(
+                SelectionStage.job_posting_id == candidate.job_posting_id,
+                SelectionStage.stage_order == self.stage_order
+            ).first()
+            if not stage or self._has_questions(db, candidate_id, stage.id):
+                return None
+            return stage.id, generation_kwargs(db, candidate, stage, self.num_questions)
+        finally:
+            db.close()
+
+    def _save(self, candidate_id: int, stage_id: int, questions) -> int:
+        """生成した質問を保存する（生成中に面接官が質問を作成していた場合は保存しない）"""
+        from database import SessionLocal
+        from models.database import AIQuestion
+
+        db = SessionLocal()
+        try:
+            if self._has_questions(db, candidate_id, stage_id):
+                return 0
+            for q_data in questions:
+                db.add(AIQuestion(
+                    candidate_id=candidate_id,
+                    selection_stage_id=stage_id,
+                    question=q_data.get("question", ""),
+                    purpose=q_data.get("purpose"),
+                    category=q_data.get("category"),
+                    generated_by=GENERATED_BY_SPECULATIVE
+                ))
+            db.commit()
+            return len(questions)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _has_questions(db, candidate_id: int, stage_id: int) -> bool:
+        """候補者・選考段階の質問が既にあるかどうか"""
+        from models.database import AIQuestion
+
+        return db.query(AIQuestion.id).filter(
+            AIQuestion.candidate_id == candidate_id,
+            AIQuestion.selection_stage_id == stage_id
+        ).first() is not None
+
+
+_speculative_questions: Optional[SpeculativeQuestionService] = None
+_speculative_questions_lock = threading.Lock()
+
+
+def get_speculative_questions() -> SpeculativeQuestionService:
+    """プロセス共通のSpeculativeQuestionServiceを取得する"""
+    global _speculative_questions
+    with _speculative_questions_lock:
+        if _speculative_questions is None:
+            _speculative_questions = SpeculativeQuestionService()
+        return _speculative_questions
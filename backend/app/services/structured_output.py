@@ -0,0 +1,344 @@
+"""
+Structured Output
+Geminiの構造化出力（JSONスキーマ指定）と、壊れたJSON応答の修復を行うサービス
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 修復時に試す切り詰め位置の上限（長い応答で試行回数が増えすぎないようにする）
+MAX_REPAIR_ATTEMPTS = 64
+
+QUESTIONS_SCHEMA: Dict[str, Any] = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "question": {"type": "string"},
+            "purpose": {"type": "string"},
+            "category": {"type": "string"},
+        },
+        "required": ["question", "purpose", "category"],
+    },
+}
+
+# 長い履歴書のパートごとの要約（services/resume_digest.py）
+SUMMARY_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "skills": {"type": "array", "items": {"type": "string"}},
+        "highlights": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["summary", "skills", "highlights"],
+}
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {
+    "parsed": 0,
+    "repaired": 0,
+    "failed": 0,
+}
+
+
+def structured_output_enabled() -> bool:
+    """構造化出力を使うかどうか（環境変数 GEMINI_STRUCTURED_OUTPUT）"""
+    return os.getenv("GEMINI_STRUCTURED_OUTPUT", "true").lower() != "false"
+
+
+def json_generation_config(
+    base_config: Dict[str, Any],
+    schema: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    生成パラメータにJSON出力とスキーマの指定を追加する
+
+    Args:
+        base_config: temperature などの基本パラメータ
+        schema: 応答のJSONスキーマ
+
+    Returns:
+        generation_config（構造化出力が無効な場合は base_config のコピー）
+    """
+    config = dict(base_config)
+    if structured_output_enabled() and schema is not None:
+        config["response_mime_type"] = "application/json"
+        config["response_schema"] = schema
+    return config
+
+
+def schema_from_template(template: Any) -> Dict[str, Any]:
+    """
+    評価テンプレート（evaluation_template.json）から応答のJSONスキーマを生成する
+
+    テンプレートの値の型をそのままスキーマの型とし、オブジェクトのキーはすべて必須とする。
+    空リストは文字列の配列とみなす。
+
+    Args:
+        template: テンプレートの値
+
+    Returns:
+        Gemini の response_schema に指定できるスキーマ
+    """
+    if isinstance(template, dict):
+        return {
+            "type": "object",
+            "properties": {key: schema_from_template(value) for key, value in template.items()},
+            "required": list(template.keys()),
+        }
+    if isinstance(template, list):
+        item = template[0] if template else ""
+        return {"type": "array", "items": schema_from_template(item)}
+    if isinstance(template, bool):
+        return {"type": "boolean"}
+    if isinstance(template, (int, float)):
+        return {"type": "number"}
+    return {"type": "string"}
+
+
+def fill_from_template(value: Any, template: Any) -> Any:
+    """
+    修復した応答に欠けているキーをテンプレートの既定値で補う
+
+    Args:
+        value: 解析した応答
+        template: テンプレートの値
+
+    Returns:
+        欠けたキーを補った応答
+    """
+    if not isinstance(template, dict):
+        return value
+    if not isinstance(value, dict):
+        return json.loads(json.dumps(template))
+
+    for key, default in template.items():
+        if key not in value:
+            value[key] = json.loads(json.dumps(default))
+        else:
+            value[key] = fill_from_template(value[key], default)
+    return value
+
+
+def parse_json_lenient(text: str) -> Tuple[Any, bool]:
+    """
+    LLMの応答からJSONを取り出す（壊れている場合は修復を試みる）
+
+    - ```json ... ``` のコードブロックや前後の説明文を無視する
+    - JSONの後ろに続く余分なテキストを無視する
+    - 出力トークン上限などで途中で切れたJSONは、最後に完結した要素までで閉じる
+
+    Args:
+        text: Geminiの応答テキスト
+
+    Returns:
+        (解析結果, 修復したかどうか)
+
+    Raises:
+        json.JSONDecodeError: 修復しても解析できない場合
+    """
+    try:
+        value, repaired = _parse(text)
+    except json.JSONDecodeError:
+        _count("failed")
+        raise
+    _count("repaired" if repaired else "parsed")
+    return value, repaired
+
+
+def _parse(text: str) -> Tuple[Any, bool]:
+    """parse_json_lenient の本体（統計を記録しない）"""
+    text = text or ""
+    start = _find_start(text)
+    if start is None:
+        # JSONの開始記号がない場合は通常の解析エラーとする
+        return json.loads(text), False
+
+    end, stack, in_string, cut_points = _scan(text, start)
+    if end is not None:
+        # 完結したJSONが見つかった（後続のテキストは無視する）
+        value = json.loads(text[start:end])
+        return value, bool(text[end:].strip().strip("`").strip())
+
+    # 途中で切れている: 開いている文字列・括弧を閉じて解析を試みる
+    body = text[start:]
+    candidates = [body + ('"' if in_string else "") + _closing(stack)]
+    for position, snapshot in reversed(cut_points[-MAX_REPAIR_ATTEMPTS:]):
+        candidates.append(text[start:position] + _closing(snapshot))
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate), True
+        except json.JSONDecodeError:
+            continue
+
+    raise json.JSONDecodeError("JSONを修復できませんでした", text, start)
+
+
+def _find_start(text: str) -> Optional[int]:
+    """最初の { または [ の位置"""
+    positions = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    return min(positions) if positions else None
+
+
+def _scan(text: str, start: int):
+    """
+    文字列・括弧の対応を追いながら走査する
+
+    Returns:
+        (完結した位置 or None, 未完了の括弧, 文字列の途中かどうか, 切り詰め候補の位置と括弧の状態)
+    """
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    cut_points: List[Tuple[int, Tuple[str, ...]]] = []
+
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(char)
+            # 空のコンテナとして閉じられる位置
+            cut_points.append((index + 1, tuple(stack)))
+        elif char in ("}", "]"):
+            if not stack:
+                return index, stack, False, cut_points
+            stack.pop()
+            if not stack:
+                return index + 1, stack, False, cut_points
+        elif char == ",":
+            # 直前の要素までで閉じられる位置
+            cut_points.append((index, tuple(stack)))
+
+    return None, stack, in_string, cut_points
+
+
+def _closing(stack) -> str:
+    """開いている括弧を閉じる文字列"""
+    return "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+class StreamingObjectParser:
+    """ストリーミングで届くJSONを少しずつ走査し、指定したパスのオブジェクトが閉じた時点で取り出す
+
+    例えば ("evaluation_format", "sections", "technical_skills") を指定すると、
+    応答全体が届く前でも技術スキルの評価が完結した時点で辞書として返す。
+    配列の要素のキーは None とする（最上位の配列の各要素は (None,)）。
+    """
+
+    def __init__(self, paths):
+        """
+        StreamingObjectParserの初期化
+
+        Args:
+            paths: 取り出すオブジェクトのキーのパス（タプル）の集合
+        """
+        self.paths = set(paths)
+        self._buffer = ""
+        self._position = 0
+        self._started = False
+        self._stack: List[Tuple[str, int, Optional[str]]] = []  # (開き括弧, 開始位置, 親でのキー)
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string = None
+        self._pending_key: Optional[str] = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[Tuple[str, ...], Any]]:
+        """
+        届いたテキストを追加で走査する
+
+        Args:
+            text: ストリーミング応答のチャンク
+
+        Returns:
+            このチャンクで完結した (パス, 値) のリスト
+        """
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+
+        for index in range(self._position, len(buffer)):
+            if self.done:
+                break
+            char = buffer[index]
+
+            if not self._started:
+                # コードブロックや前置きの説明文は読み飛ばす
+                if char not in _CLOSERS:
+                    continue
+                self._started = True
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = buffer[self._string_start:index + 1]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char == ":":
+                if self._stack and self._stack[-1][0] == "{" and self._last_string is not None:
+                    try:
+                        self._pending_key = json.loads(self._last_string)
+                    except json.JSONDecodeError:
+                        self._pending_key = None
+            elif char == ",":
+                self._pending_key = None
+            elif char in _CLOSERS:
+                in_object = bool(self._stack) and self._stack[-1][0] == "{"
+                self._stack.append((char, index, self._pending_key if in_object else None))
+                self._pending_key = None
+            elif char in ("}", "]"):
+                if not self._stack:
+                    self.done = True
+                    break
+                _, start, key = self._stack.pop()
+                # 最上位の値自体のパスは ()
+                path = tuple(entry[2] for entry in self._stack[1:]) + (key,) if self._stack else ()
+                if path in self.paths:
+                    try:
+                        completed.append((path, json.loads(buffer[start:index + 1])))
+                    except json.JSONDecodeError:
+                        pass
+                if not self._stack:
+                    self.done = True
+
+        self._position = len(buffer)
+        return completed
+
+
+def _count(name: str):
+    """統計カウンタを加算"""
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_structured_output_stats() -> Dict[str, Any]:
+    """JSON応答の解析統計（ヘルスチェック用）を返す"""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = stats["parsed"] + stats["repaired"] + stats["failed"]
+    stats["failure_rate"] = round(stats["failed"] / total, 3) if total else 0.0
+    return stats
@@ -0,0 +1,135 @@
+"""
+Resume Text Normalizer
+PDFから抽出した履歴書テキストを正規化し、プロンプトを小さくするサービス
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List
+
+
+class TextNormalizer:
+    """抽出テキストの正規化を行うクラス
+
+    - NFKC正規化（全角英数字・記号を半角に、半角カナを全角に統一）
+    - 各ページの先頭・末尾に繰り返し現れるヘッダー・フッターの除去
+    - ページ番号だけの行の除去
+    - 連続する空白・空行の圧縮
+    """
+
+    # 正規化ロジックを変更した場合はインクリメントする（抽出キャッシュのキーに含まれる）
+    VERSION = "1"
+
+    # ヘッダー・フッターとみなす、ページ先頭・末尾からの行数
+    EDGE_LINES = 3
+
+    # この割合以上のページに現れる行を定型文とみなす
+    BOILERPLATE_RATIO = 0.5
+
+    _WHITESPACE_RE = re.compile(r"[^\S\n]+")
+    _DIGITS_RE = re.compile(r"\d+")
+    _PAGE_NUMBER_RE = re.compile(
+        r"^(?:page\s*)?[-‐－—(（]?\s*\d+\s*(?:(?:/|of)\s*\d+)?\s*[-‐－—)）]?(?:\s*ページ)?$",
+        re.IGNORECASE
+    )
+
+    def normalize_pages(self, pages: List[str]) -> Dict[str, Any]:
+        """
+        ページごとのテキストを正規化して結合する
+
+        Args:
+            pages: ページごとのテキスト
+
+        Returns:
+            {"text": 正規化後のテキスト, "original_chars": 正規化前の文字数,
+             "normalized_chars": 正規化後の文字数, "chars_saved": 削減文字数,
+             "boilerplate_lines_removed": 除去した定型行の数}
+        """
+        original_chars = len("\n\n".join(page for page in pages if page))
+
+        page_lines = [self._normalize_lines(page) for page in pages]
+        boilerplate = self._find_boilerplate(page_lines)
+
+        removed = 0
+        cleaned_pages = []
+        seen_boilerplate = set()
+        for lines in page_lines:
+            edges = self._edge_indices(lines)
+            kept = []
+            for index, line in enumerate(lines):
+                if index in edges and self._PAGE_NUMBER_RE.match(line):
+                    removed += 1
+                    continue
+                key = self._line_key(line)
+                if index in edges and key in boilerplate:
+                    # 氏名入りのヘッダーなどを失わないよう、最初の1回だけ残す
+                    if key in seen_boilerplate:
+                        removed += 1
+                        continue
+                    seen_boilerplate.add(key)
+                kept.append(line)
+            page_text = self._collapse_blank_lines(kept)
+            if page_text:
+                cleaned_pages.append(page_text)
+
+        text = "\n\n".join(cleaned_pages)
+        return {
+            "text": text,
+            "original_chars": original_chars,
+            "normalized_chars": len(text),
+            "chars_saved": original_chars - len(text),
+            "boilerplate_lines_removed": removed,
+        }
+
+    def normalize_text(self, text: str) -> str:
+        """
+        ページ区切りのないテキストを正規化する（NFKC・空白の圧縮のみ）
+
+        Args:
+            text: 正規化するテキスト
+
+        Returns:
+            正規化後のテキスト
+        """
+        return self._collapse_blank_lines(self._normalize_lines(text))
+
+    def _normalize_lines(self, text: str) -> List[str]:
+        """NFKC正規化し、行ごとに空白を圧縮する"""
+        text = unicodedata.normalize("NFKC", text or "")
+        return [
+            self._WHITESPACE_RE.sub(" ", line).strip()
+            for line in text.splitlines()
+        ]
+
+    def _find_boilerplate(self, page_lines: List[List[str]]) -> set:
+        """複数ページの先頭・末尾に繰り返し現れる行（数字は同一視）を求める"""
+        non_empty_pages = [lines for lines in page_lines if any(lines)]
+        if len(non_empty_pages) < 2:
+            return set()
+
+        counts = Counter()
+        for lines in non_empty_pages:
+            counts.update({self._line_key(lines[index]) for index in self._edge_indices(lines)})
+
+        threshold = max(2, len(non_empty_pages) * self.BOILERPLATE_RATIO)
+        return {key for key, count in counts.items() if count >= threshold}
+
+    def _edge_indices(self, lines: List[str]) -> set:
+        """空行を除いた先頭・末尾 EDGE_LINES 行の行番号"""
+        content = [index for index, line in enumerate(lines) if line]
+        return set(content[:self.EDGE_LINES] + content[-self.EDGE_LINES:])
+
+    def _line_key(self, line: str) -> str:
+        """ページ番号や日付の違いを無視して行を比較するためのキー"""
+        return self._DIGITS_RE.sub("#", line.lower())
+
+    @staticmethod
+    def _collapse_blank_lines(lines: List[str]) -> str:
+        """連続する空行を1行にまとめる"""
+        output = []
+        for line in lines:
+            if not line and (not output or not output[-1]):
+                continue
+            output.append(line)
+        return "\n".join(output).strip()
@@ -0,0 +1,123 @@
+"""
+bulk_evaluate のテスト
+"""
+
+import argparse
+import json
+
+import pytest
+
+import bulk_evaluate
+from services.extraction_pool import PDFExtractionPool
+
+
+RESUME = "Backend engineer with six years of Python, Django and PostgreSQL experience."
+
+
+class _MemoryCache:
+    """DBを使わない抽出キャッシュ"""
+
+    def get(self, content_hash, parser_version=None):
+        return None
+
+    def put(self, content_hash, text, page_count, parser_version=None):
+        pass
+
+
+class _FakeEvaluator:
+    """Geminiを呼ばずに固定の評価結果を返す DocumentEvaluator"""
+
+    calls = []
+
+    def __init__(self):
+        self.extraction_pool = PDFExtractionPool(max_workers=1, timeout=30, cache=_MemoryCache(), normalize=False)
+        self.max_pages = 10
+        self.max_chars = 20000
+
+    def evaluate_from_text(self, resume_text, candidate_name, job_posting_id=None, prescreen=True):
+        self.calls.append(candidate_name)
+        return {"evaluation_format": {"candidate_name": candidate_name, "overall_score": 7}}
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    _FakeEvaluator.calls = []
+    saved = []
+
+    def save_candidate_evaluation(candidate_name, evaluation_result, job_posting_id=None, resume_text=None):
+        saved.append({"name": candidate_name, "resume_text": resume_text})
+        return len(saved), f"C{len(saved):04d}"
+
+    monkeypatch.setattr(bulk_evaluate, "DocumentEvaluator", _FakeEvaluator)
+    monkeypatch.setattr(bulk_evaluate, "save_candidate_evaluation", save_candidate_evaluation)
+    return saved
+
+
+def _args(tmp_path, **overrides):
+    values = {
+        "directory": str(tmp_path / "pdfs"),
+        "output": str(tmp_path / "results.ndjson"),
+        "checkpoint": None,
+        "llm_concurrency": 2,
+        "job_posting_id": None,
+        "no_db": False,
+        "no_prescreen": False,
+    }
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def _write_pdfs(tmp_path, pdf_factory, names):
+    directory = tmp_path / "pdfs"
+    directory.mkdir(exist_ok=True)
+    for index, name in enumerate(names):
+        (directory / name).write_bytes(pdf_factory([f"{RESUME} #{index}"]))
+
+
+def test_saves_candidates_with_resume_text(tmp_path, pdf_factory, saved):
+    _write_pdfs(tmp_path, pdf_factory, ["Taro_Yamada.pdf", "Hanako_Sato.pdf"])
+
+    assert bulk_evaluate.run(_args(tmp_path)) == 0
+
+    assert sorted(item["name"] for item in saved) == ["Hanako Sato", "Taro Yamada"]
+    assert all(item["resume_text"].startswith(RESUME) for item in saved)
+
+
+def test_rerun_skips_completed_files(tmp_path, pdf_factory, saved):
+    _write_pdfs(tmp_path, pdf_factory, ["Taro_Yamada.pdf"])
+    bulk_evaluate.run(_args(tmp_path))
+
+    _write_pdfs(tmp_path, pdf_factory, ["Taro_Yamada.pdf", "Hanako_Sato.pdf"])
+    bulk_evaluate.run(_args(tmp_path))
+
+    assert _FakeEvaluator.calls == ["Taro Yamada", "Hanako Sato"]
+    with open(tmp_path / "results.ndjson.checkpoint", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["status"] for record in records] == ["done", "done"]
+
+
+def test_no_db_does_not_save(tmp_path, pdf_factory, saved):
+    _write_pdfs(tmp_path, pdf_factory, ["Taro_Yamada.pdf"])
+
+    bulk_evaluate.run(_args(tmp_path, no_db=True))
+
+    assert saved == []
+
+
+def test_failed_save_is_retried_on_rerun(tmp_path, pdf_factory, saved, monkeypatch):
+    _write_pdfs(tmp_path, pdf_factory, ["Taro_Yamada.pdf"])
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("no such column: evaluations.scores")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(bulk_evaluate, "save_candidate_evaluation", fail)
+        assert bulk_evaluate.run(_args(tmp_path)) == 1
+
+    assert bulk_evaluate.run(_args(tmp_path)) == 0
+
+    assert [item["name"] for item in saved] == ["Taro Yamada"]
+    assert _FakeEvaluator.calls == ["Taro Yamada", "Taro Yamada"]
+    with open(tmp_path / "results.ndjson.checkpoint", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["status"] for record in records] == ["db_failed", "done"]
@@ -0,0 +1,42 @@
+"""
+既存データベースへの不足カラムの追加のテスト
+"""
+
+from sqlalchemy import inspect, text
+
+from database import add_missing_columns, engine, init_db
+from models.database import Base
+
+
+def _columns(table):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def test_add_missing_columns_to_old_tables():
+    Base.metadata.drop_all(bind=engine)
+    init_db()
+    # カラム追加前の形のテーブルに戻す
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE ai_questions"))
+        conn.execute(text(
+            "CREATE TABLE ai_questions (id INTEGER PRIMARY KEY, selection_stage_id INTEGER, question TEXT NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO ai_questions (question) VALUES ('既存の質問')"))
+        conn.execute(text("ALTER TABLE evaluations DROP COLUMN scores"))
+        conn.execute(text("ALTER TABLE evaluations DROP COLUMN raw_data"))
+
+    added = add_missing_columns()
+
+    assert {"evaluations.scores", "evaluations.raw_data", "ai_questions.candidate_id"} <= set(added)
+    assert {"scores", "raw_data"} <= _columns("evaluations")
+    assert "candidate_id" in _columns("ai_questions")
+    # 既定値のあるカラムは既存行の値を決められないため追加しない
+    assert "generated_by" not in _columns("ai_questions")
+    assert not any(name.startswith("ai_questions.generated_by") for name in added)
+    indexes = {index["name"] for index in inspect(engine).get_indexes("ai_questions")}
+    assert "ix_ai_questions_candidate_id" in indexes
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT question, candidate_id FROM ai_questions")).all() == [("既存の質問", None)]
+
+    # 2回目は何も追加しない
+    assert add_missing_columns() == []
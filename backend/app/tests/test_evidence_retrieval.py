@@ -0,0 +1,96 @@
+"""
+BM25による履歴書の関連箇所の抜粋のテスト
+"""
+
+from services.evidence_retrieval import (
+    BM25Index,
+    EvidenceRetriever,
+    split_passages,
+    tokenize,
+)
+
+
+RESUME = "\n\n".join([
+    "山田 太郎\n職務要約: Webサービスの開発に10年従事",
+    "株式会社A: Djangoを用いた予約システムの開発、PostgreSQLのチューニングを担当",
+    "株式会社B: 営業事務として受発注を担当",
+    "株式会社C: AWS上でのインフラ構築、Terraformによる自動化",
+    "趣味: 登山、写真撮影",
+    "株式会社D: スクラムマスターとしてアジャイル開発を推進、メンバーのメンタリング",
+])
+
+JOB = {
+    "required_skills": ["Python等のプログラミング言語の実務経験", "データベースの設計・運用経験"],
+    "preferred_skills": ["クラウドサービス（AWS, GCP）の利用経験"],
+    "desired_personality": ["チームで協力してアジャイル開発を進められる方"],
+}
+
+
+def test_tokenize_mixes_words_and_bigrams():
+    assert tokenize("Python開発経験") == ["python", "開発", "発経", "経験"]
+    assert tokenize("ＡＷＳ C#") == ["aws", "c#"]
+
+
+def test_split_passages_regroups_long_paragraphs():
+    text = "\n".join(f"{i}行目の内容です" for i in range(20))
+
+    passages = split_passages(text, 50)
+
+    assert len(passages) > 1
+    assert all(len(passage) <= 50 for passage in passages)
+
+
+def test_bm25_ranks_matching_passage_first():
+    documents = [tokenize(text) for text in ["python python sql", "sql", "java"]]
+    index = BM25Index(documents)
+
+    results = index.search(tokenize("python"), top_k=3)
+
+    assert [position for position, _ in results] == [0]
+    assert index.search(tokenize("rust"), top_k=3) == []
+
+
+def test_bm25_prefers_shorter_passages_for_same_frequency():
+    index = BM25Index([tokenize("python " + "filler " * 20), tokenize("python")])
+
+    assert index.search(tokenize("python"), top_k=2)[0][0] == 1
+
+
+def _retrieve():
+    return EvidenceRetriever(top_k=2, passage_chars=200, enabled=True).retrieve(RESUME, JOB)
+
+
+def test_retrieve_selects_relevant_passages():
+    evidence = _retrieve()
+
+    hits = {requirement: found for _, requirement, found in evidence.matches}
+    assert 1 in hits["Python等のプログラミング言語の実務経験"]
+    assert 1 in hits["データベースの設計・運用経験"]
+    assert 3 in hits["クラウドサービス（AWS, GCP）の利用経験"]
+    assert 5 in hits["チームで協力してアジャイル開発を進められる方"]
+
+    # 先頭の段落（氏名・職務要約）は常に含め、どの項目とも語を共有しない段落は含めない
+    assert evidence.selected[0] == 0
+    selected = [evidence.passages[index] for index in evidence.selected]
+    assert not any("登山" in passage for passage in selected)
+
+
+def test_render_lists_requirements_with_references():
+    evidence = _retrieve()
+
+    text = evidence.render()
+
+    assert "## 抜粋" in text
+    assert "[4] 株式会社C: AWS上でのインフラ構築" in text
+    assert "- 優遇: クラウドサービス（AWS, GCP）の利用経験 → " in text
+    summary = evidence.to_dict()
+    assert summary["passages"] == 6
+    assert summary["selected_chars"] < summary["original_chars"]
+
+
+def test_should_retrieve_only_long_resumes():
+    retriever = EvidenceRetriever(min_chars=100, enabled=True)
+
+    assert retriever.should_retrieve("あ" * 101)
+    assert not retriever.should_retrieve("あ" * 100)
+    assert not EvidenceRetriever(min_chars=100, enabled=False).should_retrieve("あ" * 101)
@@ -0,0 +1,76 @@
+"""
+ExtractionCache のテスト
+"""
+
+from datetime import datetime, timedelta
+
+from models.database import PDFExtractionCache
+from services.extraction_cache import ExtractionCache
+
+
+def test_hash_file_matches_hash_bytes(tmp_path, pdf_factory):
+    pdf_bytes = pdf_factory(["Hash me please, this is a resume page."])
+    path = tmp_path / "resume.pdf"
+    path.write_bytes(pdf_bytes)
+
+    assert ExtractionCache.hash_file(str(path)) == ExtractionCache.hash_bytes(pdf_bytes)
+
+
+def test_hash_file_handles_empty_file(tmp_path):
+    path = tmp_path / "empty.pdf"
+    path.write_bytes(b"")
+
+    assert ExtractionCache.hash_file(str(path)) == ExtractionCache.hash_bytes(b"")
+
+
+def test_put_then_get(db):
+    cache = ExtractionCache(max_bytes=1024)
+    cache.put("hash-a", "resume text", 2)
+
+    assert cache.get("hash-a") == {"text": "resume text", "page_count": 2}
+    assert cache.get("hash-b") is None
+
+
+def test_parser_version_is_part_of_key(db):
+    cache = ExtractionCache(max_bytes=1024)
+    cache.put("hash-a", "first 10 pages", 10, "2/p10")
+
+    assert cache.get("hash-a", "2/p20") is None
+    assert cache.get("hash-a", "2/p10")["text"] == "first 10 pages"
+
+
+def test_get_counts_hits(db):
+    cache = ExtractionCache(max_bytes=1024)
+    cache.put("hash-a", "resume text", 1)
+    cache.get("hash-a")
+    cache.get("hash-a")
+
+    assert db.query(PDFExtractionCache).one().hit_count == 2
+
+
+def test_evicts_least_recently_used_over_capacity(db):
+    cache = ExtractionCache(max_bytes=25)
+    cache.put("hash-a", "a" * 10, 1)
+    cache.put("hash-b", "b" * 10, 1)
+
+    # hash-a を最近使ったものにする
+    db.query(PDFExtractionCache).filter(PDFExtractionCache.content_hash == "hash-b").update(
+        {PDFExtractionCache.last_accessed_at: datetime.utcnow() - timedelta(hours=1)}
+    )
+    db.commit()
+    cache.get("hash-a")
+
+    cache.put("hash-c", "c" * 10, 1)
+
+    assert cache.get("hash-b") is None
+    assert cache.get("hash-a") is not None
+    assert cache.get("hash-c") is not None
+
+
+def test_put_ignores_existing_entry(db):
+    cache = ExtractionCache(max_bytes=1024)
+    cache.put("hash-a", "original", 1)
+    cache.put("hash-a", "replaced", 1)
+
+    assert cache.get("hash-a")["text"] == "original"
+    assert db.query(PDFExtractionCache).count() == 1
@@ -0,0 +1,87 @@
+"""
+PDFExtractionPool のテスト
+"""
+
+import pytest
+
+from services.extraction_pool import ExtractionQueueFullError, PDFExtractionPool
+
+
+RESUME_PAGES = [
+    "Software engineer with five years of Python and Django experience.",
+    "Built REST APIs with FastAPI and operated services on AWS.",
+]
+
+
+class _MemoryCache:
+    """DBを使わない抽出キャッシュ"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, content_hash, parser_version=None):
+        return self.entries.get((content_hash, parser_version))
+
+    def put(self, content_hash, text, page_count, parser_version=None):
+        self.entries[(content_hash, parser_version)] = {"text": text, "page_count": page_count}
+
+
+@pytest.fixture
+def pool():
+    pool = PDFExtractionPool(max_workers=2, timeout=30, max_queue_size=2, cache=_MemoryCache(), normalize=False)
+    yield pool
+    pool.shutdown()
+
+
+def test_extract_text_runs_in_worker(pool, pdf_factory):
+    text = pool.extract_text(pdf_factory(RESUME_PAGES))
+
+    assert RESUME_PAGES[0] in text
+    assert RESUME_PAGES[1] in text
+
+
+def test_submit_returns_page_count(pool, pdf_factory):
+    result = pool.submit(pdf_factory(RESUME_PAGES)).result()
+
+    assert result["page_count"] == 2
+
+
+def test_submit_rejects_when_queue_is_full(pdf_factory):
+    pool = PDFExtractionPool(max_workers=1, timeout=0.1, max_queue_size=1, cache=_MemoryCache(), normalize=False)
+    try:
+        # 実行中・待機中のジョブで枠が埋まっている状態
+        pool._slots.acquire()
+        with pytest.raises(ExtractionQueueFullError):
+            pool.submit(pdf_factory(RESUME_PAGES))
+    finally:
+        pool._slots.release()
+        pool.shutdown()
+
+
+def test_slot_is_released_after_job(pdf_factory):
+    pool = PDFExtractionPool(max_workers=1, timeout=30, max_queue_size=1, cache=_MemoryCache(), normalize=False)
+    try:
+        pool.submit(pdf_factory(RESUME_PAGES)).result()
+        # 1件目の完了後は次のジョブを受け付ける
+        assert pool.submit(pdf_factory(RESUME_PAGES)).result()["page_count"] == 2
+    finally:
+        pool.shutdown()
+
+
+def test_second_extraction_is_served_from_cache(pool, pdf_factory, monkeypatch):
+    pdf_bytes = pdf_factory(RESUME_PAGES)
+    first = pool.extract_text(pdf_bytes)
+
+    def fail_submit(*args, **kwargs):
+        raise AssertionError("キャッシュ済みのPDFを再抽出しました")
+
+    monkeypatch.setattr(pool, "submit", fail_submit)
+    assert pool.extract_text(pdf_bytes) == first
+
+
+def test_cache_key_includes_budgets(pool, pdf_factory):
+    pdf_bytes = pdf_factory(RESUME_PAGES)
+    pool.extract_text(pdf_bytes, max_pages=1)
+    pool.extract_text(pdf_bytes, max_pages=2)
+
+    assert len(pool.cache.entries) == 2
@@ -0,0 +1,103 @@
+"""
+負荷試験用のGemini互換ローカルサーバーのテスト
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import fake_gemini_server
+from services import model_registry
+from services.gemini_transport import GeminiTransport
+
+
+def _start_server(*argv):
+    args = fake_gemini_server.build_parser().parse_args(
+        ["--port", "0", "--latency-ms", "1", "--latency-sigma", "0", *argv]
+    )
+    server = fake_gemini_server.create_server(args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def server():
+    server, endpoint = _start_server()
+    yield endpoint
+    server.shutdown()
+    server.server_close()
+
+
+def _post(url, body):
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def _prompt(text):
+    return {"contents": [{"parts": [{"text": text}]}]}
+
+
+def test_question_response_follows_requested_count():
+    text = fake_gemini_server.fake_response_text(_prompt("面接質問を5問生成してください"))
+
+    questions = json.loads(text)
+    assert len(questions) == 5
+    assert set(questions[0]) == {"question", "purpose", "category"}
+
+
+def test_response_is_deterministic_per_request():
+    body = _prompt("履歴書を評価してください")
+
+    first = fake_gemini_server.fake_response_text(body)
+
+    assert fake_gemini_server.fake_response_text(body) == first
+    assert "overall_score" in json.loads(first)["evaluation_format"]
+
+
+def test_rest_schema_types_are_understood():
+    schema = {"type": 6, "properties": {"score": {"type": 3}, "ok": {"type": 4}}}
+    body = dict(_prompt("評価"), generationConfig={"responseSchema": schema})
+
+    value = json.loads(fake_gemini_server.fake_response_text(body))
+
+    assert isinstance(value["score"], int)
+    assert isinstance(value["ok"], bool)
+
+
+def test_generate_content_endpoint(server):
+    response = _post(f"{server}/v1beta/models/gemini-test:generateContent", _prompt("面接質問を3問"))
+
+    assert response["candidates"][0]["finishReason"] == "STOP"
+    assert len(json.loads(response["candidates"][0]["content"]["parts"][0]["text"])) == 3
+    assert response["usageMetadata"]["promptTokenCount"] > 0
+
+    with urllib.request.urlopen(f"{server}/stats", timeout=10) as stats:
+        assert json.loads(stats.read())["succeeded"] == 1
+
+
+def test_injected_rate_limit():
+    server, endpoint = _start_server("--rate-limit-rate", "1")
+    try:
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            _post(f"{endpoint}/v1beta/models/gemini-test:generateContent", _prompt("評価"))
+        assert excinfo.value.code == 429
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_transport_against_local_server(server, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_ENDPOINT", server)
+    monkeypatch.setattr(model_registry, "_models", {})
+    monkeypatch.setattr(model_registry, "_configured", None)
+    model = model_registry.get_model("gemini-test")
+
+    response = GeminiTransport(max_retries=0).generate(model, "面接質問を2問生成してください")
+
+    assert len(json.loads(response.text)) == 2
@@ -0,0 +1,339 @@
+"""
+Gemini API呼び出しの共通経路（レート制御・リトライ・サーキットブレーカー）のテスト
+"""
+
+import asyncio
+import contextlib
+import time
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from services.gemini_transport import (
+    AIMDLimiter,
+    CircuitBreaker,
+    GeminiTransport,
+    LLMTransportError,
+    REASON_CIRCUIT_OPEN,
+    REASON_RATE_LIMITED,
+    REASON_TIMEOUT,
+    REASON_UNAVAILABLE,
+    TokenBucket,
+    classify_error,
+)
+from services.llm_scheduler import LANE_INTERACTIVE, LaneScheduler
+
+
+class _Response:
+    text = "ok"
+    usage_metadata = None
+
+
+class _FakeModel:
+    """generate_content(_async) の呼び出しごとに outcomes の先頭を返す（例外なら送出する）"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else _Response()
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def generate_content(self, contents, **kwargs):
+        return self._next()
+
+    async def generate_content_async(self, contents, **kwargs):
+        return self._next()
+
+
+class _HangingModel:
+    """応答が返らないモデル（取り消されるまで待ち続ける）"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.calls += 1
+        await asyncio.Event().wait()
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_ENDPOINT", raising=False)
+    transport = GeminiTransport(requests_per_minute=60000, burst=1000, max_retries=2)
+    transport.retry_base_seconds = 0
+    transport.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    return transport
+
+
+def _open_breaker(transport: GeminiTransport):
+    for _ in range(transport.breaker.failure_threshold):
+        transport.breaker.record_failure()
+    assert transport.breaker.state == CircuitBreaker.OPEN
+
+
+# ========================================
+# CircuitBreaker
+# ========================================
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=60)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.admit() == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.admit() is None
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_admits_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+
+    assert breaker.admit() == CircuitBreaker.HALF_OPEN
+    assert breaker.admit() is None
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.admit() == CircuitBreaker.CLOSED
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=60)
+    breaker.state = CircuitBreaker.HALF_OPEN
+
+    assert breaker.admit() == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.admit() is None
+
+
+def test_breaker_release_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.admit() == CircuitBreaker.HALF_OPEN
+
+    breaker.release_probe()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.admit() == CircuitBreaker.HALF_OPEN
+
+
+# ========================================
+# TokenBucket / AIMDLimiter
+# ========================================
+
+def test_token_bucket_burst_then_waits():
+    bucket = TokenBucket(rate=10, burst=2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    # 3件目以降は予約した順に 1/rate 秒ずつ後ろに並ぶ
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+
+
+def test_aimd_additive_increase():
+    limiter = AIMDLimiter(min_limit=1, max_limit=8)
+    limiter.limit = 4.0
+
+    for _ in range(4):
+        limiter.on_success()
+
+    assert limiter.capacity() == 4
+    assert limiter.limit == pytest.approx(4.9, abs=0.1)
+
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.capacity() == 8
+
+
+def test_aimd_multiplicative_decrease_with_cooldown():
+    limiter = AIMDLimiter(min_limit=1, max_limit=8, cooldown_seconds=60)
+
+    limiter.on_rate_limited()
+    assert limiter.capacity() == 4
+
+    # クールダウン中の連続したレート制限では下げない
+    limiter.on_rate_limited()
+    assert limiter.capacity() == 4
+
+
+def test_aimd_respects_min_limit():
+    limiter = AIMDLimiter(min_limit=2, max_limit=4, cooldown_seconds=0)
+
+    for _ in range(5):
+        limiter.on_rate_limited()
+
+    assert limiter.capacity() == 2
+
+
+def test_classify_error():
+    assert classify_error(api_exceptions.ResourceExhausted("quota")) == REASON_RATE_LIMITED
+    assert classify_error(api_exceptions.ServiceUnavailable("down")) == REASON_UNAVAILABLE
+    assert classify_error(Exception("HTTP 429 Too Many Requests")) == REASON_RATE_LIMITED
+    assert classify_error(Exception("503 The service is currently unavailable")) == REASON_UNAVAILABLE
+    assert classify_error(ValueError("invalid argument")) is None
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__("request failed")
+        self.response = type("Response", (), {"status_code": status_code})()
+
+
+def test_classify_error_uses_status_code():
+    assert classify_error(_HTTPError(429)) == REASON_RATE_LIMITED
+    assert classify_error(_HTTPError(504)) == REASON_TIMEOUT
+    assert classify_error(_HTTPError(400)) is None
+    # 型で分類できない google.api_core の例外は code（HTTPステータス）で判定する
+    assert classify_error(api_exceptions.InvalidArgument("request id 4291500503")) is None
+
+
+def test_classify_error_ignores_numbers_in_message():
+    assert classify_error(ValueError("prompt exceeds 1500 tokens")) is None
+    assert classify_error(Exception("request 429abc failed: 500 characters max")) is None
+    assert classify_error(Exception("invalid argument: HTTP 503 in upstream log")) is None
+
+
+# ========================================
+# GeminiTransport
+# ========================================
+
+def test_generate_retries_classified_errors(transport):
+    model = _FakeModel(api_exceptions.ServiceUnavailable("down"), _Response())
+
+    response = transport.generate(model, "prompt")
+
+    assert response.text == "ok"
+    assert model.calls == 2
+    stats = transport.get_stats()
+    assert stats["retries"] == 1
+    assert stats["succeeded"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_generate_does_not_retry_unclassified_errors(transport):
+    model = _FakeModel(ValueError("invalid argument"))
+
+    with pytest.raises(ValueError):
+        transport.generate(model, "prompt")
+
+    assert model.calls == 1
+    assert transport.get_stats()["in_flight"] == 0
+
+
+def test_generate_async_gives_up_after_max_retries(transport):
+    model = _FakeModel(*[api_exceptions.ServiceUnavailable("down")] * 3)
+    transport.breaker = CircuitBreaker(failure_threshold=10, reset_seconds=60)
+
+    with pytest.raises(LLMTransportError) as excinfo:
+        asyncio.run(transport.generate_async(model, "prompt"))
+
+    assert excinfo.value.reason == REASON_UNAVAILABLE
+    assert model.calls == 3
+    assert transport.get_stats()["failed"] == 1
+
+
+def test_open_circuit_rejects_without_calling(transport):
+    transport.breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    transport.breaker.record_failure()
+    model = _FakeModel()
+
+    with pytest.raises(LLMTransportError) as excinfo:
+        asyncio.run(transport.generate_async(model, "prompt"))
+
+    assert excinfo.value.reason == REASON_CIRCUIT_OPEN
+    assert model.calls == 0
+    assert transport.get_stats()["rejected_by_circuit"] == 1
+
+
+def test_cancelled_half_open_probe_is_released(transport):
+    _open_breaker(transport)
+    time.sleep(transport.breaker.reset_seconds)
+    hanging = _HangingModel()
+
+    async def run():
+        probe = asyncio.create_task(transport.generate_async(hanging, "prompt"))
+        while not hanging.calls:
+            await asyncio.sleep(0.01)
+        assert transport.breaker.state == CircuitBreaker.HALF_OPEN
+
+        probe.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await probe
+
+        # 取り消された試行の代わりに次の呼び出しが復旧確認を行う
+        return await transport.generate_async(_FakeModel(), "prompt")
+
+    response = asyncio.run(run())
+
+    assert response.text == "ok"
+    assert transport.breaker.state == CircuitBreaker.CLOSED
+    assert transport.get_stats()["in_flight"] == 0
+
+
+def test_probe_cancelled_while_waiting_for_lane_is_released(transport):
+    transport.scheduler = LaneScheduler(capacity=lambda: 1)
+    _open_breaker(transport)
+    time.sleep(transport.breaker.reset_seconds)
+
+    async def run():
+        # 枠を埋めておき、復旧確認の試行を枠の待ち行列で取り消す
+        transport.scheduler.acquire(LANE_INTERACTIVE)
+        probe = asyncio.create_task(transport.generate_async(_FakeModel(), "prompt"))
+        await asyncio.sleep(0.02)
+        assert transport.scheduler.get_stats()[LANE_INTERACTIVE]["queue_depth"] == 1
+
+        probe.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await probe
+        transport.scheduler.release(LANE_INTERACTIVE)
+
+        return await transport.generate_async(_FakeModel(), "prompt")
+
+    response = asyncio.run(run())
+
+    assert response.text == "ok"
+    assert transport.breaker.state == CircuitBreaker.CLOSED
+    assert transport.get_stats()["in_flight"] == 0
+
+
+def test_cancelled_stream_probe_is_released(transport):
+    _open_breaker(transport)
+    time.sleep(transport.breaker.reset_seconds)
+    hanging = _HangingModel()
+
+    async def on_text(text):
+        pass
+
+    async def run():
+        probe = asyncio.create_task(transport.generate_stream_async(hanging, "prompt", on_text))
+        while not hanging.calls:
+            await asyncio.sleep(0.01)
+
+        probe.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await probe
+
+        return await transport.generate_async(_FakeModel(), "prompt")
+
+    assert asyncio.run(run()).text == "ok"
+    assert transport.breaker.state == CircuitBreaker.CLOSED
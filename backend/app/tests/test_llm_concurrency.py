@@ -0,0 +1,52 @@
+"""
+llm_concurrency のテスト
+"""
+
+import asyncio
+
+import pytest
+
+from services.llm_concurrency import get_llm_semaphore
+
+
+def test_semaphore_is_shared_within_a_loop(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "2")
+
+    async def run():
+        return get_llm_semaphore(), get_llm_semaphore()
+
+    first, second = asyncio.run(run())
+
+    assert first is second
+
+
+def test_each_loop_gets_its_own_semaphore():
+    async def run():
+        return get_llm_semaphore()
+
+    assert asyncio.run(run()) is not asyncio.run(run())
+
+
+def test_semaphore_bounds_concurrency(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "2")
+    active = []
+    peak = []
+
+    async def call():
+        async with get_llm_semaphore():
+            active.append(1)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.pop()
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(run())
+
+    assert max(peak) == 2
+
+
+def test_requires_running_loop():
+    with pytest.raises(RuntimeError):
+        get_llm_semaphore()
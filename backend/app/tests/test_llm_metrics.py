@@ -0,0 +1,121 @@
+"""
+Gemini呼び出しのメトリクスのテスト
+"""
+
+import asyncio
+
+import pytest
+
+from services.gemini_transport import LLMTransportError, REASON_TIMEOUT
+from services.llm_metrics import (
+    OUTCOME_ERROR,
+    OUTCOME_OK,
+    PARSE_REPAIRED,
+    Counter,
+    Histogram,
+    current_call,
+    get_llm_metrics_summary,
+    llm_call,
+    render_metrics,
+)
+from services.llm_scheduler import LANE_BATCH, llm_lane
+
+
+class _Usage:
+    prompt_token_count = 1200
+    candidates_token_count = 300
+    cached_content_token_count = 0
+
+
+class _Response:
+    usage_metadata = _Usage()
+
+
+def test_counter_render():
+    counter = Counter("test_total", "テスト", ("operation", "outcome"))
+    counter.inc(("evaluation", "ok"))
+    counter.inc(("evaluation", "ok"), 2)
+
+    assert counter.render() == [
+        "# HELP test_total テスト",
+        "# TYPE test_total counter",
+        'test_total{operation="evaluation",outcome="ok"} 3',
+    ]
+    assert counter.snapshot() == {"evaluation/ok": 3}
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "テスト", ("operation",), (0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(("text",), value)
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{operation="text",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{operation="text",le="1"} 3' in lines
+    assert 'test_seconds_bucket{operation="text",le="+Inf"} 4' in lines
+    assert 'test_seconds_sum{operation="text"} 4.25' in lines
+    assert 'test_seconds_count{operation="text"} 4' in lines
+    assert histogram.snapshot() == {"text": {"count": 4, "avg": 1.062}}
+
+
+def test_label_values_are_escaped():
+    counter = Counter("test_escape_total", "テスト", ("operation",))
+    counter.inc(('a"b\nc',))
+
+    assert counter.render()[-1] == 'test_escape_total{operation="a\\"b\\nc"} 1'
+
+
+def test_llm_call_records_outcome_and_tokens():
+    with llm_lane(LANE_BATCH):
+        with llm_call("test_ok") as call:
+            call.attempts = 1
+            call.outcome = OUTCOME_OK
+            call.parse = PARSE_REPAIRED
+            call.record_usage(_Response())
+            assert call.lane == LANE_BATCH
+
+    summary = get_llm_metrics_summary()
+    assert summary["llm_calls_total"]["test_ok/ok"] == 1
+    assert summary["llm_json_parse_total"]["test_ok/repaired"] == 1
+    assert summary["llm_tokens_total"]["test_ok/prompt"] == 1200
+    assert summary["llm_queue_wait_seconds"]["test_ok/batch"]["count"] == 1
+    assert 'llm_calls_total{operation="test_ok",outcome="ok"} 1' in render_metrics()
+
+
+def test_llm_call_records_failure_reason():
+    with pytest.raises(LLMTransportError):
+        with llm_call("test_timeout"):
+            raise LLMTransportError(REASON_TIMEOUT)
+    with pytest.raises(ValueError):
+        with llm_call("test_error"):
+            raise ValueError("invalid")
+
+    calls = get_llm_metrics_summary()["llm_calls_total"]
+    assert calls["test_timeout/timeout"] == 1
+    assert calls[f"test_error/{OUTCOME_ERROR}"] == 1
+
+
+def test_nested_llm_call_is_recorded_once():
+    with llm_call("test_outer") as outer:
+        with llm_call("test_inner") as inner:
+            assert inner is outer
+        outer.outcome = OUTCOME_OK
+
+    calls = get_llm_metrics_summary()["llm_calls_total"]
+    assert calls["test_outer/ok"] == 1
+    assert "test_inner/ok" not in calls
+    assert current_call() is None
+
+
+def test_llm_call_is_inherited_by_tasks():
+    async def inner():
+        return current_call()
+
+    async def run():
+        with llm_call("test_task") as call:
+            call.outcome = OUTCOME_OK
+            assert await asyncio.create_task(inner()) is call
+            assert await asyncio.to_thread(current_call) is call
+
+    asyncio.run(run())
@@ -0,0 +1,151 @@
+"""
+Gemini呼び出しのレーン別スケジューラーのテスト
+"""
+
+import asyncio
+import contextlib
+
+import pytest
+
+from services.llm_scheduler import (
+    LANE_BATCH,
+    LANE_INTERACTIVE,
+    LaneScheduler,
+    current_lane,
+    llm_lane,
+)
+
+
+def _scheduler(capacity: int = 1) -> LaneScheduler:
+    return LaneScheduler(capacity=lambda: capacity, weights={LANE_INTERACTIVE: 4, LANE_BATCH: 1})
+
+
+def test_acquire_and_release_accounting():
+    scheduler = _scheduler(capacity=2)
+
+    scheduler.acquire(LANE_INTERACTIVE)
+    scheduler.acquire(LANE_BATCH)
+    assert scheduler.in_flight == 2
+
+    scheduler.release(LANE_BATCH)
+    stats = scheduler.get_stats()
+    assert scheduler.in_flight == 1
+    assert stats[LANE_INTERACTIVE]["in_flight"] == 1
+    assert stats[LANE_BATCH]["in_flight"] == 0
+    assert stats[LANE_BATCH]["admitted"] == 1
+
+
+def test_unknown_lane_is_rejected():
+    with pytest.raises(ValueError):
+        _scheduler().acquire("unknown")
+
+
+def test_interactive_lane_jumps_batch_backlog():
+    scheduler = _scheduler(capacity=1)
+    order = []
+
+    async def call(lane, name):
+        await scheduler.acquire_async(lane)
+        order.append(name)
+        scheduler.release(lane)
+
+    async def run():
+        scheduler.acquire(LANE_BATCH)
+        tasks = [asyncio.create_task(call(LANE_BATCH, f"batch-{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call(LANE_INTERACTIVE, "interactive")))
+        await asyncio.sleep(0)
+        scheduler.release(LANE_BATCH)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert order[0] == "interactive"
+    assert order[1:] == ["batch-0", "batch-1", "batch-2"]
+
+
+def test_weighted_share_when_both_lanes_wait():
+    scheduler = _scheduler(capacity=5)
+    admitted = []
+
+    async def call(lane):
+        await scheduler.acquire_async(lane)
+        admitted.append(lane)
+
+    async def run():
+        # 枠をすべて埋めてから両方のレーンに待ちを作り、一斉に空ける
+        for _ in range(5):
+            scheduler.acquire(LANE_BATCH)
+        tasks = [asyncio.create_task(call(lane)) for lane in [LANE_BATCH, LANE_INTERACTIVE] * 10]
+        await asyncio.sleep(0)
+        for _ in range(5):
+            scheduler.release(LANE_BATCH)
+        await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(run())
+
+    # 重み 4:1 で5枠を分け合う
+    assert admitted.count(LANE_INTERACTIVE) == 4
+    assert admitted.count(LANE_BATCH) == 1
+
+
+def test_cancelled_waiter_leaves_queue():
+    scheduler = _scheduler(capacity=1)
+
+    async def run():
+        scheduler.acquire(LANE_INTERACTIVE)
+        waiter = asyncio.create_task(scheduler.acquire_async(LANE_BATCH))
+        await asyncio.sleep(0)
+        assert scheduler.get_stats()[LANE_BATCH]["queue_depth"] == 1
+
+        waiter.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await waiter
+        assert scheduler.get_stats()[LANE_BATCH]["queue_depth"] == 0
+
+        scheduler.release(LANE_INTERACTIVE)
+
+    asyncio.run(run())
+
+    assert scheduler.in_flight == 0
+
+
+def test_capacity_follows_limit():
+    limit = {"value": 1}
+    scheduler = LaneScheduler(capacity=lambda: limit["value"])
+
+    async def run():
+        scheduler.acquire(LANE_BATCH)
+        first = asyncio.create_task(scheduler.acquire_async(LANE_BATCH))
+        await asyncio.sleep(0)
+        assert not first.done()
+
+        # 上限が増えると、次に待ち行列へ加わった時点で空いた枠を割り当てる
+        limit["value"] = 2
+        second = asyncio.create_task(scheduler.acquire_async(LANE_BATCH))
+        await asyncio.wait_for(first, timeout=1)
+        assert not second.done()
+
+        second.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await second
+
+    asyncio.run(run())
+
+    assert scheduler.in_flight == 2
+
+
+def test_llm_lane_context():
+    assert current_lane() == LANE_INTERACTIVE
+
+    async def in_task():
+        return current_lane()
+
+    with llm_lane(LANE_BATCH):
+        assert current_lane() == LANE_BATCH
+        assert asyncio.run(in_task()) == LANE_BATCH
+
+    assert current_lane() == LANE_INTERACTIVE
@@ -0,0 +1,45 @@
+"""
+Geminiモデルのレジストリのテスト
+"""
+
+import pytest
+
+from services import model_registry
+
+
+@pytest.fixture(autouse=True)
+def _fresh_registry(monkeypatch):
+    monkeypatch.setattr(model_registry, "_models", {})
+    monkeypatch.setattr(model_registry, "_configured", None)
+    monkeypatch.delenv("GEMINI_API_ENDPOINT", raising=False)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+
+
+def test_model_is_shared_per_name():
+    model = model_registry.get_model("gemini-test", api_key="key")
+
+    assert model_registry.get_model("gemini-test", api_key="key") is model
+    assert model_registry.get_model("gemini-other", api_key="key") is not model
+
+
+def test_changing_api_key_recreates_models():
+    model = model_registry.get_model("gemini-test", api_key="key")
+
+    assert model_registry.get_model("gemini-test", api_key="rotated") is not model
+
+
+def test_resolve_api_key(monkeypatch):
+    assert model_registry.resolve_api_key("explicit") == "explicit"
+    assert model_registry.resolve_api_key() is None
+
+    monkeypatch.setenv("GEMINI_API_KEY", "from-env")
+    assert model_registry.resolve_api_key() == "from-env"
+
+
+def test_local_endpoint_uses_rest_without_key(monkeypatch):
+    assert not model_registry.uses_rest_transport()
+
+    monkeypatch.setenv("GEMINI_API_ENDPOINT", "http://127.0.0.1:8765")
+
+    assert model_registry.uses_rest_transport()
+    assert model_registry.resolve_api_key() == model_registry.LOCAL_API_KEY
@@ -0,0 +1,80 @@
+"""
+PDFParser のテスト
+"""
+
+import pytest
+
+from services.pdf_parser import PDFParser
+
+
+LONG_LINE = "Backend engineer experienced in Python, FastAPI, PostgreSQL and AWS."
+
+
+def test_extracts_every_page(pdf_factory):
+    result = PDFParser.extract_from_bytes(pdf_factory([LONG_LINE, LONG_LINE + " Page two."]))
+
+    assert result["page_count"] == 2
+    assert LONG_LINE + " Page two." in result["text"]
+
+
+def test_only_sparse_pages_escalate_to_pdfplumber(pdf_factory):
+    pages = list(PDFParser.iter_pages(pdf_factory([LONG_LINE, "Hobbies: hiking"])))
+
+    assert [page["strategy"] for page in pages] == [
+        PDFParser.STRATEGY_PYPDF2,
+        PDFParser.STRATEGY_PDFPLUMBER,
+    ]
+    assert pages[1]["text"] == "Hobbies: hiking"
+
+
+def test_rejects_pdf_without_text(pdf_factory):
+    with pytest.raises(Exception, match="テキストを抽出できませんでした"):
+        PDFParser.extract_from_bytes(pdf_factory(["short"]))
+
+
+def _pages(*texts):
+    return ({"page_number": i + 1, "text": text} for i, text in enumerate(texts))
+
+
+def test_limit_pages_stops_at_page_budget():
+    pages = list(PDFParser.limit_pages(_pages("a", "b", "c"), max_pages=2))
+
+    assert [page["text"] for page in pages] == ["a", "b"]
+
+
+def test_limit_pages_truncates_at_char_budget():
+    pages = list(PDFParser.limit_pages(_pages("aaaa", "bbbb", "cccc"), max_chars=6))
+
+    assert [page["text"] for page in pages] == ["aaaa", "bb"]
+    assert pages[-1]["truncated"] is True
+
+
+def test_limit_pages_closes_upstream_generator():
+    closed = []
+
+    def pages():
+        try:
+            for text in ("a", "b", "c"):
+                yield {"text": text}
+        finally:
+            closed.append(True)
+
+    list(PDFParser.limit_pages(pages(), max_pages=1))
+
+    assert closed == [True]
+
+
+def test_page_budget_marks_result_truncated(pdf_factory):
+    result = PDFParser.extract_from_bytes(pdf_factory([LONG_LINE, LONG_LINE, LONG_LINE]), max_pages=1)
+
+    assert result["page_count"] == 3
+    assert result["page_strategies"] == [PDFParser.STRATEGY_PYPDF2]
+    assert result["truncated"] is True
+
+
+def test_extract_from_file_matches_bytes(tmp_path, pdf_factory):
+    pdf_bytes = pdf_factory([LONG_LINE])
+    path = tmp_path / "resume.pdf"
+    path.write_bytes(pdf_bytes)
+
+    assert PDFParser.extract_from_file(str(path))["text"] == PDFParser.extract_from_bytes(pdf_bytes)["text"]
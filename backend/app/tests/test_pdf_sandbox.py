@@ -0,0 +1,81 @@
+"""
+pdf_sandbox のテスト
+"""
+
+import multiprocessing
+import signal
+import time
+
+import pytest
+
+from services import pdf_sandbox
+from services.pdf_parser import PDFParser
+from services.pdf_sandbox import ExtractionError, SandboxLimits, get_sandbox_stats, run_sandboxed
+
+
+RESUME_PAGES = ["Data engineer with Spark, Airflow and BigQuery experience in retail analytics."]
+
+
+def test_returns_result_from_child_process(pdf_factory):
+    result = run_sandboxed(pdf_factory(RESUME_PAGES), limits=SandboxLimits(wall_seconds=30))
+
+    assert result["text"] == RESUME_PAGES[0]
+    assert result["page_count"] == 1
+
+
+def test_parse_error_is_reported():
+    with pytest.raises(ExtractionError) as excinfo:
+        run_sandboxed(b"not a pdf", limits=SandboxLimits(wall_seconds=30))
+
+    assert excinfo.value.reason == pdf_sandbox.REASON_PARSE_ERROR
+    assert excinfo.value.to_dict()["error"] == "pdf_extraction_failed"
+
+
+def test_uses_forkserver_or_spawn():
+    assert pdf_sandbox._get_context().get_start_method() in ("forkserver", "spawn")
+
+
+@pytest.fixture
+def fork_context(monkeypatch):
+    """差し替えた関数を子プロセスに引き継ぐため、テストでは fork で起動する"""
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("fork が必要")
+    monkeypatch.setattr(pdf_sandbox, "_get_context", lambda: multiprocessing.get_context("fork"))
+
+
+def test_hung_extraction_is_killed_after_wall_time(monkeypatch, pdf_factory, fork_context):
+    def hang(*args, **kwargs):
+        time.sleep(30)
+
+    monkeypatch.setattr(PDFParser, "extract_from_source", staticmethod(hang))
+    before = get_sandbox_stats()["killed_by_reason"][pdf_sandbox.REASON_TIMEOUT]
+
+    started = time.monotonic()
+    with pytest.raises(ExtractionError) as excinfo:
+        run_sandboxed(pdf_factory(RESUME_PAGES), limits=SandboxLimits(wall_seconds=0.5))
+
+    assert excinfo.value.reason == pdf_sandbox.REASON_TIMEOUT
+    assert time.monotonic() - started < 10
+    assert get_sandbox_stats()["killed_by_reason"][pdf_sandbox.REASON_TIMEOUT] == before + 1
+
+
+def test_memory_limit_is_enforced(monkeypatch, pdf_factory, fork_context):
+    def allocate(*args, **kwargs):
+        return bytearray(256 * 1024 * 1024)
+
+    monkeypatch.setattr(PDFParser, "extract_from_source", staticmethod(allocate))
+
+    with pytest.raises(ExtractionError) as excinfo:
+        run_sandboxed(
+            pdf_factory(RESUME_PAGES),
+            limits=SandboxLimits(memory_bytes=64 * 1024 * 1024, wall_seconds=30)
+        )
+
+    assert excinfo.value.reason == pdf_sandbox.REASON_MEMORY_LIMIT
+
+
+def test_reason_from_exitcode():
+    assert pdf_sandbox._reason_from_exitcode(-signal.SIGXCPU) == pdf_sandbox.REASON_CPU_LIMIT
+    assert pdf_sandbox._reason_from_exitcode(-signal.SIGKILL) == pdf_sandbox.REASON_KILLED
+    assert pdf_sandbox._reason_from_exitcode(1) == pdf_sandbox.REASON_CRASHED
+    assert pdf_sandbox.REASON_KILLED in get_sandbox_stats()["killed_by_reason"]
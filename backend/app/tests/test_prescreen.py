@@ -0,0 +1,125 @@
+"""
+キーワード事前判定のテスト
+"""
+
+import pytest
+
+from services.prescreen import (
+    KeywordMatcher,
+    PrescreenRegistry,
+    Prescreener,
+    normalize,
+    requirement_keywords,
+    skills_from_job_posting,
+)
+from services.section_fanout import REJECTED
+
+
+REQUIRED = [
+    "Python, Java等のプログラミング言語の実務経験",
+    "データベース（SQL/NoSQL）の設計・運用経験",
+]
+PREFERRED = [
+    "クラウドサービス（AWS, GCP）の利用経験",
+    "明るく前向きな方",
+]
+
+
+def test_matcher_finds_overlapping_keywords():
+    matcher = KeywordMatcher(["データ", "データベース", "ベース", "スキーマ"])
+
+    assert matcher.find("データベース設計") == {"データ", "データベース", "ベース"}
+
+
+def test_matcher_respects_word_boundaries():
+    matcher = KeywordMatcher(["java", "go", "c#"])
+
+    assert matcher.find("javascriptとgoogleを使用") == set()
+    assert matcher.find("java/go、c#での開発") == {"java", "go", "c#"}
+
+
+def test_matcher_japanese_keywords_match_inside_text():
+    matcher = KeywordMatcher(["アジャイル", "スクラム"])
+
+    assert matcher.find("大規模アジャイル開発でスクラムマスターを担当") == {"アジャイル", "スクラム"}
+
+
+def test_normalize_full_width():
+    assert normalize("ＰＹＴＨＯＮ３") == "python3"
+
+
+def test_requirement_keywords_include_synonyms():
+    keywords = requirement_keywords("Python, Java等の実務経験")
+
+    assert {"python", "django", "java", "spring"} <= keywords
+    assert requirement_keywords("明るく前向きな方") == set()
+
+
+def test_prescreener_scores_weighted_matches():
+    prescreener = Prescreener(REQUIRED, PREFERRED)
+
+    # 人物像の項目はキーワードがないため判定に含めない
+    assert len(prescreener.groups) == 3
+
+    result = prescreener.screen("Djangoで社内システムを開発。PostgreSQLのチューニングを担当。")
+
+    assert result.required_score == 1.0
+    assert result.score == pytest.approx(2.0 / 2.5)
+    assert result.matched[REQUIRED[0]] == ["django"]
+    assert result.missing == [PREFERRED[0]]
+
+
+def test_prescreener_no_overlap():
+    result = Prescreener(REQUIRED, PREFERRED).screen("営業職として10年の経験があります")
+
+    assert result.score == 0.0
+    assert result.matched == {}
+    assert len(result.missing) == 3
+
+
+def test_prescreener_without_keywords_passes():
+    prescreener = Prescreener(["明るく前向きな方"])
+
+    assert not prescreener.enabled
+    assert prescreener.screen("何でも").score == 1.0
+
+
+def test_skills_from_job_posting_accepts_various_shapes():
+    class _Posting:
+        requirements = {"skills": ["Python", "SQL"], "other": "Git\nDocker"}
+        preferred_skills = None
+
+    assert skills_from_job_posting(_Posting()) == {
+        "required": ["Python", "SQL", "Git", "Docker"],
+        "preferred": [],
+    }
+
+
+def test_registry_reuses_compiled_matcher():
+    registry = PrescreenRegistry(max_entries=1)
+    skills = {"required": REQUIRED, "preferred": PREFERRED}
+
+    first = registry.get(skills)
+
+    assert registry.get(dict(skills)) is first
+    registry.get({"required": ["Go"], "preferred": []})
+    assert registry.get(skills) is not first
+
+
+def test_skipped_evaluation_is_rejected_with_reason(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test")
+    monkeypatch.delenv("PRESCREEN_ENABLED", raising=False)
+    monkeypatch.setenv("PRESCREEN_MIN_SCORE", "0.1")
+    from services.evaluator import DocumentEvaluator
+
+    evaluator = DocumentEvaluator()
+    evaluation = evaluator._prescreen("営業職として10年の経験があります", None)
+
+    eval_data = evaluation["evaluation_format"]
+    assert eval_data["recommendation"] == REJECTED
+    assert eval_data["prescreen"]["skipped"] is True
+    assert "10%" in eval_data["prescreen"]["reason"]
+    assert eval_data["next_steps"]["proceed_to_interview"] is False
+
+    # 基準を満たす書類はGeminiで評価する
+    assert evaluator._prescreen("Python・SQL・AWSでのWeb API開発経験", None) is None
@@ -0,0 +1,83 @@
+"""
+評価プロンプトの固定部分のテスト
+"""
+
+from services.prompt_prefix import PromptPrefixRegistry, format_token_report
+
+
+JOB = {"title": "バックエンドエンジニア", "required_skills": ["Python", "SQL"]}
+TEMPLATE = {"overall_score": 0, "recommendation": ""}
+
+
+def _registry(**kwargs) -> PromptPrefixRegistry:
+    return PromptPrefixRegistry(context_cache=False, **kwargs)
+
+
+def test_prefix_is_compiled_once_per_job(monkeypatch):
+    monkeypatch.delenv("GEMINI_STRUCTURED_OUTPUT", raising=False)
+    registry = _registry()
+
+    prefix = registry.get(JOB, TEMPLATE)
+
+    assert registry.get(dict(JOB), dict(TEMPLATE)) is prefix
+    assert registry.get({**JOB, "title": "SRE"}, TEMPLATE) is not prefix
+
+
+def test_prefix_uses_compact_json(monkeypatch):
+    monkeypatch.setenv("GEMINI_STRUCTURED_OUTPUT", "false")
+
+    prefix = _registry().get(JOB, TEMPLATE)
+
+    assert '"required_skills":["Python","SQL"]' in prefix.sections["job_requirements"]
+    assert '{"overall_score":0,"recommendation":""}' in prefix.sections["evaluation_format"]
+
+
+def test_template_omitted_with_structured_output(monkeypatch):
+    monkeypatch.setenv("GEMINI_STRUCTURED_OUTPUT", "true")
+
+    prefix = _registry().get(JOB, TEMPLATE)
+
+    assert "overall_score" not in prefix.sections["evaluation_format"]
+
+
+def test_render_appends_resume(monkeypatch):
+    monkeypatch.delenv("GEMINI_STRUCTURED_OUTPUT", raising=False)
+    prefix = _registry().get(JOB, TEMPLATE)
+
+    prompt = prefix.render("Pythonでの開発経験5年")
+
+    assert prompt.startswith(prefix.text)
+    assert prompt.endswith("# 履歴書・職務経歴書\nPythonでの開発経験5年")
+
+
+def test_token_report_covers_every_section(monkeypatch):
+    monkeypatch.delenv("GEMINI_STRUCTURED_OUTPUT", raising=False)
+    prefix = _registry().get(JOB, TEMPLATE)
+
+    report = prefix.token_report("Pythonでの開発経験5年")
+
+    assert set(report["sections"]) == {
+        "instructions", "job_requirements", "evaluation_format", "guidelines", "resume"
+    }
+    assert report["estimated_total"] == sum(report["sections"].values())
+    assert report["usage"] is None
+    assert "履歴書=" in format_token_report(report)
+
+
+def test_lru_limit(monkeypatch):
+    monkeypatch.delenv("GEMINI_STRUCTURED_OUTPUT", raising=False)
+    registry = _registry(max_entries=2)
+
+    first = registry.get({"title": "A"}, TEMPLATE)
+    registry.get({"title": "B"}, TEMPLATE)
+    registry.get({"title": "A"}, TEMPLATE)
+    registry.get({"title": "C"}, TEMPLATE)
+
+    assert registry.get({"title": "A"}, TEMPLATE) is first
+    assert len(registry._prefixes) == 2
+
+
+def test_short_prefix_skips_context_cache():
+    registry = PromptPrefixRegistry(context_cache=True, context_cache_min_tokens=100000)
+
+    assert registry.get_cached_model(registry.get(JOB, TEMPLATE), "gemini-2.0-flash-exp") is None
@@ -0,0 +1,136 @@
+"""
+面接質問の生成（ストリーミング通知・フォールバック）のテスト
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from services.question_generator import AsyncQuestionGenerator, QuestionGenerationError
+from services.response_cache import ResponseCache
+
+
+QUESTIONS = [
+    {"question": f"質問{i}", "purpose": f"目的{i}", "category": "経験"}
+    for i in range(1, 4)
+]
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeTransport:
+    """応答テキストを chunk_size 文字ずつ on_text に渡すトランスポート"""
+
+    def __init__(self, text, chunk_size=7, error=None):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.error = error
+        self.chunks_sent = 0
+
+    async def generate_async(self, model, prompt, **kwargs):
+        if self.error:
+            raise self.error
+        return _Response(self.text)
+
+    async def generate_stream_async(self, model, prompt, on_text, **kwargs):
+        for start in range(0, len(self.text), self.chunk_size):
+            self.chunks_sent += 1
+            await on_text(self.text[start:start + self.chunk_size])
+        if self.error:
+            raise self.error
+        return _Response(self.text)
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_ENDPOINT", raising=False)
+    generator = AsyncQuestionGenerator(api_key="test")
+    generator.response_cache = ResponseCache(enabled=False)
+    return generator
+
+
+def _generate(generator, transport, on_question=None, num_questions=3):
+    generator.transport = transport
+    return asyncio.run(generator.generate_questions_async(
+        "山田 太郎", "一次面接", "バックエンドエンジニア",
+        num_questions=num_questions, on_question=on_question
+    ))
+
+
+def test_questions_are_emitted_while_streaming(generator):
+    text = json.dumps(QUESTIONS, ensure_ascii=False)
+    transport = _FakeTransport(text)
+    received = []
+
+    async def on_question(question):
+        received.append((question, transport.chunks_sent))
+
+    questions = _generate(generator, transport, on_question)
+
+    assert questions == QUESTIONS
+    assert [question for question, _ in received] == QUESTIONS
+    # 最初の質問は応答全体が届く前に通知される
+    assert received[0][1] < transport.chunks_sent
+
+
+def test_truncated_stream_drops_incomplete_question(generator):
+    text = json.dumps(QUESTIONS, ensure_ascii=False)
+    truncated = text[:text.index("質問3") + 3]
+    received = []
+
+    async def on_question(question):
+        received.append(question)
+
+    questions = _generate(generator, _FakeTransport(truncated), on_question)
+
+    assert questions == QUESTIONS[:2]
+    assert received == QUESTIONS[:2]
+
+
+def test_failure_after_emitting_keeps_received_questions(generator):
+    text = json.dumps(QUESTIONS, ensure_ascii=False)
+    partial = text[:text.index("質問2")]
+    received = []
+
+    async def on_question(question):
+        received.append(question)
+
+    transport = _FakeTransport(partial, error=ValueError("stream closed"))
+    questions = _generate(generator, transport, on_question)
+
+    assert questions == QUESTIONS[:1]
+    assert received == QUESTIONS[:1]
+
+
+def test_failure_before_any_question_uses_fallback(generator):
+    received = []
+
+    async def on_question(question):
+        received.append(question)
+
+    transport = _FakeTransport("", error=ValueError("invalid argument"))
+    questions = _generate(generator, transport, on_question, num_questions=4)
+
+    assert len(questions) == 4
+    assert received == questions
+    assert questions[0]["question"] == "これまでの職務経験について教えてください。"
+
+
+def test_unparseable_response_uses_fallback(generator):
+    questions = _generate(generator, _FakeTransport("申し訳ありません"), num_questions=2)
+
+    assert len(questions) == 2
+    assert questions[0]["category"] == "経験"
+
+
+def test_failure_raises_without_fallback(generator):
+    generator.transport = _FakeTransport("申し訳ありません")
+
+    with pytest.raises(QuestionGenerationError):
+        asyncio.run(generator.generate_questions_async(
+            "山田 太郎", "一次面接", "バックエンドエンジニア", num_questions=2, use_fallback=False
+        ))
@@ -0,0 +1,105 @@
+"""
+質問生成APIのテスト（ルーターの関数を直接呼び出す）
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from models.database import AIQuestion, Candidate, JobPosting, SelectionStage
+from routers import questions
+
+
+QUESTIONS = [
+    {"question": "直近のプロジェクトで担当した設計を教えてください", "purpose": "設計力の確認", "category": "技術"},
+    {"question": "チームでの役割を教えてください", "purpose": "協調性の確認", "category": "人物"},
+]
+
+
+class _FakeGenerator:
+    """Geminiを呼ばずに固定の質問を返す質問生成サービス"""
+
+    def __init__(self):
+        self.kwargs = None
+
+    async def generate_questions_async(self, on_question=None, **kwargs):
+        self.kwargs = kwargs
+        for question in QUESTIONS:
+            if on_question is not None:
+                await on_question(question)
+        return list(QUESTIONS)
+
+
+@pytest.fixture
+def candidate_stage(db):
+    job_posting = JobPosting(title="バックエンドエンジニア")
+    db.add(job_posting)
+    db.flush()
+    stage = SelectionStage(job_posting_id=job_posting.id, stage_order=2, stage_name="一次面接", stage_type="FIRST_INTERVIEW")
+    candidate = Candidate(name="山田 太郎", job_posting_id=job_posting.id, resume_text="Python開発 5年")
+    db.add_all([stage, candidate])
+    db.commit()
+    return candidate.id, stage.id
+
+
+def _request(candidate_id, stage_id):
+    return questions.QuestionGenerateRequest(candidate_id=candidate_id, stage_id=stage_id, num_questions=2)
+
+
+def test_generate_saves_questions(db, candidate_stage):
+    candidate_id, stage_id = candidate_stage
+    generator = _FakeGenerator()
+
+    saved = asyncio.run(questions.generate_questions(_request(candidate_id, stage_id), generator))
+
+    assert [item["question_text"] for item in saved] == [q["question"] for q in QUESTIONS]
+    assert all(item["id"] for item in saved)
+    assert generator.kwargs["candidate_resume"] == "Python開発 5年"
+    assert generator.kwargs["stage_name"] == "一次面接"
+    assert db.query(AIQuestion).count() == 2
+
+
+def test_generate_runs_db_work_off_the_event_loop(db, candidate_stage, monkeypatch):
+    candidate_id, stage_id = candidate_stage
+    threads = []
+    original = questions._generation_kwargs
+
+    def record_thread(request, session):
+        threads.append(threading.get_ident())
+        return original(request, session)
+
+    monkeypatch.setattr(questions, "_generation_kwargs", record_thread)
+
+    loop_threads = []
+
+    async def run():
+        loop_threads.append(threading.get_ident())
+        await questions.generate_questions(_request(candidate_id, stage_id), _FakeGenerator())
+
+    asyncio.run(run())
+
+    assert threads and loop_threads[0] not in threads
+
+
+def test_generate_returns_404_for_unknown_candidate(db, candidate_stage):
+    _, stage_id = candidate_stage
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(questions.generate_questions(_request(999, stage_id), _FakeGenerator()))
+
+    assert excinfo.value.status_code == 404
+
+
+def test_stream_saves_each_question(db, candidate_stage):
+    candidate_id, stage_id = candidate_stage
+
+    async def run():
+        response = await questions.generate_questions_stream(_request(candidate_id, stage_id), _FakeGenerator())
+        return [chunk async for chunk in response.body_iterator]
+
+    events = asyncio.run(run())
+
+    assert [event.split("\n")[0] for event in events] == ["event: question", "event: question", "event: done"]
+    assert db.query(AIQuestion).count() == 2
@@ -0,0 +1,111 @@
+"""
+ResponseCache のテスト
+"""
+
+from datetime import datetime, timedelta
+
+from models.database import LLMResponseCache
+from services.response_cache import KIND_EVALUATION, KIND_QUESTIONS, ResponseCache
+
+
+def _age(db, cache_key, **delta):
+    """エントリの最終アクセス日時を過去にずらす"""
+    db.query(LLMResponseCache).filter(LLMResponseCache.cache_key == cache_key).update(
+        {LLMResponseCache.last_accessed_at: datetime.utcnow() - timedelta(**delta)}
+    )
+    db.commit()
+
+
+def test_make_key_depends_on_model_prompt_and_config():
+    key = ResponseCache.make_key("gemini-2.5-flash", "prompt", {"temperature": 0.3})
+
+    assert key == ResponseCache.make_key("gemini-2.5-flash", "prompt", {"temperature": 0.3})
+    assert key != ResponseCache.make_key("gemini-2.5-pro", "prompt", {"temperature": 0.3})
+    assert key != ResponseCache.make_key("gemini-2.5-flash", "prompt!", {"temperature": 0.3})
+    assert key != ResponseCache.make_key("gemini-2.5-flash", "prompt", {"temperature": 0.8})
+
+
+def test_put_then_get_counts_hits_and_misses(db):
+    cache = ResponseCache(enabled=True)
+    cache.put("key-a", '{"score": 8}', KIND_EVALUATION)
+
+    assert cache.get("key-a") == '{"score": 8}'
+    assert cache.get("key-b") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_expired_entry_is_a_miss_and_removed(db):
+    cache = ResponseCache(ttl_seconds=60, enabled=True)
+    cache.put("key-a", "response", KIND_EVALUATION)
+    db.query(LLMResponseCache).update(
+        {LLMResponseCache.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    assert cache.get("key-a") is None
+    assert db.query(LLMResponseCache).count() == 0
+
+
+def test_put_purges_expired_entries(db):
+    cache = ResponseCache(ttl_seconds=60, enabled=True)
+    cache.put("key-a", "old", KIND_EVALUATION)
+    db.query(LLMResponseCache).update(
+        {LLMResponseCache.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+
+    cache.put("key-b", "new", KIND_EVALUATION)
+
+    assert [row.cache_key for row in db.query(LLMResponseCache).all()] == ["key-b"]
+
+
+def test_evicts_least_recently_used_over_capacity(db):
+    cache = ResponseCache(max_bytes=25, enabled=True)
+    cache.put("key-a", "a" * 10, KIND_EVALUATION)
+    cache.put("key-b", "b" * 10, KIND_EVALUATION)
+    _age(db, "key-a", hours=2)
+    _age(db, "key-b", hours=1)
+    cache.get("key-a")
+
+    cache.put("key-c", "c" * 10, KIND_EVALUATION)
+
+    keys = {row.cache_key for row in db.query(LLMResponseCache).all()}
+    assert keys == {"key-a", "key-c"}
+
+
+def test_put_overwrites_existing_entry(db):
+    cache = ResponseCache(enabled=True)
+    cache.put("key-a", "first", KIND_QUESTIONS)
+    cache.put("key-a", "second", KIND_QUESTIONS)
+
+    assert cache.get("key-a") == "second"
+    assert db.query(LLMResponseCache).count() == 1
+
+
+def test_invalidate_job_posting(db):
+    cache = ResponseCache(enabled=True)
+    cache.put("key-a", "a", KIND_EVALUATION, job_posting_id=1)
+    cache.put("key-b", "b", KIND_QUESTIONS, job_posting_id=1)
+    cache.put("key-c", "c", KIND_EVALUATION, job_posting_id=2)
+
+    assert cache.invalidate_job_posting(1) == 2
+    assert cache.get("key-c") == "c"
+    assert cache.get_stats()["invalidated"] == 2
+
+
+def test_overwrite_updates_job_posting(db):
+    cache = ResponseCache(enabled=True)
+    cache.put("key-a", "first", KIND_QUESTIONS)
+    cache.put("key-a", "second", KIND_EVALUATION, job_posting_id=3)
+
+    assert cache.invalidate_job_posting(3) == 1
+    assert cache.get("key-a") is None
+
+
+def test_disabled_cache_is_a_no_op(db):
+    cache = ResponseCache(enabled=False)
+    cache.put("key-a", "response", KIND_EVALUATION)
+
+    assert cache.get("key-a") is None
+    assert db.query(LLMResponseCache).count() == 0
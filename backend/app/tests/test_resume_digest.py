@@ -0,0 +1,181 @@
+"""
+長い履歴書のパートごとの要約のテスト
+"""
+
+import asyncio
+import json
+import re
+import threading
+
+import pytest
+
+from services.resume_digest import ResumeDigester, split_sections
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeTransport:
+    """プロンプトのパート番号を要約に含めて返すトランスポート"""
+
+    def __init__(self, text=None):
+        self.text = text
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _respond(self, prompt):
+        with self._lock:
+            self.calls += 1
+        if self.text is not None:
+            return _Response(self.text)
+        index = re.search(r"【職務経歴書（(\d+)/\d+）】", prompt).group(1)
+        return _Response(json.dumps(
+            {"summary": f"パート{index}の要約", "skills": ["Python"], "highlights": ["成果"]},
+            ensure_ascii=False
+        ))
+
+    def generate(self, model, prompt, **kwargs):
+        return self._respond(prompt)
+
+    async def generate_async(self, model, prompt, **kwargs):
+        return self._respond(prompt)
+
+
+class _MemoryCache:
+    def __init__(self):
+        self.entries = {}
+
+    def make_key(self, model_name, prompt, config):
+        return prompt
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, text, kind, job_posting_id=None):
+        self.entries[key] = text
+
+
+RESUME = "\n\n".join(
+    f"【職務経歴{i}】\n" + f"株式会社{i}でバックエンド開発を担当しました。" * 8 for i in range(1, 6)
+)
+
+
+@pytest.fixture
+def digester(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_ENDPOINT", raising=False)
+    digester = ResumeDigester(api_key="test", chunk_chars=300, min_chars=500, enabled=True)
+    digester.transport = _FakeTransport()
+    digester.response_cache = _MemoryCache()
+    return digester
+
+
+def test_split_sections_respects_limit():
+    chunks = split_sections(RESUME, 300)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == RESUME.replace("\n", "")
+
+
+def test_split_sections_breaks_before_heading():
+    text = "概要" * 60 + "\n\n【職務経歴】\n" + "開発" * 10
+
+    chunks = split_sections(text, 200)
+
+    assert chunks[1].startswith("【職務経歴】")
+
+
+def test_split_sections_splits_long_lines():
+    chunks = split_sections("a" * 250, 100)
+
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+
+
+def test_should_digest(digester):
+    assert digester.should_digest(RESUME)
+    assert not digester.should_digest("短い履歴書")
+    assert not digester.should_digest(RESUME, min_chars=len(RESUME))
+
+
+def test_digest_keeps_part_order(digester):
+    digest = digester.digest(RESUME)
+
+    total = len(split_sections(RESUME, 300))
+    positions = [digest.index(f"パート{index}の要約") for index in range(1, total + 1)]
+    assert positions == sorted(positions)
+    assert f"■ パート{total}/{total}" in digest
+    assert "スキル: Python" in digest
+    assert digester.transport.calls == total
+
+
+def test_digest_is_reused(digester):
+    first = digester.digest(RESUME)
+    calls = digester.transport.calls
+
+    assert asyncio.run(digester.digest_async(RESUME)) == first
+    assert digester.transport.calls == calls
+
+
+def test_part_summaries_come_from_response_cache(digester):
+    digester.digest(RESUME)
+    calls = digester.transport.calls
+    # プロセス内の要約文を消しても、パートの要約は応答キャッシュから取得する
+    digester._digests.clear()
+
+    asyncio.run(digester.digest_async(RESUME))
+
+    assert digester.transport.calls == calls
+
+
+def test_unparseable_summary_falls_back_to_text(digester):
+    digester.transport = _FakeTransport("要約できませんでした")
+
+    digest = digester.digest(RESUME)
+
+    assert "株式会社1でバックエンド開発" in digest
+    # 解析できなかった応答はキャッシュしない
+    assert digester.response_cache.entries == {}
+
+
+class _JSONTransport:
+    def __init__(self, value):
+        self.value = value
+
+    def generate(self, model, prompt, **kwargs):
+        return _Response(json.dumps(self.value, ensure_ascii=False))
+
+
+def test_evaluation_summaries_are_reused_by_question_generation(digester, monkeypatch):
+    from services.evidence_retrieval import EvidenceRetriever
+    from services.gemini_service import GeminiService
+    from services.question_generator import QuestionGenerator
+    from services.response_cache import ResponseCache
+
+    monkeypatch.setenv("EVALUATION_FANOUT", "false")
+    service = GeminiService(api_key="test")
+    service.digester = digester
+    # 抜粋の対象になる長さでも、要約は履歴書の全文から作る
+    service.evidence_retriever = EvidenceRetriever(min_chars=300, enabled=True)
+    service.transport = _JSONTransport({"evaluation_format": {"overall_score": 7}})
+    service.response_cache = ResponseCache(enabled=False)
+    service.analyze_resume(
+        RESUME, {"required_skills": ["バックエンド開発"]}, {"evaluation_format": {"overall_score": 0}}
+    )
+    summary_calls = digester.transport.calls
+    assert summary_calls == len(split_sections(RESUME, 300))
+
+    # 別プロセスの質問生成（プロセス内の要約文はなく、応答キャッシュだけを共有する）
+    question_digester = ResumeDigester(api_key="test", chunk_chars=300, min_chars=500, enabled=True)
+    question_digester.transport = _FakeTransport()
+    question_digester.response_cache = digester.response_cache
+    generator = QuestionGenerator(api_key="test")
+    generator.digester = question_digester
+    generator.resume_max_chars = 300
+    generator.response_cache = ResponseCache(enabled=False)
+    generator.transport = _JSONTransport([{"question": "質問", "purpose": "目的", "category": "経験"}])
+    generator.generate_questions("山田 太郎", "一次面接", "バックエンドエンジニア", candidate_resume=RESUME)
+
+    assert question_digester.transport.calls == 0
+    assert digester.transport.calls == summary_calls
@@ -0,0 +1,150 @@
+"""
+セクションごとの評価の組み立て（総合スコア・推薦度・次のステップ）のテスト
+"""
+
+import json
+import time
+
+import pytest
+
+from models.database import EvaluationCriteria, JobPosting
+from services.gemini_service import GeminiService
+from services.section_fanout import (
+    CLARIFY_KEY,
+    REJECTED,
+    load_criteria,
+    merge_sections,
+    parse_section,
+    recommendation_for,
+    section_weights,
+)
+
+
+TEMPLATE = {
+    "evaluation_format": {
+        "overall_score": 0,
+        "recommendation": "",
+        "sections": {
+            "technical_skills": {"score": 0, "max_score": 10, "summary": "", "details": {"technical_concerns": []}},
+            "experience_quality": {"score": 0, "max_score": 10, "summary": ""},
+        },
+        "next_steps": {"proceed_to_interview": False, "interview_focus_areas": []},
+    }
+}
+JOB = {
+    "evaluation_criteria": {
+        "technical_skills": {"weight": 0.6},
+        "experience_quality": {"weight": 0.2},
+    }
+}
+
+
+def test_weights_from_criteria_by_display_name():
+    weights = section_weights(TEMPLATE, JOB, [("技術スキル", 3), ("experience_quality", 1)])
+
+    assert weights == {"technical_skills": 0.75, "experience_quality": 0.25}
+
+
+def test_weights_fall_back_to_job_requirements_then_equal():
+    assert section_weights(TEMPLATE, JOB, []) == {"technical_skills": 0.75, "experience_quality": 0.25}
+    assert section_weights(TEMPLATE, {}, [("unknown", 1)]) == {
+        "technical_skills": 0.5, "experience_quality": 0.5
+    }
+
+
+def test_load_criteria(db):
+    posting = JobPosting(title="バックエンドエンジニア")
+    db.add(posting)
+    db.flush()
+    db.add(EvaluationCriteria(job_posting_id=posting.id, category="技術スキル", weight=2.0))
+    db.commit()
+
+    assert load_criteria(posting.id) == [("技術スキル", 2.0)]
+    assert load_criteria(None) == []
+
+
+@pytest.mark.parametrize("score, expected", [
+    (8.0, "強く推薦"),
+    (6.5, "推薦"),
+    (5.0, "条件付き推薦"),
+    (4.9, REJECTED),
+])
+def test_recommendation_for(score, expected):
+    assert recommendation_for(score) == expected
+
+
+def test_parse_section_extracts_clarifications():
+    text = json.dumps({"score": 7, "summary": "良い", CLARIFY_KEY: ["Djangoの経験年数"]}, ensure_ascii=False)
+
+    section, clarifications, repaired = parse_section(text, TEMPLATE["evaluation_format"]["sections"]["technical_skills"])
+
+    assert section == {"score": 7, "summary": "良い"}
+    assert clarifications == ["Djangoの経験年数"]
+    assert repaired is False
+
+
+def test_parse_section_repairs_truncated_response():
+    template = TEMPLATE["evaluation_format"]["sections"]["experience_quality"]
+
+    section, clarifications, repaired = parse_section('{"score": 6, "summary": "途中', template)
+
+    assert repaired is True
+    assert section["score"] == 6
+    assert section["max_score"] == 10
+    assert clarifications == []
+
+
+def test_merge_sections_weighted_score_and_next_steps():
+    sections = {
+        "technical_skills": {
+            "score": 9, "max_score": 10, "summary": "",
+            "details": {"technical_concerns": ["クラウド経験が浅い"]},
+        },
+        "experience_quality": {"score": 3, "max_score": 5, "summary": ""},
+    }
+
+    result = merge_sections(
+        TEMPLATE, sections, ["チーム規模", "チーム規模", "役割"],
+        {"technical_skills": 0.75, "experience_quality": 0.25}
+    )
+
+    eval_data = result["evaluation_format"]
+    assert eval_data["overall_score"] == 8.2
+    assert eval_data["recommendation"] == "強く推薦"
+    assert eval_data["next_steps"] == {
+        "proceed_to_interview": True,
+        "interview_focus_areas": ["経験の質（6/10）", "クラウド経験が浅い"],
+        "questions_to_clarify": ["チーム規模", "役割"],
+    }
+
+
+def test_merge_sections_rejects_low_scores():
+    sections = {
+        "technical_skills": {"score": 2, "max_score": 10},
+        "experience_quality": {"score": "不明", "max_score": 10},
+    }
+
+    result = merge_sections(TEMPLATE, sections, [], {"technical_skills": 0.5, "experience_quality": 0.5})
+
+    eval_data = result["evaluation_format"]
+    assert eval_data["overall_score"] == 1.0
+    assert eval_data["recommendation"] == REJECTED
+    assert eval_data["next_steps"]["proceed_to_interview"] is False
+
+
+def test_sync_fanout_fails_without_waiting_for_other_sections(monkeypatch):
+    service = GeminiService(api_key="test")
+
+    def evaluate_section(prefix, resume_text, name, template, job_posting_id):
+        if name == "technical_skills":
+            time.sleep(3)
+            return template, []
+        raise ValueError(f"{name} failed")
+
+    monkeypatch.setattr(service, "_evaluate_section", evaluate_section)
+
+    started = time.monotonic()
+    with pytest.raises(ValueError, match="experience_quality failed"):
+        service._analyze_sections(None, "履歴書", JOB, TEMPLATE, None)
+
+    assert time.monotonic() - started < 1
@@ -0,0 +1,163 @@
+"""
+同じキーの処理を1回にまとめる SingleFlight のテスト
+"""
+
+import asyncio
+import contextlib
+import threading
+import time
+
+import pytest
+
+from services.single_flight import SingleFlight, get_single_flight
+
+
+def test_concurrent_threads_share_one_execution():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    executions = []
+    results = []
+
+    def work():
+        executions.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return {"score": 8}
+
+    def caller():
+        results.append(flight.do("resume", work))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait(timeout=5)
+    followers = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    # フォロワーが待ち始めてから処理を終わらせる
+    while flight.get_stats()["shared"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(timeout=5)
+
+    assert len(executions) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert all(result == {"score": 8} for result, _ in results)
+    assert flight.get_stats() == {"executed": 1, "shared": 3, "in_flight": 0}
+
+
+def test_shared_results_are_copies():
+    flight = SingleFlight("test", retention_seconds=60)
+
+    leader_result, _ = flight.do("resume", lambda: {"tags": []})
+    shared_result, shared = flight.do("resume", lambda: {"tags": ["unused"]})
+    shared_result["tags"].append("changed")
+
+    assert shared is True
+    assert leader_result == {"tags": []}
+
+
+def test_error_is_propagated_to_waiters_and_not_cached():
+    flight = SingleFlight("test", retention_seconds=60)
+
+    async def run():
+        started = asyncio.Event()
+
+        async def fail():
+            started.set()
+            await asyncio.sleep(0.01)
+            raise RuntimeError("Gemini API error")
+
+        leader = asyncio.create_task(flight.do_async("resume", fail))
+        await started.wait()
+        follower = asyncio.create_task(flight.do_async("resume", fail))
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+
+        async def succeed():
+            return "ok"
+
+        # 失敗した結果は保持せず、次の呼び出しで改めて実行する
+        return results, await flight.do_async("resume", succeed)
+
+    results, retried = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == ("ok", False)
+    assert flight.get_stats()["executed"] == 2
+
+
+def test_cancelled_leader_cancels_waiters():
+    flight = SingleFlight("test")
+
+    async def run():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.Event().wait()
+
+        leader = asyncio.create_task(flight.do_async("resume", hang))
+        await started.wait()
+        follower = asyncio.create_task(flight.do_async("resume", hang))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await leader
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+
+    asyncio.run(run())
+
+    assert flight.get_stats()["in_flight"] == 0
+
+
+def test_retention_expires():
+    flight = SingleFlight("test", retention_seconds=0.05)
+    counter = iter(range(10))
+
+    first, _ = flight.do("resume", lambda: next(counter))
+    assert flight.do("resume", lambda: next(counter)) == (first, True)
+
+    time.sleep(0.1)
+    assert flight.do("resume", lambda: next(counter)) == (first + 1, False)
+
+
+def test_without_retention_runs_again_after_completion():
+    flight = SingleFlight("test")
+
+    assert flight.do("resume", lambda: 1) == (1, False)
+    assert flight.do("resume", lambda: 2) == (2, False)
+
+
+def test_async_waiter_shares_sync_leader():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def work():
+        started.set()
+        release.wait(timeout=5)
+        return "result"
+
+    leader = threading.Thread(target=flight.do, args=("resume", work))
+    leader.start()
+    started.wait(timeout=5)
+
+    async def follower():
+        async def unused():
+            raise AssertionError("リーダーの結果を共有するため実行されない")
+
+        task = asyncio.create_task(flight.do_async("resume", unused))
+        await asyncio.sleep(0.01)
+        release.set()
+        return await task
+
+    assert asyncio.run(follower()) == ("result", True)
+    leader.join(timeout=5)
+
+
+def test_get_single_flight_is_shared_by_name():
+    assert get_single_flight("test-shared") is get_single_flight("test-shared")
+    assert get_single_flight("test-shared") is not get_single_flight("test-other")
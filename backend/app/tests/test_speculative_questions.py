@@ -0,0 +1,113 @@
+"""
+一次面接の質問の先回り生成のテスト
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import services.speculative_questions as speculative
+from models.database import AIQuestion, Candidate, JobPosting, SelectionStage
+from services.question_generator import QuestionGenerationError
+from services.speculative_questions import (
+    GENERATED_BY_AI,
+    GENERATED_BY_SPECULATIVE,
+    SpeculativeQuestionService,
+    claim_speculative,
+    discard_speculative,
+)
+
+
+PROCEED = {"evaluation_format": {"next_steps": {"proceed_to_interview": True}}}
+QUESTIONS = [{"question": f"質問{i}", "purpose": "目的", "category": "経験"} for i in range(1, 4)]
+
+
+class _FakeGenerator:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    async def generate_questions_async(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.error:
+            raise self.error
+        return QUESTIONS
+
+
+@pytest.fixture
+def setup(db, monkeypatch):
+    posting = JobPosting(title="バックエンドエンジニア")
+    db.add(posting)
+    db.flush()
+    stage = SelectionStage(job_posting_id=posting.id, stage_order=2, stage_name="一次面接")
+    candidate = Candidate(job_posting_id=posting.id, name="山田 太郎", resume_text="Python 5年")
+    db.add_all([stage, candidate])
+    db.commit()
+
+    generator = _FakeGenerator()
+    monkeypatch.setattr(speculative, "get_question_generator", lambda: generator)
+    service = SpeculativeQuestionService(enabled=True, stage_order=2, num_questions=3, ttl_hours=1)
+    return db, service, generator, candidate.id, stage.id
+
+
+def _questions(db, candidate_id):
+    db.expire_all()
+    return db.query(AIQuestion).filter(AIQuestion.candidate_id == candidate_id).all()
+
+
+def test_pregenerate_saves_speculative_questions(setup):
+    db, service, generator, candidate_id, stage_id = setup
+
+    assert asyncio.run(service.pregenerate(candidate_id)) == 3
+
+    saved = _questions(db, candidate_id)
+    assert [question.question for question in saved] == ["質問1", "質問2", "質問3"]
+    assert {question.generated_by for question in saved} == {GENERATED_BY_SPECULATIVE}
+    assert {question.selection_stage_id for question in saved} == {stage_id}
+    assert generator.calls[0]["stage_name"] == "一次面接"
+    assert generator.calls[0]["use_fallback"] is False
+
+    # 既に質問がある場合は生成しない
+    assert asyncio.run(service.pregenerate(candidate_id)) == 0
+    assert len(generator.calls) == 1
+
+
+def test_failed_generation_saves_nothing(setup):
+    db, service, generator, candidate_id, _ = setup
+    generator.error = QuestionGenerationError("invalid response")
+
+    assert asyncio.run(service.pregenerate(candidate_id)) == 0
+    assert _questions(db, candidate_id) == []
+
+
+def test_claim_and_discard(setup):
+    db, service, _, candidate_id, stage_id = setup
+    asyncio.run(service.pregenerate(candidate_id))
+
+    assert claim_speculative(db, candidate_id, stage_id) == 3
+    db.commit()
+    assert {question.generated_by for question in _questions(db, candidate_id)} == {GENERATED_BY_AI}
+    # 使用済みの質問は削除しない
+    assert discard_speculative(db, candidate_id, stage_id) == 0
+
+
+def test_collect_garbage_removes_expired_questions(setup):
+    db, service, _, candidate_id, stage_id = setup
+    asyncio.run(service.pregenerate(candidate_id))
+
+    assert service.collect_garbage() == 0
+    assert service.collect_garbage(now=datetime.utcnow() + timedelta(hours=2)) == 3
+    assert _questions(db, candidate_id) == []
+
+
+def test_schedule_only_for_interview_candidates(setup):
+    db, service, _, candidate_id, _ = setup
+
+    async def run(evaluation_result):
+        task = service.schedule(candidate_id, evaluation_result)
+        return await task if task else None
+
+    assert asyncio.run(run({"evaluation_format": {"next_steps": {"proceed_to_interview": False}}})) is None
+    assert service.schedule(None, PROCEED) is None
+    assert asyncio.run(run(PROCEED)) == 3
@@ -0,0 +1,181 @@
+"""
+構造化出力（JSONスキーマ・応答の修復）のテスト
+"""
+
+import json
+
+import pytest
+
+from services.structured_output import (
+    StreamingObjectParser,
+    fill_from_template,
+    json_generation_config,
+    parse_json_lenient,
+    schema_from_template,
+)
+
+
+def test_parse_complete_json():
+    value, repaired = parse_json_lenient('{"a": 1, "b": [1, 2]}')
+
+    assert value == {"a": 1, "b": [1, 2]}
+    assert repaired is False
+
+
+def test_parse_ignores_code_fence():
+    value, repaired = parse_json_lenient('```json\n[{"question": "Q1"}]\n```')
+
+    assert value == [{"question": "Q1"}]
+    assert repaired is False
+
+
+def test_parse_ignores_trailing_text():
+    value, repaired = parse_json_lenient('評価結果です: {"score": 3} 以上です')
+
+    assert value == {"score": 3}
+    assert repaired is True
+
+
+def test_parse_repairs_truncated_string():
+    value, repaired = parse_json_lenient('{"summary": "経験豊富')
+
+    assert value == {"summary": "経験豊富"}
+    assert repaired is True
+
+
+def test_parse_repairs_to_last_complete_element():
+    text = '[{"question": "Q1", "purpose": "P1"}, {"question": "Q2", "purp'
+
+    value, repaired = parse_json_lenient(text)
+
+    assert value == [{"question": "Q1", "purpose": "P1"}, {"question": "Q2"}]
+    assert repaired is True
+
+
+def test_parse_braces_inside_strings():
+    value, _ = parse_json_lenient('{"text": "a } b ] c", "n": 1}')
+
+    assert value == {"text": "a } b ] c", "n": 1}
+
+
+def test_parse_without_json_raises():
+    with pytest.raises(json.JSONDecodeError):
+        parse_json_lenient("JSONを出力できませんでした")
+
+
+def test_schema_from_template():
+    template = {
+        "name": "",
+        "score": 0,
+        "passed": False,
+        "skills": [],
+        "sections": [{"title": "", "points": 1.5}],
+    }
+
+    schema = schema_from_template(template)
+
+    assert schema["type"] == "object"
+    assert schema["required"] == ["name", "score", "passed", "skills", "sections"]
+    properties = schema["properties"]
+    assert properties["name"] == {"type": "string"}
+    assert properties["score"] == {"type": "number"}
+    assert properties["passed"] == {"type": "boolean"}
+    assert properties["skills"] == {"type": "array", "items": {"type": "string"}}
+    assert properties["sections"]["items"]["properties"]["points"] == {"type": "number"}
+
+
+def test_fill_from_template_adds_missing_keys():
+    template = {"summary": "", "detail": {"score": 0, "comment": ""}, "tags": []}
+    value = {"summary": "良い", "detail": {"score": 4}}
+
+    filled = fill_from_template(value, template)
+
+    assert filled == {"summary": "良い", "detail": {"score": 4, "comment": ""}, "tags": []}
+    # 既定値はテンプレートのコピーを使う
+    filled["tags"].append("x")
+    assert template["tags"] == []
+
+
+def test_fill_from_template_replaces_wrong_type():
+    template = {"detail": {"score": 0}}
+
+    assert fill_from_template({"detail": "不明"}, template) == {"detail": {"score": 0}}
+
+
+def test_json_generation_config(monkeypatch):
+    base = {"temperature": 0.2}
+    schema = {"type": "object"}
+
+    monkeypatch.delenv("GEMINI_STRUCTURED_OUTPUT", raising=False)
+    config = json_generation_config(base, schema)
+    assert config["response_mime_type"] == "application/json"
+    assert config["response_schema"] == schema
+    assert "response_schema" not in base
+
+    monkeypatch.setenv("GEMINI_STRUCTURED_OUTPUT", "false")
+    assert json_generation_config(base, schema) == base
+
+
+# ========================================
+# StreamingObjectParser
+# ========================================
+
+SECTIONS_PATH = ("evaluation_format", "sections")
+
+RESPONSE = (
+    '```json\n{"evaluation_format": {"sections": {'
+    '"technical_skills": {"score": 8, "comment": "Python {強い}"}, '
+    '"experience_quality": {"score": 6, "comment": "\\"PM\\"経験あり"}'
+    '}, "overall_score": 7}}\n```'
+)
+
+
+def _feed_in_chunks(parser, text, size):
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return completed
+
+
+def test_streaming_parser_yields_sections_as_they_close():
+    parser = StreamingObjectParser({
+        SECTIONS_PATH + ("technical_skills",),
+        SECTIONS_PATH + ("experience_quality",),
+    })
+    cut = RESPONSE.index('"experience_quality"')
+
+    first = parser.feed(RESPONSE[:cut])
+    rest = parser.feed(RESPONSE[cut:])
+
+    assert first == [(SECTIONS_PATH + ("technical_skills",), {"score": 8, "comment": "Python {強い}"})]
+    assert rest == [(SECTIONS_PATH + ("experience_quality",), {"score": 6, "comment": '"PM"経験あり'})]
+    assert parser.done
+
+
+def test_streaming_parser_independent_of_chunk_size():
+    paths = {SECTIONS_PATH + ("technical_skills",), SECTIONS_PATH, ()}
+    expected = json.loads(RESPONSE.strip("`").removeprefix("json\n"))
+
+    for size in (1, 3, 7, len(RESPONSE)):
+        completed = dict(_feed_in_chunks(StreamingObjectParser(paths), RESPONSE, size))
+
+        assert completed[()] == expected
+        assert completed[SECTIONS_PATH] == expected["evaluation_format"]["sections"]
+        assert completed[SECTIONS_PATH + ("technical_skills",)]["score"] == 8
+
+
+def test_streaming_parser_array_items():
+    parser = StreamingObjectParser({(None,)})
+
+    completed = _feed_in_chunks(parser, '[{"question": "Q1"}, {"question": "Q2 ]"}]', 4)
+
+    assert [value for _, value in completed] == [{"question": "Q1"}, {"question": "Q2 ]"}]
+
+
+def test_streaming_parser_stops_after_top_level_value():
+    parser = StreamingObjectParser({(None,)})
+
+    parser.feed('[{"question": "Q1"}] 補足: [{"question": "X"}]')
+
+    assert parser.done
+    assert parser.feed('{"question": "Y"}') == []
@@ -0,0 +1,42 @@
+"""
+TextNormalizer のテスト
+"""
+
+from services.text_normalizer import TextNormalizer
+
+
+def test_nfkc_and_whitespace():
+    text = TextNormalizer().normalize_text("ＰｙｔｈｏｎとＡＷＳ　　の経験\n\n\n\nｶﾀｶﾅ   表記")
+
+    assert text == "PythonとAWS の経験\n\nカタカナ 表記"
+
+
+def test_removes_page_numbers_and_repeated_headers():
+    pages = [
+        f"職務経歴書 山田太郎\n{body}\n- {number} -"
+        for number, body in enumerate(["Python開発 5年", "AWS運用 3年", "チームリーダー"], start=1)
+    ]
+
+    result = TextNormalizer().normalize_pages(pages)
+
+    # 氏名入りのヘッダーは最初の1回だけ残す
+    assert result["text"].count("職務経歴書 山田太郎") == 1
+    assert "- 2 -" not in result["text"]
+    assert "AWS運用 3年" in result["text"]
+    assert result["boilerplate_lines_removed"] == 5
+    assert result["chars_saved"] == result["original_chars"] - result["normalized_chars"]
+
+
+def test_headers_differing_only_in_digits_are_boilerplate():
+    pages = [f"Updated 2024/0{month}/01\nPage body {month}" for month in (1, 2, 3)]
+
+    text = TextNormalizer().normalize_pages(pages)["text"]
+
+    assert text.count("Updated") == 1
+
+
+def test_single_page_keeps_edge_lines():
+    result = TextNormalizer().normalize_pages(["職務経歴書\nPython開発"])
+
+    assert result["text"] == "職務経歴書\nPython開発"
+    assert result["boilerplate_lines_removed"] == 0
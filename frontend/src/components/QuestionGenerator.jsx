@@ -25,6 +25,37 @@ import ExpandMoreIcon from '@mui/icons-material/ExpandMore';
 import axios from 'axios';
 import { API_BASE_URL } from '../config';
 
+// Server-Sent Events のレスポンスを読み、イベントごとに onEvent(イベント名, データ) を呼び出す
+async function readEventStream(body, onEvent) {
+  const reader = body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      const dataLines = [];
+      block.split('\n').forEach((line) => {
+        if (line.startsWith('event:')) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+          dataLines.push(line.slice(5).trimStart());
+        }
+      });
+      if (dataLines.length > 0) {
+        onEvent(event, JSON.parse(dataLines.join('\n')));
+      }
+    }
+  }
+}
+
 function QuestionGenerator({ candidateId, stages }) {
   const [selectedStageId, setSelectedStageId] = useState('');
   const [questions, setQuestions] = useState([]);
@@ -39,15 +70,31 @@ function QuestionGenerator({ candidateId, stages }) {
 
     setLoading(true);
     setError(null);
+    setQuestions([]);
 
     try {
-      const response = await axios.post(`${API_BASE_URL}/questions/generate`, {
-        candidate_id: candidateId,
-        stage_id: selectedStageId,
-        num_questions: 30
+      // 生成された質問から順に表示する（axiosはレスポンスを逐次読めないため fetch を使う）
+      const response = await fetch(`${API_BASE_URL}/questions/generate/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          candidate_id: candidateId,
+          stage_id: selectedStageId,
+          num_questions: 30
+        })
       });
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
 
-      setQuestions(response.data);
+      await readEventStream(response.body, (event, data) => {
+        if (event === 'question') {
+          setQuestions((prev) => [...prev, data]);
+        } else if (event === 'error') {
+          console.error('Failed to generate questions:', data.message);
+          setError('質問の生成に失敗しました');
+        }
+      });
     } catch (err) {
       console.error('Failed to generate questions:', err);
       setError('質問の生成に失敗しました');
@@ -163,7 +210,7 @@ function QuestionGenerator({ candidateId, stages }) {
       {questions.length > 0 && (
         <Box>
           <Typography variant="subtitle1" gutterBottom>
-            生成された質問（{questions.length}問）
+            {loading ? `質問を生成中…（${questions.length}問）` : `生成された質問（${questions.length}問）`}
           </Typography>
 
           {Object.entries(groupedQuestions).map(([category, categoryQuestions]) => (